@@ -0,0 +1,251 @@
+"""
+Offline batch processing of recorded dashcam video
+
+Streams video files through the same detection pipeline as the live server
+(run_models_batch + filter_detections) and writes one columnar detections
+file per video: Parquet if pyarrow is installed, NPZ otherwise.
+
+Usage (from the backend directory):
+    python batch_process.py footage/*.mp4 --output-dir detections --batch-size 16 --workers 2
+"""
+import argparse
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+import cv2
+import numpy as np
+from config import BATCH_PROCESSING
+from inference_worker import _init_worker_process
+from websocket_server import run_models_batch, filter_detections_batch, DETECTION_DTYPE, MODEL_NAMES
+
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".m4v", ".mpg", ".mpeg", ".ts"}
+
+# Columns of the detections file, one row per detection
+COLUMNS = ("frame", "timestamp", "model", "class_name", "x1", "y1", "x2", "y2", "confidence", "distance", "in_lane")
+
+def find_videos(inputs):
+    """Expand files and directories given on the command line into a sorted list of video files"""
+    videos = []
+    for item in map(Path, inputs):
+        if item.is_dir():
+            videos.extend(sorted(p for p in item.rglob("*") if p.suffix.lower() in VIDEO_EXTENSIONS))
+        elif item.is_file():
+            videos.append(item)
+        else:
+            print(f"Skipping missing input: {item}")
+    return videos
+
+def decode_batches(video_path, batches, batch_size, frame_step, stop):
+    """
+    Decoding thread: read a video and queue (frame_indices, timestamps, frames) batches
+
+    Args:
+        video_path: Video file to read
+        batches: Bounded queue the batches are put on; None marks the end
+        batch_size: Frames per batch
+        frame_step: Process every frame_step-th frame (skipped frames are only grabbed)
+        stop: Event set by the consumer to abandon decoding early
+    """
+    cap = cv2.VideoCapture(str(video_path))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    indices, timestamps, frames = [], [], []
+    frame_index = 0
+    try:
+        while not stop.is_set():
+            if frame_index % frame_step:
+                # Grab without decoding frames that are skipped
+                if not cap.grab():
+                    break
+                frame_index += 1
+                continue
+
+            ret, frame = cap.read()
+            if not ret:
+                break
+            # Container timestamp if the backend reports one, else derived from the frame rate
+            position = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            indices.append(frame_index)
+            timestamps.append(position if position > 0 or frame_index == 0 else frame_index / fps)
+            frames.append(frame)
+            frame_index += 1
+
+            if len(frames) == batch_size:
+                batches.put((indices, timestamps, frames))
+                indices, timestamps, frames = [], [], []
+        if frames:
+            batches.put((indices, timestamps, frames))
+    finally:
+        cap.release()
+        batches.put(None)
+
+def detections_to_columns(detections, frame_index, timestamp):
+    """Column arrays for one frame's filtered detections"""
+    count = len(detections)
+    boxes = detections['box']
+    return {
+        "frame": np.full(count, frame_index, dtype=np.int64),
+        "timestamp": np.full(count, timestamp, dtype=np.float64),
+        "model": np.array(MODEL_NAMES, dtype='U8')[detections['model']],
+        "class_name": detections['class_name'],
+        "x1": boxes[:, 0],
+        "y1": boxes[:, 1],
+        "x2": boxes[:, 2],
+        "y2": boxes[:, 3],
+        "confidence": detections['conf'],
+        "distance": detections['distance'],
+        "in_lane": detections['in_lane']
+    }
+
+def write_detections(columns, output_path, output_format="auto"):
+    """
+    Write detection columns to Parquet (needs pyarrow) or NPZ
+
+    Args:
+        columns: Mapping of column name to 1-D array, all of equal length
+        output_path: Path without extension; the format's extension is appended
+        output_format: "parquet", "npz", or "auto" for Parquet when pyarrow is available
+
+    Returns:
+        Path of the written file
+    """
+    if output_format in ("auto", "parquet"):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            if output_format == "parquet":
+                raise
+        else:
+            path = output_path.with_name(output_path.name + ".parquet")
+            table = pa.table({name: columns[name] for name in COLUMNS})
+            pq.write_table(table, path, compression="zstd")
+            return path
+
+    path = output_path.with_name(output_path.name + ".npz")
+    np.savez_compressed(path, **{name: columns[name] for name in COLUMNS})
+    return path
+
+def process_video(video_path, output_dir, batch_size, frame_step=1, output_format="auto"):
+    """
+    Run detection over one video file and write its detections file
+
+    Args:
+        video_path: Video file to process
+        output_dir: Directory for the detections file (named after the video)
+        batch_size: Frames per inference batch
+        frame_step: Process every frame_step-th frame
+        output_format: See write_detections
+
+    Returns:
+        Dict with the output path, frames processed, detections and seconds taken
+    """
+    started = time.perf_counter()
+    batches = queue.Queue(maxsize=BATCH_PROCESSING["queue_batches"])
+    stop = threading.Event()
+    decoder = threading.Thread(
+        target=decode_batches,
+        args=(video_path, batches, batch_size, frame_step, stop),
+        daemon=True
+    )
+    decoder.start()
+
+    parts = []
+    frame_count = 0
+    try:
+        # Inference on one batch overlaps with decoding of the next ones
+        while (batch := batches.get()) is not None:
+            indices, timestamps, frames = batch
+            flags = [True] * len(frames)
+            road_batch, standard_batch, _ = run_models_batch(frames, flags, flags)
+            detections_batch = filter_detections_batch(
+                road_batch, standard_batch, [frame.shape[1] for frame in frames], [frame.shape[0] for frame in frames]
+            )
+            for frame_index, timestamp, detections in zip(indices, timestamps, detections_batch):
+                if len(detections):
+                    parts.append(detections_to_columns(detections, frame_index, timestamp))
+            frame_count += len(frames)
+    finally:
+        stop.set()
+        # Unblock the decoder if it is waiting on a full queue
+        while decoder.is_alive():
+            try:
+                batches.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    if parts:
+        columns = {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+    else:
+        columns = detections_to_columns(np.zeros(0, dtype=DETECTION_DTYPE), 0, 0.0)
+
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    output_path = write_detections(columns, Path(output_dir) / f"{Path(video_path).stem}.detections", output_format)
+    return {
+        "video": str(video_path),
+        "output": str(output_path),
+        "frames": frame_count,
+        "detections": len(columns["frame"]),
+        "seconds": time.perf_counter() - started
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect road hazards in recorded dashcam video")
+    parser.add_argument("inputs", nargs="+", help="Video files or directories of videos")
+    parser.add_argument("--output-dir", default="detections", help="Directory for the detections files")
+    parser.add_argument("--batch-size", type=int, default=BATCH_PROCESSING["batch_size"], help="Frames per inference batch")
+    parser.add_argument("--workers", type=int, default=BATCH_PROCESSING["workers"], help="Processes to shard videos across")
+    parser.add_argument("--threads-per-worker", type=int, default=BATCH_PROCESSING["threads_per_worker"], help="Torch threads per worker process")
+    parser.add_argument("--frame-step", type=int, default=1, help="Process every Nth frame")
+    parser.add_argument("--format", choices=["auto", "parquet", "npz"], default="auto", help="Output format (auto: Parquet if pyarrow is installed)")
+    args = parser.parse_args()
+
+    videos = find_videos(args.inputs)
+    if not videos:
+        parser.error("no video files found")
+
+    started = time.perf_counter()
+    job_args = (args.output_dir, args.batch_size, args.frame_step, args.format)
+    reports = []
+    if args.workers <= 1:
+        for video in videos:
+            reports.append(process_video(video, *job_args))
+            print_report(reports[-1])
+    else:
+        with worker_pool(args.workers, args.threads_per_worker) as executor:
+            futures = {executor.submit(process_video, video, *job_args): video for video in videos}
+            for future in as_completed(futures):
+                try:
+                    reports.append(future.result())
+                    print_report(reports[-1])
+                except Exception as e:
+                    print(f"Failed to process {futures[future]}: {str(e)}")
+
+    elapsed = time.perf_counter() - started
+    total_frames = sum(report["frames"] for report in reports)
+    total_detections = sum(report["detections"] for report in reports)
+    print(
+        f"Processed {len(reports)}/{len(videos)} videos, {total_frames} frames, {total_detections} detections "
+        f"in {elapsed:.1f}s ({total_frames / elapsed if elapsed else 0:.1f} frames/sec)"
+    )
+
+def worker_pool(workers, threads_per_worker=None):
+    """
+    Process pool for sharding videos; each worker process loads its own copy
+    of the models with the first video it gets, so they aren't warmed up here
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker_process,
+        initargs=(threads_per_worker, False)
+    )
+
+def print_report(report):
+    fps = report["frames"] / report["seconds"] if report["seconds"] else 0
+    print(f"{report['video']}: {report['frames']} frames, {report['detections']} detections, {fps:.1f} frames/sec -> {report['output']}")
+
+if __name__ == "__main__":
+    main()
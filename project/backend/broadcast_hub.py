@@ -0,0 +1,56 @@
+import asyncio
+from config import BROADCAST_SETTINGS
+
+class BroadcastHub:
+    """Fan out each processed frame to every connected WebSocket client"""
+
+    def __init__(self, client_queue_size=None):
+        self.client_queue_size = client_queue_size or BROADCAST_SETTINGS["client_queue_size"]
+        self.subscribers = {}  # queue -> {"mode": stream mode, "dropped": messages dropped since last checked}
+        self.dropped_messages = 0
+
+    def subscribe(self, mode="rendered"):
+        """Register a new client and return the queue it should read messages from"""
+        queue = asyncio.Queue(maxsize=self.client_queue_size)
+        self.subscribers[queue] = {"mode": mode, "dropped": 0}
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.pop(queue, None)
+
+    def take_drops(self, queue):
+        """Messages dropped for this subscriber since the previous call"""
+        subscriber = self.subscribers.get(queue)
+        if subscriber is None:
+            return 0
+        drops, subscriber["dropped"] = subscriber["dropped"], 0
+        return drops
+
+    def has_subscribers(self):
+        return len(self.subscribers) > 0
+
+    def has_mode(self, mode):
+        """Whether any client is subscribed in the given stream mode"""
+        return any(subscriber["mode"] == mode for subscriber in self.subscribers.values())
+
+    def publish(self, message):
+        """
+        Deliver a message to every subscriber without ever blocking the producer.
+
+        Slow clients whose queue is still full lose their oldest pending message,
+        so they always receive the most recent frame instead of falling behind.
+        """
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.subscribers[queue]["dropped"] += 1
+                self.dropped_messages += 1
+            queue.put_nowait(message)
+
+# One hub per camera source, created on first use
+broadcast_hubs = {}
+
+def get_hub(source_name):
+    if source_name not in broadcast_hubs:
+        broadcast_hubs[source_name] = BroadcastHub()
+    return broadcast_hubs[source_name]
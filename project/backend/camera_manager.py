@@ -1,45 +1,242 @@
-import cv2
+import asyncio
 import threading
-import queue
+import time
+from pathlib import Path
+import numpy as np
+from config import CAMERA_SOURCES, CAPTURE_SETTINGS, INFERENCE_SETTINGS, RECORDING_SETTINGS
+from frame_buffer import FrameRing
+from capture_sources import parse_source, open_reader, FrameRecorder, ReplayReader
+from metrics import timed, stage_seconds, frames_captured, capture_frames_dropped, camera_reconnects
 
-class CameraManager:
-    def __init__(self):
-        self.active_camera = 2  # Permanently set to Camera 2
-        self.frame_queue = queue.Queue(maxsize=1)
+class CameraSource:
+    """A single capture device, RTSP stream, video file or replay with its own capture thread"""
+
+    def __init__(self, name, source):
+        self.name = name
+        self.source = parse_source(source)
+        shared = CAPTURE_SETTINGS["shared_memory"]
+        if shared is None:
+            # Share frames with inference workers only when they are separate processes
+            shared = INFERENCE_SETTINGS["mode"] == "process"
+        self.ring = FrameRing(CAPTURE_SETTINGS["ring_slots"], shared=shared, name=name)
         self.running = False
         self.thread = None
-        self.cap = None
+        self.reader = None
+        self.recorder = None
+        self.finished = False   # A replay without looping reached its end
+        self.read_failures = 0  # Consecutive failed reads, for backing off a source that keeps failing
+        self.stopping = threading.Event()
 
-    def start_stream(self):
+    def start(self):
         if self.thread and self.thread.is_alive():
-            self.stop_stream()
+            self.stop()
         
         self.running = True
-        self.thread = threading.Thread(target=self._capture_frames, daemon=True)
+        self.finished = False
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._capture_frames, name=f"capture-{self.name}", daemon=True)
         self.thread.start()
 
-    def stop_stream(self):
+    def stop(self):
         self.running = False
+        self.stopping.set()
         if self.thread:
             self.thread.join()
-        if self.cap and self.cap.isOpened():
-            self.cap.release()
+        if self.reader:
+            self.reader.release()
+
+    def close(self):
+        self.stop()
+        self.stop_recording()
+        self.ring.close()
+
+    def start_recording(self, directory=None):
+        """Start writing this source's frames and capture timestamps for later replay"""
+        if self.recorder is None:
+            directory = directory or Path(RECORDING_SETTINGS["directory"]) / f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}"
+            self.recorder = FrameRecorder(directory)
+        return self.recorder.status()
+
+    def stop_recording(self):
+        """Finish the recording; returns its status, or None if not recording"""
+        recorder, self.recorder = self.recorder, None
+        return recorder.close() if recorder else None
+
+    def _reopen(self):
+        """Reconnect or restart the reader; False once a replay has finished"""
+        if not self.reader.reopen():
+            self.finished = True
+            self.running = False
+            return False
+        # A looping replay starting over is not a reconnect
+        if not isinstance(self.reader, ReplayReader):
+            camera_reconnects.inc(source=self.name)
+        return True
+
+    def _backoff(self, failures):
+        """Wait before retrying a failing source; returns early when the source is stopped"""
+        delay = CAPTURE_SETTINGS["retry_backoff_s"] * 2 ** (failures - 1)
+        self.stopping.wait(min(delay, CAPTURE_SETTINGS["retry_backoff_max_s"]))
+
+    def _read_failed(self):
+        """Reopen after a failed read, backing off while reads keep failing right after reopening"""
+        self.read_failures += 1
+        if self.read_failures > 1:
+            # An undecodable file would otherwise restart a looping replay forever
+            if isinstance(self.reader, ReplayReader) and self.read_failures > CAPTURE_SETTINGS["replay_max_empty_loops"]:
+                print(f"Replay {self.name} keeps restarting without a frame; stopping")
+                self.finished = True
+                self.running = False
+                return
+            self._backoff(self.read_failures - 1)
+        self._reopen()
 
     def _capture_frames(self):
-        self.cap = cv2.VideoCapture(self.active_camera)
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+        self.reader = None
+        self.read_failures = 0
+        failures = 0
+        while self.running and self.reader is None:
+            try:
+                self.reader = open_reader(self.source)
+            except Exception as e:
+                failures += 1
+                print(f"Error opening camera source {self.name}: {str(e)}; retrying")
+                self._backoff(failures)
+        shape = None
         
         while self.running:
-            ret, frame = self.cap.read()
+            index = self.ring.acquire_write_slot(shape) if shape else None
+            if shape and index is None:
+                # Every slot is pinned by a reader: grab and discard this frame
+                capture_frames_dropped.inc(source=self.name)
+                if self.reader.grab():
+                    self.read_failures = 0
+                else:
+                    self._read_failed()
+                continue
+            
+            # Decode straight into the ring slot when its size is known
+            buffer = self.ring.buffers[index] if index is not None else None
+            with timed(stage_seconds, stage="capture_read", source=self.name):
+                ret, frame = self.reader.read(image=buffer)
             if not ret:
-                self.cap.release()
-                self.cap = cv2.VideoCapture(self.active_camera)  # Reconnect
+                self._read_failed()
                 continue
-                
-            if not self.frame_queue.empty():
-                self.frame_queue.get_nowait()
-            self.frame_queue.put(frame)
+            self.read_failures = 0
+            timestamp = time.time()
+            
+            if buffer is None or frame.shape != buffer.shape:
+                # First frame or the source changed resolution: (re)size the ring
+                shape = frame.shape
+                index = self.ring.acquire_write_slot(shape)
+                if index is None:
+                    capture_frames_dropped.inc(source=self.name)
+                    continue
+                buffer = self.ring.buffers[index]
+            if not np.may_share_memory(frame, buffer):
+                buffer[...] = frame
+            
+            self.ring.publish(index, timestamp)
+            frames_captured.inc(source=self.name)
+            
+            recorder = self.recorder
+            if recorder is not None:
+                recorder.write(buffer, timestamp)
+
+    def status(self):
+        return {
+            "source": self.reader.describe() if self.reader else str(self.source),
+            "running": self.running and self.thread is not None and self.thread.is_alive(),
+            "finished": self.finished,
+            "frames": self.ring.sequence,
+            "dropped_frames": self.ring.dropped_frames,
+            "recording": self.recorder.status() if self.recorder else None
+        }
+
+class CameraManager:
+    """Manages the named camera sources from config.CAMERA_SOURCES"""
+
+    def __init__(self, sources=None):
+        sources = sources or CAMERA_SOURCES
+        self.sources = {name: CameraSource(name, source) for name, source in sources.items()}
+        self.default_source = next(iter(self.sources))
+
+    def start_stream(self):
+        for source in self.sources.values():
+            source.start()
+
+    def stop_stream(self):
+        for source in self.sources.values():
+            source.stop()
+
+    def close(self):
+        for source in self.sources.values():
+            source.close()
+
+    def add_source(self, name, source, start=True):
+        if name in self.sources:
+            self.sources[name].close()
+        self.sources[name] = CameraSource(name, source)
+        if start:
+            self.sources[name].start()
+        return self.sources[name]
+
+    def remove_source(self, name):
+        source = self.sources.pop(name, None)
+        if source:
+            source.close()
+
+    def latest_frames(self, last_sequences):
+        """
+        Pin the latest frame of each requested source if it is newer than the one already seen
+
+        Args:
+            last_sequences: Mapping of source name to the last sequence number processed
+
+        Returns:
+            Mapping of source name to a FrameRef; callers must release() each one
+        """
+        frames = {}
+        for name, sequence in last_sequences.items():
+            source = self.sources.get(name)
+            frame_ref = source.ring.latest(sequence) if source else None
+            if frame_ref is not None:
+                frames[name] = frame_ref
+        return frames
+
+    async def wait_for_frames(self, last_sequences, timeout=None):
+        """
+        latest_frames, waiting up to timeout seconds for a new frame if none is ready yet
+
+        The capture threads wake the event loop when they publish, so a frame
+        is picked up as soon as it arrives instead of on the next poll.
+        """
+        frames = self.latest_frames(last_sequences)
+        if frames or not last_sequences:
+            return frames
+        
+        loop = asyncio.get_running_loop()
+        published = asyncio.Event()
+        wake = lambda: loop.call_soon_threadsafe(published.set)
+        rings = [self.sources[name].ring for name in last_sequences if name in self.sources]
+        for ring in rings:
+            ring.add_listener(wake)
+        try:
+            # A frame published before the listeners were added would not wake us
+            frames = self.latest_frames(last_sequences)
+            if not frames:
+                try:
+                    await asyncio.wait_for(published.wait(), timeout or CAPTURE_SETTINGS["frame_wait_s"])
+                except asyncio.TimeoutError:
+                    pass
+                frames = self.latest_frames(last_sequences)
+        finally:
+            for ring in rings:
+                ring.remove_listener(wake)
+        return frames
+
+    def status(self):
+        return {name: source.status() for name, source in self.sources.items()}
 
 # Create a global instance
 camera_manager = CameraManager()
@@ -0,0 +1,246 @@
+"""
+Frame readers behind CameraSource, and the stream recorder
+
+A CAMERA_SOURCES entry is a device index, RTSP URL or video file path, read
+live with cv2.VideoCapture, or a replay of a video file, an image directory
+or a recording made by FrameRecorder:
+
+    {"type": "replay", "path": "recordings/front-20260101-120000", "speed": 2.0, "loop": True}
+
+speed 1.0 replays in real time (at the recorded timestamps, or the file's
+frame rate), 2.0 twice as fast, and 0 as fast as frames can be decoded.
+"""
+import csv
+import queue
+import threading
+import time
+from pathlib import Path
+import cv2
+import numpy as np
+from config import RECORDING_SETTINGS
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mkv", ".mov", ".m4v"}
+TIMESTAMPS_FILE = "timestamps.csv"
+
+def parse_source(source):
+    """Device indices may be given as ints or digit strings; anything else is a URL or file path"""
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+def open_reader(source):
+    """Reader for a CAMERA_SOURCES entry"""
+    source = parse_source(source)
+    if isinstance(source, dict):
+        if source.get("type") != "replay":
+            raise ValueError(f"Unknown capture source type: {source.get('type')}")
+        return ReplayReader(source["path"], source.get("speed", 1.0), source.get("loop", True), source.get("fps"))
+    return DeviceReader(source)
+
+class DeviceReader:
+    """Camera device, RTSP stream or video file through cv2.VideoCapture, reopened whenever a read fails"""
+
+    def __init__(self, source):
+        self.source = source
+        self.cap = None
+        self.open()
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.source)
+        if isinstance(self.source, int):
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+
+    def read(self, image=None):
+        return self.cap.read(image=image) if image is not None else self.cap.read()
+
+    def grab(self):
+        return self.cap.grab()
+
+    def reopen(self):
+        """Reconnect (video files start over from the beginning); returns whether to keep reading"""
+        self.release()
+        self.open()
+        return True
+
+    def release(self):
+        if self.cap is not None and self.cap.isOpened():
+            self.cap.release()
+
+    def describe(self):
+        return str(self.source)
+
+class ReplayReader:
+    """
+    Paced replay of a video file, an image directory or a FrameRecorder recording
+
+    Frames are released at their recorded capture times (timestamps.csv next
+    to the frames) or at fps, divided by speed. When decoding can't keep up,
+    frames come as fast as they decode. At the end the replay starts over if
+    loop is set, otherwise reads fail and the source finishes.
+    """
+
+    def __init__(self, path, speed=1.0, loop=True, fps=None):
+        self.path = Path(path)
+        self.speed = float(speed or 0)
+        self.loop = loop
+        self.files = None       # Image paths, for image directories
+        self.video = None
+        self.times = None       # Recorded capture times relative to the first frame
+        self.cap = None
+        self.position = 0
+        self.started = None
+
+        if self.path.is_dir():
+            timestamps = self.path / TIMESTAMPS_FILE
+            if timestamps.exists():
+                with open(timestamps, newline="") as f:
+                    self.times = np.array([float(row["timestamp"]) for row in csv.DictReader(f)])
+                    self.times -= self.times[0] if len(self.times) else 0
+            videos = sorted(p for p in self.path.iterdir() if p.suffix.lower() in VIDEO_EXTENSIONS)
+            if videos:
+                self.video = videos[0]
+            else:
+                self.files = sorted(p for p in self.path.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+                if not self.files:
+                    raise ValueError(f"No video or images to replay in {self.path}")
+        elif self.path.exists():
+            self.video = self.path
+        else:
+            raise ValueError(f"Replay source {self.path} does not exist")
+        self.open()
+        self.fps = fps or (self.cap.get(cv2.CAP_PROP_FPS) if self.cap is not None else 0) or 30.0
+
+    def open(self):
+        self.position = 0
+        self.started = None
+        if self.video is not None:
+            self.cap = cv2.VideoCapture(str(self.video))
+
+    def _wait(self):
+        """Sleep until the next frame is due"""
+        if self.speed <= 0:
+            return
+        if self.times is not None and len(self.times):
+            # Frames past the last recorded timestamp continue at fps from it
+            last = len(self.times) - 1
+            due = self.times[min(self.position, last)] + max(self.position - last, 0) / self.fps
+        else:
+            due = self.position / self.fps
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now - due / self.speed
+        delay = self.started + due / self.speed - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def read(self, image=None):
+        self._wait()
+        if self.files is not None:
+            if self.position >= len(self.files):
+                return False, None
+            frame = cv2.imread(str(self.files[self.position]))
+            if frame is None:
+                return False, None
+            if image is not None and image.shape == frame.shape:
+                image[...] = frame
+                frame = image
+            ret = True
+        else:
+            ret, frame = self.cap.read(image=image) if image is not None else self.cap.read()
+        self.position += 1
+        return ret, frame
+
+    def grab(self):
+        self._wait()
+        self.position += 1
+        if self.files is not None:
+            return self.position <= len(self.files)
+        return self.cap.grab()
+
+    def reopen(self):
+        """Start over if looping; returns whether to keep reading"""
+        if not self.loop:
+            return False
+        self.release()
+        self.open()
+        return True
+
+    def release(self):
+        if self.cap is not None and self.cap.isOpened():
+            self.cap.release()
+
+    def describe(self):
+        return f"replay:{self.path} x{self.speed:g}" if self.speed > 0 else f"replay:{self.path} max"
+
+class FrameRecorder:
+    """
+    Writes a camera's frames with their capture timestamps, on its own thread
+
+    The directory gets recording<extension> (or one JPEG per frame with
+    format "images") and timestamps.csv with a "frame,timestamp" row per
+    frame, so ReplayReader can replay the drive at its recorded pace. Frames
+    are copied into a bounded queue; if the writer falls behind, frames are
+    left out of the recording rather than slowing down capture.
+    """
+
+    def __init__(self, directory, settings=None):
+        self.settings = settings or RECORDING_SETTINGS
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.queue = queue.Queue(maxsize=self.settings["queue_size"])
+        self.frames = 0
+        self.dropped_frames = 0
+        self.writer = None
+        self.size = None
+        self.timestamps = open(self.directory / TIMESTAMPS_FILE, "w", newline="")
+        self.csv = csv.writer(self.timestamps)
+        self.csv.writerow(["frame", "timestamp"])
+        self.thread = threading.Thread(target=self._run, name=f"recorder-{self.directory.name}", daemon=True)
+        self.thread.start()
+
+    def write(self, frame, timestamp):
+        """Queue a copy of a frame (the caller's buffer is reused)"""
+        try:
+            self.queue.put_nowait((frame.copy(), timestamp))
+        except queue.Full:
+            self.dropped_frames += 1
+
+    def _run(self):
+        while (item := self.queue.get()) is not None:
+            frame, timestamp = item
+            if self.settings["format"] == "images":
+                cv2.imwrite(
+                    str(self.directory / f"frame_{self.frames:06d}.jpg"), frame,
+                    [cv2.IMWRITE_JPEG_QUALITY, self.settings["jpeg_quality"]]
+                )
+            else:
+                if self.writer is None:
+                    self.size = (frame.shape[1], frame.shape[0])
+                    self.writer = cv2.VideoWriter(
+                        str(self.directory / f"recording{self.settings['extension']}"),
+                        cv2.VideoWriter_fourcc(*self.settings["fourcc"]), self.settings["fps"], self.size
+                    )
+                if (frame.shape[1], frame.shape[0]) != self.size:
+                    frame = cv2.resize(frame, self.size)
+                self.writer.write(frame)
+            self.csv.writerow([self.frames, f"{timestamp:.6f}"])
+            self.frames += 1
+
+    def close(self):
+        """Finish writing the queued frames and close the files"""
+        self.queue.put(None)
+        self.thread.join()
+        if self.writer is not None:
+            self.writer.release()
+        self.timestamps.close()
+        return self.status()
+
+    def status(self):
+        return {
+            "directory": str(self.directory),
+            "frames": self.frames,
+            "dropped_frames": self.dropped_frames,
+            "recording": self.thread.is_alive()
+        }
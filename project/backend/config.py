@@ -15,12 +15,204 @@ DETECTION_THRESHOLDS = {
 # Default camera index
 DEFAULT_CAMERA = 2
 
-# Distance estimation parameters
+# Camera sources: name -> device index, RTSP URL or video file path, or a replay
+# of a video file, image directory or recording (see capture_sources.py), e.g.
+#   "front": {"type": "replay", "path": "recordings/front-20260101-120000", "speed": 1.0, "loop": True}
+# The first entry is the default source served on /ws.
+CAMERA_SOURCES = {
+    "front": DEFAULT_CAMERA
+}
+
+# Frame capture
+CAPTURE_SETTINGS = {
+    "ring_slots": 4,              # Preallocated frame buffers per camera
+    "shared_memory": None,        # Put the ring in shared memory; None enables it for process inference workers
+    "frame_wait_s": 0.1,          # Longest the inference loop waits for a new frame before re-checking who is watching
+    "retry_backoff_s": 0.5,       # First wait before reopening a source that fails again; doubles on each failure
+    "retry_backoff_max_s": 10.0,
+    "replay_max_empty_loops": 5   # A looping replay that restarts this often without a frame is given up on
+}
+
+# Stream recordings (POST /api/cameras/{name}/recording), replayable as camera sources
+RECORDING_SETTINGS = {
+    "directory": "recordings",    # One subdirectory per recording
+    "format": "video",            # "video" (one file) or "images" (one JPEG per frame)
+    "fourcc": "mp4v",
+    "extension": ".mp4",
+    "fps": 30,                    # Nominal video rate; replays use the recorded timestamps
+    "jpeg_quality": 95,
+    "queue_size": 64              # Frames waiting for the writer before they are left out
+}
+
+# MongoDB connection pool (the URI and database name come from MONGODB_URI / MONGODB_DB)
+MONGODB_SETTINGS = {
+    "max_pool_size": 50,                   # Concurrent connections per server
+    "min_pool_size": 5,                    # Connections kept open while idle
+    "max_idle_time_ms": 60000,
+    "wait_queue_timeout_ms": 5000,         # Fail requests that wait this long for a free connection
+    "server_selection_timeout_ms": 5000
+}
+
+# Hazard report deduplication, cleanup and listing
+HAZARD_REPORT_SETTINGS = {
+    "dedup_radius_m": 100,        # A new report within this distance of a recent one is a duplicate
+    "dedup_days": 7,              # How long a report suppresses new ones nearby
+    "cleanup_age_days": 7,        # Reports older than this are removed unless a newer one is nearby
+    "cleanup_radius_m": 100,
+    "cleanup_batch_size": 1000,   # Reports per delete_many
+    "page_size": 500,             # Default /api/hazard-reports page size
+    "max_page_size": 5000,
+    "cache_entries": 256,         # Cached /api/hazard-reports responses (LRU)
+    "cache_ttl_seconds": 30
+}
+
+# Hazard reports filed by the server from its own detections (hazard_ingest.py)
+HAZARD_INGEST_SETTINGS = {
+    "enabled": True,
+    "report_types": ["pothole"],  # Road model classes that are reported
+    "min_sightings": 5,           # Frames a hazard must be seen on to be reported
+    "merge_radius_m": 15,         # Sightings this close together are the same hazard
+    "settle_s": 5,                # Report once the hazard has been out of view this long
+    "flush_interval_s": 10,       # Ready reports are written in one batch this often
+    "position_max_age_s": 5,      # Detections are ignored if the client's last position is older
+    "max_pending": 10000,
+    "max_batch": 500              # Reports accepted per POST /api/hazard-notifications
+}
+
+# Outbound authority email (email_outbox.py); SMTP server and credentials come from .env
+EMAIL_OUTBOX_SETTINGS = {
+    "digest_window_s": 60,        # Reports to one authority within this window go out as one email
+    "max_digest_size": 50,        # Send early once this many reports are waiting
+    "poll_interval_s": 5,
+    "max_attempts": 8,            # Then the entry is marked failed
+    "backoff_base_s": 30,         # Retry delay doubles per attempt...
+    "backoff_max_s": 3600,        # ...up to this
+    "smtp_idle_timeout_s": 120,   # Close the reused SMTP connection after this long without mail
+    "stale_claim_s": 300          # Entries stuck "sending" this long (worker crashed) are retried
+}
+
+# Nearby-hazard push channel (/ws/hazards)
+HAZARD_FEED_SETTINGS = {
+    "default_radius_m": 100,      # Alert radius when the client doesn't send one
+    "max_radius_m": 2000,
+    "cell_m": 200,                # Spatial grid cell size
+    "client_queue_size": 256      # Updates pending per client before it is disconnected to resync
+}
+
+# Prometheus metrics served at /metrics
+METRICS_SETTINGS = {
+    "enabled": True,              # When False, timers and counters are no-ops
+    "latency_buckets": [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]  # Seconds
+}
+
+# Offline batch processing of recorded video (batch_process.py)
+BATCH_PROCESSING = {
+    "batch_size": 8,              # Frames per inference batch
+    "workers": 1,                 # Processes to shard video files across
+    "threads_per_worker": None,   # Torch threads per worker process; None keeps the default
+    "queue_batches": 4            # Decoded batches buffered ahead of inference
+}
+
+# Distance estimation parameters (cameras without an entry in CAMERA_CALIBRATION)
 DISTANCE_ESTIMATION = {
-    "focal_length": 1000,  # Approximate focal length in pixels
+    "focal_length": 1000,  # Approximate focal length in pixels at the reference size
+    "reference_width": 1280,
+    "reference_height": 720,
+    "camera_height_m": 1.2,       # Camera height above the road, for ground-plane distances
+    "camera_pitch_deg": 0.0,      # Downward tilt of the camera
+    "max_distance_m": 100.0,      # Ground-plane distances beyond this are not reported
+    "ground_plane_classes": ["pothole", "speedbump"],  # Ranged from the box's bottom edge on the road
     "known_width": {
         "person": 0.5,     # Average width of a person in meters
         "dog": 0.4,        # Average width of a dog in meters
         "cow": 0.8         # Average width of a cow in meters
     }
 }
+
+# Road region the road hazard model is run on (road_roi.py)
+ROI_SETTINGS = {
+    "mode": "polygon",            # "off", "polygon" (static) or "lanes" (follows detected lane lines)
+    # Static road region as normalized (x, y) frame points; also the fallback while no lanes are found
+    "polygon": [[0.0, 0.45], [1.0, 0.45], [1.0, 1.0], [0.0, 1.0]],
+    "mask_outside": False,        # Black out pixels inside the crop but outside the polygon
+    "tiles": 1,                   # Side-by-side tiles per crop, each sent to the model at full input size
+    "tile_overlap": 0.1,          # Fraction of a tile shared with its neighbour
+    "tile_nms_iou": 0.5,          # Duplicate boxes on tile seams above this overlap are merged
+    "lane_search_top": 0.5,       # Lane lines are searched below this fraction of the frame height
+    "lane_detect_width": 320,     # Lane detection runs on the search band downscaled to this width
+    "lane_min_slope": 0.3,        # Flatter segments (|dy/dx|) are not lane lines
+    "lane_margin": 0.1,           # Region extends this fraction of the frame width beyond the lanes
+    "lane_update_interval": 15,   # Frames between lane detections
+    "lane_smoothing": 0.3         # Weight of a new lane detection against the running estimate
+}
+
+# Per-camera calibration, keyed like CAMERA_SOURCES. Each entry is either an
+# OpenCV calibration file ({"file": "calibration/front.yml"} with camera_matrix,
+# image_width, image_height and optionally distortion_coefficients) or inline
+# intrinsics ({"fx", "fy", "cx", "cy", "width", "height"}), and may set the
+# mounting with "height_m" and "pitch_deg". Intrinsics are rescaled to the
+# actual frame size.
+CAMERA_CALIBRATION = {}
+
+# WebSocket broadcast settings
+BROADCAST_SETTINGS = {
+    "client_queue_size": 1  # Pending messages kept per client before the oldest is dropped
+}
+
+# Inference worker pool settings
+INFERENCE_SETTINGS = {
+    "mode": "thread",             # "thread" or "process"
+    "max_workers": 1,             # Parallel inference jobs
+    "max_pending": 2,             # Jobs queued or running before callers wait
+    "threads_per_worker": None,   # Torch threads per worker process (None keeps the default)
+    "warm_up_on_startup": True    # Load models and run a dummy inference when the server starts
+}
+
+# Model weights and inference backend
+MODEL_WEIGHTS = {
+    "road": "yolov12.pt",         # Custom road hazard model (potholes, speedbumps)
+    "standard": "yolov8n.pt"      # Standard object detection model
+}
+
+MODEL_BACKEND = {
+    "backend": "pytorch",         # "pytorch", "onnx" (ONNX Runtime) or "openvino"
+    "int8": False,                # Quantize exported models to INT8
+    "imgsz": 640,                 # Export input size, must match predict imgsz
+    "batch": 16,                  # Largest batch exported models accept (exported with a dynamic batch axis)
+    "cache_dir": "model_cache"    # Exported artifacts, keyed by weight hash
+}
+
+# Adaptive frame scheduling
+SCHEDULER_SETTINGS = {
+    "target_fps": 20,             # Output frame rate the scheduler aims for
+    "max_road_interval": 5,       # Run the road model at least every N frames
+    "max_standard_interval": 3,   # Run the standard model at least every M frames
+    "latency_window": 30,         # Frames used for the rolling latency averages
+    "motion_compensation": True   # Shift reused detections by the measured image motion
+}
+
+# Multi-object tracking
+TRACKER_SETTINGS = {
+    "iou_threshold": 0.3,         # Minimum IoU between a predicted track box and a detection
+    "confident_margin": 0.1,      # Detections closer than this to their class threshold can extend tracks but not start them (they are still reported, without a track ID)
+    "min_hits": 2,                # Frames a track must be seen before it keeps being reported while missed
+    "max_missed_frames": 5,       # Frames a track survives without a matching detection
+    "distance_smoothing": 0.4,    # EMA factor for distance, approach speed and box velocity
+    "min_approach_speed": 0.5     # Meters per second below which no time-to-collision is given
+}
+
+# Video stream encoding
+STREAM_SETTINGS = {
+    "encoder_workers": 2,         # Threads for drawing, resizing and JPEG encoding
+    "quality_levels": [           # (scale, JPEG quality) ladder, best first
+        [1.0, 80],
+        [1.0, 65],
+        [0.75, 60],
+        [0.5, 55],
+        [0.5, 40]
+    ],
+    "slow_send_ratio": 0.5,       # A send slower than this fraction of the frame interval is "slow"
+    "step_up_after": 30,          # Consecutive fast sends before quality is raised again
+    "bandwidth_headroom": 0.8,    # Share of a client's estimated bandwidth a level's frames may use
+    "raw_frame_interval": 3       # In "raw" mode, send every Nth undecorated frame
+}
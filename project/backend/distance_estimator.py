@@ -1,38 +1,226 @@
+import math
 import numpy as np
 import cv2
+from config import DISTANCE_ESTIMATION, CAMERA_CALIBRATION
+
+class CameraCalibration:
+    """
+    Pinhole intrinsics measured at one resolution, plus how the camera is mounted
+
+    Args:
+        fx, fy, cx, cy: Focal lengths and principal point in pixels at width x height
+        width, height: Resolution the intrinsics were measured at
+        distortion: Optional OpenCV distortion coefficients (k1, k2, p1, p2[, k3...])
+        height_m: Height of the camera above the road in meters
+        pitch_deg: Downward tilt of the optical axis in degrees
+    """
+
+    def __init__(self, fx, fy, cx, cy, width, height, distortion=None, height_m=None, pitch_deg=None):
+        self.fx, self.fy, self.cx, self.cy = float(fx), float(fy), float(cx), float(cy)
+        self.width, self.height = int(width), int(height)
+        self.distortion = None if distortion is None else np.asarray(distortion, dtype=np.float64).reshape(-1)
+        self.height_m = float(DISTANCE_ESTIMATION["camera_height_m"] if height_m is None else height_m)
+        self.pitch_deg = float(DISTANCE_ESTIMATION["camera_pitch_deg"] if pitch_deg is None else pitch_deg)
+
+    @classmethod
+    def from_settings(cls, entry):
+        """Calibration from a CAMERA_CALIBRATION entry: a calibration file or inline intrinsics"""
+        mounting = {"height_m": entry.get("height_m"), "pitch_deg": entry.get("pitch_deg")}
+        if "file" in entry:
+            return cls.load(entry["file"], **mounting)
+        return cls(
+            entry["fx"], entry["fy"], entry["cx"], entry["cy"], entry["width"], entry["height"],
+            entry.get("distortion"), **mounting
+        )
+
+    @classmethod
+    def load(cls, path, height_m=None, pitch_deg=None):
+        """
+        Read an OpenCV calibration file (YAML, XML or JSON, as written by cv::FileStorage)
+
+        Expects camera_matrix, image_width and image_height, and optionally
+        distortion_coefficients, as saved by the OpenCV calibration sample.
+        """
+        storage = cv2.FileStorage(str(path), cv2.FILE_STORAGE_READ)
+        if not storage.isOpened():
+            raise ValueError(f"Cannot open calibration file {path}")
+        try:
+            matrix = storage.getNode("camera_matrix").mat()
+            width, height = storage.getNode("image_width").real(), storage.getNode("image_height").real()
+            if matrix is None or not width or not height:
+                raise ValueError(f"{path} needs camera_matrix, image_width and image_height")
+            distortion = storage.getNode("distortion_coefficients").mat()
+        finally:
+            storage.release()
+        return cls(
+            matrix[0, 0], matrix[1, 1], matrix[0, 2], matrix[1, 2], width, height,
+            distortion, height_m, pitch_deg
+        )
+
+    def scaled(self, frame_width, frame_height):
+        """The same camera at another capture resolution"""
+        sx, sy = frame_width / self.width, frame_height / self.height
+        return CameraCalibration(
+            self.fx * sx, self.fy * sy, self.cx * sx, self.cy * sy, frame_width, frame_height,
+            self.distortion, self.height_m, self.pitch_deg
+        )
+
+    def row_distances(self, max_distance):
+        """
+        Ground distance in meters for every pixel row, NaN at or above the horizon
+
+        A road point imaged on row v lies on a ray pitch + atan((v - cy) / fy)
+        below the horizon, so it is height_m / tan(angle) ahead of the camera.
+        Rows are undistorted along the principal column first when the
+        calibration has distortion coefficients.
+        """
+        rows = np.arange(self.height, dtype=np.float64)
+        if self.distortion is not None and np.any(self.distortion):
+            matrix = np.array([[self.fx, 0, self.cx], [0, self.fy, self.cy], [0, 0, 1]], dtype=np.float64)
+            points = np.stack([np.full_like(rows, self.cx), rows], axis=1).reshape(-1, 1, 2)
+            normalized = cv2.undistortPoints(points, matrix, self.distortion).reshape(-1, 2)[:, 1]
+        else:
+            normalized = (rows - self.cy) / self.fy
+
+        angles = math.radians(self.pitch_deg) + np.arctan(normalized)
+        distances = np.full(self.height, np.nan, dtype=np.float32)
+        below = angles > 0
+        distances[below] = self.height_m / np.tan(angles[below])
+        distances[distances > max_distance] = np.nan
+        return distances
 
 class DistanceEstimator:
-    def __init__(self, camera_params=None):
-        # Default camera parameters if not provided
-        self.camera_params = camera_params or {
-            'focal_length': 1000,  # Approximate focal length in pixels
-            'known_width': {
-                'person': 0.5,     # Average width of a person in meters
-                'dog': 0.4,        # Average width of a dog in meters
-                'cow': 0.8         # Average width of a cow in meters
-            }
-        }
-    
-    def estimate_distance(self, object_class, bbox_width, frame_width):
+    """
+    Monocular distance estimates for detection boxes, per camera
+
+    Road-surface classes (ground_plane_classes) are ranged from the bottom
+    edge of their box on the ground plane, through a row -> distance table
+    built once per camera and frame size. Objects of known width are ranged
+    from their apparent width with the calibrated focal length. Other classes
+    get NaN.
+    """
+
+    def __init__(self, camera_params=None, calibrations=None):
+        self.camera_params = camera_params or DISTANCE_ESTIMATION
+        self.calibration_settings = CAMERA_CALIBRATION if calibrations is None else calibrations
+        self.default_calibration = CameraCalibration(
+            self.camera_params['focal_length'], self.camera_params['focal_length'],
+            self.camera_params['reference_width'] / 2, self.camera_params['reference_height'] / 2,
+            self.camera_params['reference_width'], self.camera_params['reference_height']
+        )
+        self.calibrations = {}
+        self.geometry_cache = {}   # (source, width, height) -> (scaled calibration, row distance table)
+
+    def calibration(self, source=None):
+        """A camera's calibration at the resolution it was measured, or the default"""
+        if source not in self.calibrations:
+            calibration = self.default_calibration
+            if source in self.calibration_settings:
+                try:
+                    calibration = CameraCalibration.from_settings(self.calibration_settings[source])
+                except Exception as e:
+                    print(f"Error loading calibration for camera {source}, using defaults: {str(e)}")
+            self.calibrations[source] = calibration
+        return self.calibrations[source]
+
+    def geometry(self, frame_width, frame_height=None, source=None):
+        """
+        Calibration scaled to the frame size and its row -> ground distance table
+
+        Without a frame height the calibration's aspect ratio is assumed.
+        """
+        calibration = self.calibration(source)
+        if frame_height is None:
+            frame_height = round(frame_width * calibration.height / calibration.width)
+        key = (source, int(frame_width), int(frame_height))
+        if key not in self.geometry_cache:
+            scaled = calibration.scaled(int(frame_width), int(frame_height))
+            self.geometry_cache[key] = (scaled, scaled.row_distances(self.camera_params['max_distance_m']))
+        return self.geometry_cache[key]
+
+    def estimate_distance(self, object_class, bbox_width, frame_width, source=None):
         """
         Estimate distance using the apparent size method
-        
+
         Args:
             object_class: Class of the detected object (e.g., 'person', 'dog', 'cow')
             bbox_width: Width of the bounding box in pixels
             frame_width: Width of the frame in pixels
-            
+            source: Camera name, for its calibration
+
         Returns:
-            Estimated distance in meters
+            Estimated distance in meters, NaN for classes of unknown width
         """
-        # Get the known width for this object class
-        if object_class in self.camera_params['known_width']:
-            known_width = self.camera_params['known_width'][object_class]
-        else:
-            # Default to person if class not found
-            known_width = self.camera_params['known_width']['person']
-        
-        # Calculate distance using the formula: distance = (known_width * focal_length) / bbox_width
-        distance = (known_width * self.camera_params['focal_length']) / bbox_width
-        
-        return distance
\ No newline at end of file
+        return float(self.estimate_distances([object_class], [bbox_width], frame_width, source=source)[0])
+
+    def estimate_distances(self, object_classes, bbox_widths, frame_width, frame_height=None, source=None):
+        """
+        Estimate distances for many boxes at once using the apparent size method
+
+        Args:
+            object_classes: Sequence of class names, one per box
+            bbox_widths: Array of bounding box widths in pixels
+            frame_width: Width of the frame in pixels
+            frame_height: Height of the frame in pixels (None assumes the calibration's aspect ratio)
+            source: Camera name, for its calibration
+
+        Returns:
+            NumPy array of estimated distances in meters, NaN for classes of unknown width
+        """
+        object_classes = np.asarray(object_classes, dtype=str)
+        bbox_widths = np.asarray(bbox_widths, dtype=np.float64)
+        if len(object_classes) == 0:
+            return np.zeros(0)
+
+        # Look up each distinct class once, ignoring the case of model labels
+        known_widths = {name.lower(): width for name, width in self.camera_params['known_width'].items()}
+        unique_classes, inverse = np.unique(np.char.lower(object_classes), return_inverse=True)
+        widths = np.array([
+            known_widths.get(object_class, np.nan)
+            for object_class in unique_classes.tolist()
+        ])[inverse.reshape(-1)]
+
+        # Degenerate boxes are clamped to one pixel instead of producing infinities
+        calibration, _ = self.geometry(frame_width, frame_height, source)
+        return (widths * calibration.fx) / np.maximum(bbox_widths, 1.0)
+
+    def ground_distances(self, bottom_rows, frame_width, frame_height=None, source=None):
+        """
+        Distances of points on the road from their pixel rows (e.g. box bottom edges)
+
+        Returns:
+            NumPy float32 array of distances in meters, NaN at or above the horizon
+        """
+        _, table = self.geometry(frame_width, frame_height, source)
+        rows = np.clip(np.asarray(bottom_rows, dtype=np.float64), 0, len(table) - 1).astype(np.intp)
+        return table[rows]
+
+    def estimate(self, object_classes, boxes, frame_width, frame_height=None, source=None):
+        """
+        Distance for every box, by the method suited to its class
+
+        Args:
+            object_classes: Sequence of class names, one per box
+            boxes: (N, 4) array of x1, y1, x2, y2 in frame pixels
+            frame_width, frame_height: Frame size in pixels
+            source: Camera name, for its calibration
+
+        Returns:
+            NumPy float32 array of distances in meters, NaN where no method applies
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        distances = np.full(len(boxes), np.nan, dtype=np.float32)
+        if len(boxes) == 0:
+            return distances
+
+        # Model labels may be capitalized ("Pothole"); class settings are matched case-insensitively
+        object_classes = np.char.lower(np.asarray(object_classes, dtype=str))
+        ground = np.isin(object_classes, [name.lower() for name in self.camera_params['ground_plane_classes']])
+        sized = ~ground & np.isin(object_classes, [name.lower() for name in self.camera_params['known_width']])
+        if ground.any():
+            distances[ground] = self.ground_distances(boxes[ground, 3], frame_width, frame_height, source)
+        if sized.any():
+            distances[sized] = self.estimate_distances(
+                object_classes[sized], boxes[sized, 2] - boxes[sized, 0], frame_width, frame_height, source
+            )
+        return distances
@@ -0,0 +1,345 @@
+"""
+Durable outbound email for hazard reports
+
+Reports are written to an outbox collection and a background worker sends
+them as per-authority digests over a single reused SMTP session, retrying
+failures with exponential backoff. Pending mail survives restarts.
+
+To try it locally without a real mail server:
+    python -m aiosmtpd -n -l localhost:8025
+    EMAIL_HOST=localhost EMAIL_PORT=8025 EMAIL_USE_TLS=false python main.py
+"""
+import asyncio
+import os
+import random
+import smtplib
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from config import EMAIL_OUTBOX_SETTINGS
+
+# Report times are shown in IST (UTC+5:30)
+IST = timezone(timedelta(hours=5, minutes=30))
+
+def smtp_settings_from_env():
+    return {
+        "host": os.getenv("EMAIL_HOST", "smtp.gmail.com"),
+        "port": int(os.getenv("EMAIL_PORT", "587")),
+        "user": os.getenv("EMAIL_USER", ""),
+        "password": os.getenv("EMAIL_PASSWORD", ""),
+        "use_tls": os.getenv("EMAIL_USE_TLS", "true").lower() != "false",
+        "sender": os.getenv("SENDER_EMAIL") or os.getenv("EMAIL_USER", "")
+    }
+
+class SMTPSession:
+    """
+    One authenticated SMTP connection, opened on demand and reused
+
+    The connection is checked with NOOP before reuse and closed after
+    idle_timeout seconds without mail. Not thread-safe: EmailOutbox drives it
+    from a single worker thread.
+    """
+
+    def __init__(self, settings, idle_timeout=None):
+        self.settings = settings
+        self.idle_timeout = idle_timeout or EMAIL_OUTBOX_SETTINGS["smtp_idle_timeout_s"]
+        self.server = None
+        self.last_used = 0.0
+        self.connections_opened = 0
+
+    def _connect(self):
+        server = smtplib.SMTP(self.settings["host"], self.settings["port"], timeout=30)
+        if self.settings["use_tls"]:
+            server.starttls()
+        if self.settings["user"]:
+            server.login(self.settings["user"], self.settings["password"])
+        self.connections_opened += 1
+        return server
+
+    def _alive(self):
+        try:
+            return self.server.noop()[0] == 250
+        except smtplib.SMTPException:
+            return False
+        except OSError:
+            return False
+
+    def send(self, recipients, message):
+        if self.server is not None and (time.monotonic() - self.last_used > self.idle_timeout or not self._alive()):
+            self.close()
+        if self.server is None:
+            self.server = self._connect()
+        try:
+            self.server.sendmail(self.settings["sender"], recipients, message)
+        except (smtplib.SMTPServerDisconnected, OSError):
+            # Stale connection: reconnect once and retry
+            self.close()
+            self.server = self._connect()
+            self.server.sendmail(self.settings["sender"], recipients, message)
+        self.last_used = time.monotonic()
+
+    def close_if_idle(self):
+        if self.server is not None and time.monotonic() - self.last_used > self.idle_timeout:
+            self.close()
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.server = None
+
+def format_report_time(timestamp):
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is None:
+            # Mongo returns naive UTC datetimes
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return timestamp.astimezone(IST).strftime("%Y-%m-%d %I:%M:%S %p IST")
+    return str(timestamp)
+
+def build_digest(sender, authority, entries):
+    """MIME message for one or more outbox entries addressed to the same authority"""
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = authority
+
+    if len(entries) == 1:
+        entry = entries[0]
+        msg['Subject'] = f"Road Hazard Alert: {entry['type'].capitalize()} Detected"
+        body = f"""
+        <html>
+        <body>
+            <h2>Road Hazard Alert</h2>
+            <p><strong>Type:</strong> {entry['type'].capitalize()}</p>
+            <p><strong>Location:</strong> Lat: {entry['location']['lat']}, Lng: {entry['location']['lng']}</p>
+            <p><strong>Date & Time:</strong> {format_report_time(entry['timestamp'])}</p>
+            <p><strong>Map:</strong> <a href="{entry['map_link']}">View Location</a></p>
+            <p>There is a possible road hazard at the specified location. Please take appropriate action.</p>
+        </body>
+        </html>
+        """
+    else:
+        msg['Subject'] = f"Road Hazard Alert: {len(entries)} Hazards Detected"
+        rows = "\n".join(
+            f"<tr><td>{entry['type'].capitalize()}</td>"
+            f"<td>{entry['location']['lat']}, {entry['location']['lng']}</td>"
+            f"<td>{format_report_time(entry['timestamp'])}</td>"
+            f"<td><a href=\"{entry['map_link']}\">View Location</a></td></tr>"
+            for entry in entries
+        )
+        body = f"""
+        <html>
+        <body>
+            <h2>Road Hazard Alert</h2>
+            <p>{len(entries)} possible road hazards were reported. Please take appropriate action.</p>
+            <table border="1" cellpadding="4" cellspacing="0">
+                <tr><th>Type</th><th>Location (Lat, Lng)</th><th>Date & Time</th><th>Map</th></tr>
+                {rows}
+            </table>
+        </body>
+        </html>
+        """
+    # utf-8 is sent base64-encoded, which keeps long digests within SMTP's line limit
+    msg.attach(MIMEText(body, 'html', 'utf-8'))
+    return msg.as_string()
+
+class EmailOutbox:
+    """
+    Persistent email queue drained by a background worker
+
+    Entries are claimed per authority once the oldest has waited digest_window
+    seconds (or max_digest_size are pending), sent as one digest, and marked
+    sent. Failed sends are retried with exponential backoff and jitter until
+    max_attempts; entries left claimed by a crashed worker are reclaimed.
+    """
+
+    def __init__(self, collection, smtp_settings=None):
+        self.collection = collection
+        self.smtp_settings = smtp_settings
+        self.session = None
+        self.executor = None   # One thread, so the SMTP session is only ever used from it
+        self.worker_id = uuid.uuid4().hex
+        self.task = None
+        self.wake = None
+        self.sent_messages = 0
+
+    async def enqueue(self, report_id, report_type, location, timestamp, map_link, authority):
+        """Store an email for a report; the worker sends it with the authority's next digest"""
+        await self.enqueue_many([{
+            "_id": report_id, "type": report_type, "location": location, "timestamp": timestamp, "map_link": map_link
+        }], authority)
+
+    async def enqueue_many(self, reports, authority):
+        """Store emails for stored report documents with one insert"""
+        now = datetime.now(timezone.utc)
+        await self.collection.insert_many([
+            {
+                "report_id": str(report["_id"]),
+                "type": report["type"],
+                "location": {"lat": report["location"]["lat"], "lng": report["location"]["lng"]},
+                "timestamp": report["timestamp"],
+                "map_link": report["map_link"],
+                "authority": authority,
+                "status": "pending",
+                "attempts": 0,
+                "created_at": now,
+                "next_attempt_at": now
+            }
+            for report in reports
+        ])
+        if self.wake is not None:
+            self.wake.set()
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("status", 1), ("next_attempt_at", 1)], name="status_next_attempt")
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.wake = asyncio.Event()
+            self.task = asyncio.create_task(self.run())
+        return self.task
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.executor is not None:
+            if self.session is not None:
+                await asyncio.get_running_loop().run_in_executor(self.executor, self.session.close)
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    async def run(self):
+        try:
+            await self.ensure_indexes()
+        except Exception as e:
+            print(f"Error creating email outbox indexes: {str(e)}")
+        while True:
+            try:
+                await self.reclaim_stale()
+                while await self.drain_once():
+                    pass
+                if self.session is not None:
+                    await self._in_smtp_thread(self.session.close_if_idle)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Email outbox error: {str(e)}")
+            # New mail wakes the worker early, but digests still wait out their window
+            try:
+                await asyncio.wait_for(self.wake.wait(), EMAIL_OUTBOX_SETTINGS["poll_interval_s"])
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+
+    async def reclaim_stale(self):
+        """Return entries claimed by a worker that died mid-send to the queue"""
+        stale = datetime.now(timezone.utc) - timedelta(seconds=EMAIL_OUTBOX_SETTINGS["stale_claim_s"])
+        await self.collection.update_many(
+            {"status": "sending", "claimed_at": {"$lt": stale}},
+            {"$set": {"status": "pending"}, "$unset": {"claimed_by": "", "claimed_at": ""}}
+        )
+
+    async def drain_once(self):
+        """Send at most one digest per authority that is due; returns whether anything was sent"""
+        now = datetime.now(timezone.utc)
+        window_start = now - timedelta(seconds=EMAIL_OUTBOX_SETTINGS["digest_window_s"])
+        max_size = EMAIL_OUTBOX_SETTINGS["max_digest_size"]
+        due = await self.collection.aggregate([
+            {"$match": {"status": "pending", "next_attempt_at": {"$lte": now}}},
+            {"$group": {"_id": "$authority", "oldest": {"$min": "$created_at"}, "count": {"$sum": 1}}}
+        ]).to_list(length=None)
+
+        sent_any = False
+        for group in due:
+            oldest = group["oldest"]
+            if oldest.tzinfo is None:
+                oldest = oldest.replace(tzinfo=timezone.utc)
+            if oldest > window_start and group["count"] < max_size:
+                continue  # Still collecting this authority's digest
+            if await self.send_digest(group["_id"], now, max_size):
+                sent_any = True
+        return sent_any
+
+    async def send_digest(self, authority, now, max_size):
+        # Claim a batch so concurrent workers (other server processes) don't send it too
+        candidates = await self.collection.find(
+            {"status": "pending", "authority": authority, "next_attempt_at": {"$lte": now}},
+            {"_id": 1}
+        ).sort("created_at", 1).limit(max_size).to_list(length=max_size)
+        claim = uuid.uuid4().hex
+        await self.collection.update_many(
+            {"_id": {"$in": [entry["_id"] for entry in candidates]}, "status": "pending"},
+            {"$set": {"status": "sending", "claimed_by": claim, "claimed_at": now}}
+        )
+        entries = await self.collection.find({"claimed_by": claim}).sort("created_at", 1).to_list(length=max_size)
+        if not entries:
+            return False
+
+        ids = [entry["_id"] for entry in entries]
+        try:
+            if self.session is None:
+                self.session = SMTPSession(self.smtp_settings or smtp_settings_from_env())
+            message = build_digest(self.session.settings["sender"], authority, entries)
+            await self._in_smtp_thread(self.session.send, [authority], message)
+        except Exception as e:
+            await self._schedule_retry(entries, str(e))
+            print(f"Email to {authority} failed ({len(entries)} reports): {str(e)}")
+            return False
+
+        await self.collection.update_many(
+            {"_id": {"$in": ids}},
+            {"$set": {"status": "sent", "sent_at": datetime.now(timezone.utc)}, "$unset": {"claimed_by": "", "claimed_at": ""}}
+        )
+        self.sent_messages += 1
+        print(f"Email sent to {authority} for {len(entries)} report(s)")
+        return True
+
+    async def _schedule_retry(self, entries, error):
+        """Count a failed attempt against every entry of a digest, backing each off by its own attempt count"""
+        # Entries join digests at different times, so they can be on different attempts
+        by_attempts = {}
+        for entry in entries:
+            by_attempts.setdefault(entry.get("attempts", 0), []).append(entry["_id"])
+
+        for previous, ids in by_attempts.items():
+            attempts = previous + 1
+            failed = attempts >= EMAIL_OUTBOX_SETTINGS["max_attempts"]
+            delay = min(EMAIL_OUTBOX_SETTINGS["backoff_base_s"] * 2 ** (attempts - 1), EMAIL_OUTBOX_SETTINGS["backoff_max_s"])
+            delay *= random.uniform(0.8, 1.2)
+            await self.collection.update_many(
+                {"_id": {"$in": ids}},
+                {
+                    "$inc": {"attempts": 1},
+                    "$set": {
+                        "status": "failed" if failed else "pending",
+                        "last_error": error,
+                        "next_attempt_at": datetime.now(timezone.utc) + timedelta(seconds=delay)
+                    },
+                    "$unset": {"claimed_by": "", "claimed_at": ""}
+                }
+            )
+
+    async def _in_smtp_thread(self, func, *args):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def status(self):
+        counts = await self.collection.aggregate([
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]).to_list(length=None)
+        return {
+            "running": self.task is not None and not self.task.done(),
+            "queued": {group["_id"]: group["count"] for group in counts},
+            "smtp_connections_opened": self.session.connections_opened if self.session else 0,
+            "messages_sent": self.sent_messages
+        }
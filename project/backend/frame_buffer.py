@@ -0,0 +1,197 @@
+import threading
+import uuid
+import numpy as np
+from multiprocessing import shared_memory
+
+class SharedFrameHandle:
+    """Picklable reference to a frame in a shared-memory ring, for inference worker processes"""
+
+    def __init__(self, ring_name, shm_name, slots, shape, dtype, index):
+        self.ring_name = ring_name
+        self.shm_name = shm_name
+        self.slots = slots
+        self.shape = shape
+        self.dtype = dtype
+        self.index = index
+
+# Shared-memory blocks this process has attached to: ring name -> (block, frames array)
+_attached = {}
+# Detached blocks that frames still in use reference; closed once they are released
+_retired = []
+
+def _close_retired():
+    for shm in list(_retired):
+        try:
+            shm.close()
+            _retired.remove(shm)
+        except BufferError:
+            pass
+
+def resolve_frame(frame):
+    """
+    Return the ndarray for a frame, attaching to shared memory once per process if needed
+
+    A ring gets a new block whenever its frame size changes (or its camera is
+    re-added); the mapping of the ring's previous block is then closed.
+    """
+    if not isinstance(frame, SharedFrameHandle):
+        return frame
+    attached = _attached.get(frame.ring_name)
+    if attached is None or attached[0].name != frame.shm_name:
+        if attached is not None:
+            del _attached[frame.ring_name]
+            _retired.append(attached[0])
+            attached = None
+        _close_retired()
+        shm = shared_memory.SharedMemory(name=frame.shm_name)
+        attached = _attached[frame.ring_name] = (
+            shm, np.ndarray((frame.slots,) + tuple(frame.shape), dtype=frame.dtype, buffer=shm.buf)
+        )
+    return attached[1][frame.index]
+
+class FrameRef:
+    """A pinned ring slot; the capture thread won't overwrite it until released"""
+
+    def __init__(self, ring, index, sequence, timestamp):
+        self.ring = ring
+        self.index = index
+        self.sequence = sequence
+        self.timestamp = timestamp
+        self.frame = ring.buffers[index]
+        self.released = False
+
+    def shared_handle(self):
+        """Handle a worker process can resolve without pickling the pixels (None if not shared)"""
+        if self.ring.shm is None:
+            return None
+        return SharedFrameHandle(
+            self.ring.name, self.ring.shm.name, self.ring.slots, self.frame.shape, self.frame.dtype.str, self.index
+        )
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.ring._unpin(self.index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+class FrameRing:
+    """
+    Ring of preallocated frame buffers written by a single capture thread
+
+    The writer reads each frame straight into a free slot (cap.read(image=...)),
+    then publishes it with a sequence number and capture timestamp. Readers pin
+    the latest slot while they use it, so frames are never copied or torn; the
+    writer skips pinned slots and drops a frame only if every slot is pinned.
+    Optionally the buffers live in shared memory so inference worker processes
+    can read frames without pickling them. Listeners are called on every
+    publish, so asyncio readers can be woken instead of polling.
+    """
+
+    def __init__(self, slots=4, shared=False, name=None):
+        self.name = name or uuid.uuid4().hex  # Identifies the ring to worker processes across reallocations
+        self.slots = slots
+        self.shared = shared
+        self.buffers = None
+        self.shm = None
+        self.pins = [0] * slots
+        self.sequences = [0] * slots
+        self.timestamps = [0.0] * slots
+        self.sequence = 0         # Sequence of the latest published frame, 0 before the first
+        self.latest_index = None
+        self.dropped_frames = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.listeners = set()
+
+    def _allocate(self, shape, dtype):
+        self._free_shared_memory()
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if self.shared:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.slots * nbytes)
+            self.buffers = np.ndarray((self.slots,) + tuple(shape), dtype=dtype, buffer=self.shm.buf)
+        else:
+            self.buffers = np.empty((self.slots,) + tuple(shape), dtype=dtype)
+        self.sequences = [0] * self.slots
+        self.latest_index = None
+
+    def acquire_write_slot(self, shape, dtype=np.uint8):
+        """
+        Index of a slot the writer may fill next, or None if every candidate is pinned
+
+        The latest published slot is never handed out, so a reader can always pin it.
+        """
+        with self.condition:
+            if self.buffers is None or self.buffers.shape[1:] != tuple(shape) or self.buffers.dtype != dtype:
+                if any(self.pins):
+                    self.dropped_frames += 1
+                    return None
+                self._allocate(shape, dtype)
+            
+            start = 0 if self.latest_index is None else self.latest_index + 1
+            for offset in range(self.slots):
+                index = (start + offset) % self.slots
+                if index != self.latest_index and self.pins[index] == 0:
+                    return index
+            self.dropped_frames += 1
+            return None
+
+    def publish(self, index, timestamp):
+        """Make a filled slot the latest frame and wake up waiting readers"""
+        with self.condition:
+            self.sequence += 1
+            self.sequences[index] = self.sequence
+            self.timestamps[index] = timestamp
+            self.latest_index = index
+            self.condition.notify_all()
+            for listener in self.listeners:
+                listener()
+
+    def add_listener(self, listener):
+        """Call listener() (from the capture thread) whenever a frame is published"""
+        with self.condition:
+            self.listeners.add(listener)
+
+    def remove_listener(self, listener):
+        with self.condition:
+            self.listeners.discard(listener)
+
+    def latest(self, newer_than=0):
+        """Pin and return the latest frame if its sequence is above newer_than, else None"""
+        with self.condition:
+            if self.latest_index is None or self.sequence <= newer_than:
+                return None
+            index = self.latest_index
+            self.pins[index] += 1
+            return FrameRef(self, index, self.sequences[index], self.timestamps[index])
+
+    def wait_for_newer(self, sequence, timeout=None):
+        """Block until a frame newer than sequence is published (or timeout); returns a pinned FrameRef or None"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence > sequence or self.closed, timeout)
+            return self.latest(sequence)
+
+    def _unpin(self, index):
+        with self.condition:
+            self.pins[index] -= 1
+
+    def _free_shared_memory(self):
+        if self.shm is not None:
+            self.buffers = None
+            try:
+                self.shm.close()
+            except BufferError:
+                # Frames handed out earlier still reference the block; it is freed with them
+                pass
+            self.shm.unlink()
+            self.shm = None
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self._free_shared_memory()
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import struct
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from config import STREAM_SETTINGS
+from metrics import timed, stage_seconds
+
+def pack_message(header, jpeg_bytes):
+    """
+    Pack metadata and an image into a single binary WebSocket message
+
+    Layout: 4-byte big-endian header length, UTF-8 JSON header, JPEG bytes
+    (the JPEG part is empty for metadata-only messages).
+    """
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    return struct.pack('>I', len(header_bytes)) + header_bytes + jpeg_bytes
+
+class FrameEncoder:
+    """Resize and JPEG-encode frames in a small thread pool (cv2 releases the GIL)"""
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or STREAM_SETTINGS["encoder_workers"]
+        self.executor = None
+
+    def _get_executor(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="encoder")
+        return self.executor
+
+    async def run(self, func, *args):
+        """Run other per-frame image work (e.g. drawing) on the encoder threads"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    async def encode(self, frame, scale, quality):
+        with timed(stage_seconds, stage="encode"):
+            return await self.run(encode_jpeg, frame, scale, quality)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+def encode_jpeg(frame, scale, quality):
+    if scale < 1.0:
+        height, width = frame.shape[:2]
+        frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    _, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    return jpeg.tobytes()
+
+class EncodedFrame:
+    """
+    A processed frame published to all clients
+
+    Holds the undecorated camera frame and, when any client wants server-side
+    rendering, the frame with overlays drawn. Encodings are produced on first
+    request for each (kind, scale, quality) and shared, so clients at the same
+    level cost a single encode.
+    """
+
+    def __init__(self, raw_frame, vis_frame, metadata, encoder, sequence=0):
+        self.raw_frame = raw_frame
+        self.vis_frame = vis_frame
+        self.metadata = metadata
+        self.encoder = encoder
+        self.sequence = sequence
+        self.encodings = {}
+
+    async def jpeg(self, scale, quality, rendered=True):
+        # Frames published while nobody wanted overlays only have the raw image
+        frame = self.vis_frame if rendered and self.vis_frame is not None else self.raw_frame
+        if frame is None:
+            return b""
+        key = (frame is self.vis_frame, scale, quality)
+        if key not in self.encodings:
+            self.encodings[key] = asyncio.ensure_future(self.encoder.encode(frame, scale, quality))
+        return await self.encodings[key]
+
+class StreamQuality:
+    """
+    Per-client quality controller
+
+    Keeps rolling estimates of the client's bandwidth and of the message size
+    at each (scale, quality) level. Steps down the ladder when sends are slow
+    relative to the frame interval, the client is dropping frames, or the
+    current level's frames need more than the bandwidth allows at the frame
+    rate; steps back up after a run of fast sends, but only to a level whose
+    frames fit the bandwidth.
+    """
+
+    def __init__(self, frame_interval, levels=None):
+        self.levels = [tuple(level) for level in (levels or STREAM_SETTINGS["quality_levels"])]
+        self.frame_interval = frame_interval
+        self.level_index = 0
+        self.fast_sends = 0
+        self.bandwidth = None  # Bytes per second
+        self.sizes = {}        # Level index -> average message size in bytes
+
+    def level(self):
+        return self.levels[self.level_index]
+
+    def frame_budget(self):
+        """Bytes per frame the client's link sustains at the frame rate, or None before any estimate"""
+        if self.bandwidth is None:
+            return None
+        return self.bandwidth * self.frame_interval * STREAM_SETTINGS["bandwidth_headroom"]
+
+    def expected_size(self, index):
+        """Average message size at a level, extrapolated from the current level until it was used"""
+        if index in self.sizes:
+            return self.sizes[index]
+        current = self.sizes.get(self.level_index)
+        if current is None:
+            return None
+        # JPEG size grows roughly with pixel count and quality
+        scale, quality = self.levels[index]
+        current_scale, current_quality = self.levels[self.level_index]
+        return current * (scale / current_scale) ** 2 * (quality / current_quality)
+
+    def fits(self, index):
+        budget, size = self.frame_budget(), self.expected_size(index)
+        return budget is None or size is None or size <= budget
+
+    def record_send(self, size, seconds, dropped_frames, image=True):
+        """
+        Update the estimates with one send and pick the level for the next frame
+
+        Args:
+            size: Message size in bytes
+            seconds: Time websocket.send_bytes took
+            dropped_frames: Frames dropped from the client's queue since the last send
+            image: Whether the message carried a frame; metadata-only messages
+                are too small to measure the link
+        """
+        if image:
+            if seconds > 0:
+                sample = size / seconds
+                self.bandwidth = sample if self.bandwidth is None else 0.8 * self.bandwidth + 0.2 * sample
+            previous = self.sizes.get(self.level_index)
+            self.sizes[self.level_index] = size if previous is None else 0.8 * previous + 0.2 * size
+        
+        slow = seconds > self.frame_interval * STREAM_SETTINGS["slow_send_ratio"]
+        too_large = not self.fits(self.level_index)
+        if (slow or dropped_frames > 0 or too_large) and self.level_index < len(self.levels) - 1:
+            self.level_index += 1
+            self.fast_sends = 0
+        elif not slow and dropped_frames == 0:
+            self.fast_sends += 1
+            if (
+                self.fast_sends >= STREAM_SETTINGS["step_up_after"] and self.level_index > 0
+                and self.fits(self.level_index - 1)
+            ):
+                self.level_index -= 1
+                self.fast_sends = 0
+
+# Create a global instance
+frame_encoder = FrameEncoder()
@@ -0,0 +1,131 @@
+from collections import deque
+import cv2
+import numpy as np
+from config import SCHEDULER_SETTINGS
+
+class AdaptiveScheduler:
+    """
+    Decide which models run on each frame so the stream keeps up with a target FPS.
+
+    Rolling latencies of both models and of the rest of the pipeline are used to
+    pick the smallest detection intervals that fit the frame budget. On frames
+    where a model is skipped its last detections are reused, shifted by the
+    global image motion measured with phase correlation on small thumbnails.
+    """
+
+    def __init__(self, target_fps=None, max_road_interval=None, max_standard_interval=None, window=None):
+        self.target_fps = target_fps or SCHEDULER_SETTINGS["target_fps"]
+        self.max_intervals = {
+            "road": max_road_interval or SCHEDULER_SETTINGS["max_road_interval"],
+            "standard": max_standard_interval or SCHEDULER_SETTINGS["max_standard_interval"]
+        }
+        window = window or SCHEDULER_SETTINGS["latency_window"]
+        self.latencies = {"road": deque(maxlen=window), "standard": deque(maxlen=window), "overhead": deque(maxlen=window)}
+        self.intervals = {"road": 1, "standard": 1}
+        self.frame_index = 0
+        self.last_boxes = {"road": None, "standard": None}
+        self.offsets = {"road": np.zeros(2), "standard": np.zeros(2)}
+        self.prev_thumbnail = None
+        self.motion_compensation = SCHEDULER_SETTINGS["motion_compensation"]
+
+    @property
+    def frame_budget(self):
+        return 1.0 / self.target_fps
+
+    def plan(self):
+        """Return (run_road, run_standard) for the next frame"""
+        return tuple(
+            self.last_boxes[name] is None or self.frame_index % self.intervals[name] == 0
+            for name in ("road", "standard")
+        )
+
+    def _estimate_shift(self, frame):
+        """Global translation (dx, dy) in full-resolution pixels since the previous frame"""
+        height, width = frame.shape[:2]
+        scale = 160 / width
+        gray = cv2.cvtColor(cv2.resize(frame, (160, max(1, int(height * scale)))), cv2.COLOR_BGR2GRAY)
+        thumbnail = np.float32(gray)
+        shift = np.zeros(2)
+        if self.prev_thumbnail is not None and self.prev_thumbnail.shape == thumbnail.shape:
+            (dx, dy), response = cv2.phaseCorrelate(self.prev_thumbnail, thumbnail)
+            # Low response means no reliable single translation (e.g. forward motion)
+            if response > 0.1:
+                shift = np.array([dx, dy]) / scale
+        self.prev_thumbnail = thumbnail
+        return shift
+
+    def fill_skipped(self, frame, road_boxes, standard_boxes):
+        """
+        Record fresh detections and substitute motion-compensated cached ones for skipped models
+
+        Args:
+            frame: Current BGR frame
+            road_boxes: (N, 6) array from the road model, or None if it was skipped
+            standard_boxes: (N, 6) array from the standard model, or None if it was skipped
+
+        Returns:
+            (road_boxes, standard_boxes) with no None entries
+        """
+        shift = self._estimate_shift(frame) if self.motion_compensation else np.zeros(2)
+        boxes = {"road": road_boxes, "standard": standard_boxes}
+        
+        for name, fresh in boxes.items():
+            if fresh is not None:
+                self.last_boxes[name] = fresh
+                self.offsets[name] = np.zeros(2)
+                continue
+            
+            self.offsets[name] += shift
+            cached = self.last_boxes[name]
+            if cached is None:
+                boxes[name] = np.zeros((0, 6), dtype=np.float32)
+                continue
+            shifted = cached.copy()
+            shifted[:, [0, 2]] += self.offsets[name][0]
+            shifted[:, [1, 3]] += self.offsets[name][1]
+            boxes[name] = shifted
+        
+        self.frame_index += 1
+        return boxes["road"], boxes["standard"]
+
+    def record_latency(self, model_timings, total_seconds):
+        """Feed back how long the models and the whole frame took, then re-plan the intervals"""
+        for name, seconds in model_timings.items():
+            self.latencies[name].append(seconds)
+        self.latencies["overhead"].append(max(total_seconds - sum(model_timings.values()), 0.0))
+        self._adapt()
+
+    def _mean(self, name):
+        samples = self.latencies[name]
+        return sum(samples) / len(samples) if samples else 0.0
+
+    def _adapt(self):
+        road, standard, overhead = self._mean("road"), self._mean("standard"), self._mean("overhead")
+        intervals = {"road": 1, "standard": 1}
+        
+        # Stretch whichever model costs the most per frame until the frame fits the budget
+        while road / intervals["road"] + standard / intervals["standard"] + overhead > self.frame_budget:
+            candidates = [
+                name for name in intervals
+                if intervals[name] < self.max_intervals[name]
+            ]
+            if not candidates:
+                break
+            costs = {"road": road / intervals["road"], "standard": standard / intervals["standard"]}
+            intervals[max(candidates, key=costs.get)] += 1
+        
+        self.intervals = intervals
+
+    def next_delay(self, elapsed):
+        """Seconds to sleep so that frames are produced at the target rate"""
+        return max(self.frame_budget - elapsed, 0.001)
+
+    def stats(self):
+        return {
+            "target_fps": self.target_fps,
+            "road_interval": self.intervals["road"],
+            "standard_interval": self.intervals["standard"],
+            "road_latency": self._mean("road"),
+            "standard_latency": self._mean("standard"),
+            "overhead_latency": self._mean("overhead")
+        }
@@ -0,0 +1,187 @@
+"""
+Removal of resolved hazard reports
+
+A report is resolved when it is older than the cleanup age and no newer
+report exists within the cleanup radius. Runs as a background job with
+progress, or from the command line:
+
+    python hazard_cleanup.py [--dry-run] [--batch-size 1000]
+"""
+import argparse
+import asyncio
+import math
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from config import HAZARD_REPORT_SETTINGS
+
+EARTH_RADIUS_M = 6378100.0
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+def distance_m(lng1, lat1, lng2, lat2):
+    """Great-circle (haversine) distance in metres"""
+    lng1, lat1, lng2, lat2 = map(math.radians, (lng1, lat1, lng2, lat2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+class RecentReportGrid:
+    """
+    Recent report locations bucketed into grid cells at least radius_m tall
+
+    Cells are built server-side by an aggregation; a nearby check then only
+    looks at the neighbouring cells instead of querying the database.
+    """
+
+    def __init__(self, radius_m):
+        self.radius_m = radius_m
+        self.cell_deg = radius_m / METERS_PER_DEGREE
+        self.cells = {}
+
+    def pipeline(self, cutoff):
+        """Aggregation grouping recent reports' coordinates by grid cell"""
+        return [
+            {"$match": {"timestamp": {"$gte": cutoff}, "geo": {"$exists": True}}},
+            {"$project": {
+                "coordinates": "$geo.coordinates",
+                "lng": {"$arrayElemAt": ["$geo.coordinates", 0]},
+                "lat": {"$arrayElemAt": ["$geo.coordinates", 1]}
+            }},
+            {"$group": {
+                "_id": {
+                    "x": {"$floor": {"$divide": ["$lng", self.cell_deg]}},
+                    "y": {"$floor": {"$divide": ["$lat", self.cell_deg]}}
+                },
+                "points": {"$push": "$coordinates"}
+            }}
+        ]
+
+    async def load(self, collection, cutoff):
+        async for cell in collection.aggregate(self.pipeline(cutoff), allowDiskUse=True):
+            self.cells[(int(cell["_id"]["x"]), int(cell["_id"]["y"]))] = cell["points"]
+        return self
+
+    def has_nearby(self, lng, lat):
+        x, y = math.floor(lng / self.cell_deg), math.floor(lat / self.cell_deg)
+        # Longitude degrees shrink towards the poles, so more columns fall within the radius
+        columns = math.ceil(1 / max(math.cos(math.radians(lat)), 1e-6))
+        for dx in range(-columns, columns + 1):
+            for dy in (-1, 0, 1):
+                for point_lng, point_lat in self.cells.get((x + dx, y + dy), ()):
+                    if distance_m(lng, lat, point_lng, point_lat) <= self.radius_m:
+                        return True
+        return False
+
+class CleanupJob:
+    """
+    Batched removal of resolved hazard reports with progress reporting
+
+    One aggregation loads recent reports into a grid, old reports are then
+    streamed with only their coordinates, and resolved ones are removed with
+    one delete_many per batch. With dry_run nothing is deleted.
+    """
+
+    def __init__(self, collection, dry_run=False, batch_size=None, age_days=None, radius_m=None, on_removed=None):
+        self.collection = collection
+        self.on_removed = on_removed   # Called with the IDs of each deleted batch, e.g. to update caches
+        self.id = uuid.uuid4().hex
+        self.dry_run = dry_run
+        self.batch_size = batch_size or HAZARD_REPORT_SETTINGS["cleanup_batch_size"]
+        self.age_days = age_days or HAZARD_REPORT_SETTINGS["cleanup_age_days"]
+        self.radius_m = radius_m or HAZARD_REPORT_SETTINGS["cleanup_radius_m"]
+        self.status = "pending"
+        self.total = 0           # Old reports to examine
+        self.scanned = 0
+        self.resolved = 0        # Reports found resolved (removed unless dry_run)
+        self.removed = 0
+        self.skipped = 0         # Old reports without a geo point (run migrate_geo.py)
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.task = None
+
+    def start(self):
+        """Run the job in the background; the task is kept here so it can't be garbage-collected mid-run"""
+        self.task = asyncio.create_task(self.run())
+        self.task.add_done_callback(self._task_done)
+        return self.task
+
+    def _task_done(self, task):
+        # A cancelled task never reaches run()'s handlers; don't leave the job "running"
+        if self.status in ("pending", "running"):
+            self.status = "cancelled" if task.cancelled() else "failed"
+            self.finished_at = self.finished_at or time.time()
+
+    async def run(self):
+        self.status = "running"
+        self.started_at = time.time()
+        try:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=self.age_days)
+            grid = await RecentReportGrid(self.radius_m).load(self.collection, cutoff)
+
+            old_query = {"timestamp": {"$lt": cutoff}}
+            self.total = await self.collection.count_documents(old_query)
+            cursor = self.collection.find(old_query, {"geo.coordinates": 1}).batch_size(self.batch_size)
+
+            batch = []
+            async for report in cursor:
+                self.scanned += 1
+                coordinates = report.get("geo", {}).get("coordinates")
+                if not coordinates:
+                    self.skipped += 1
+                elif not grid.has_nearby(*coordinates):
+                    batch.append(report["_id"])
+                    self.resolved += 1
+
+                if len(batch) == self.batch_size:
+                    await self._remove(batch)
+                    batch = []
+            await self._remove(batch)
+            self.status = "completed"
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            print(f"Cleanup job {self.id} failed: {self.error}")
+        finally:
+            self.finished_at = time.time()
+        return self
+
+    async def _remove(self, ids):
+        if ids and not self.dry_run:
+            result = await self.collection.delete_many({"_id": {"$in": ids}})
+            self.removed += result.deleted_count
+            if self.on_removed:
+                self.on_removed(ids)
+
+    def progress(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "dry_run": self.dry_run,
+            "total": self.total,
+            "scanned": self.scanned,
+            "percent": round(100 * self.scanned / self.total, 1) if self.total else (100.0 if self.status == "completed" else 0.0),
+            "resolved": self.resolved,
+            "removed": self.removed,
+            "skipped_without_geo": self.skipped,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error
+        }
+
+if __name__ == "__main__":
+    from notification_service import hazard_reports
+
+    parser = argparse.ArgumentParser(description="Remove resolved hazard reports")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be removed without deleting")
+    parser.add_argument("--batch-size", type=int, default=HAZARD_REPORT_SETTINGS["cleanup_batch_size"])
+    args = parser.parse_args()
+
+    async def main():
+        job = CleanupJob(hazard_reports, dry_run=args.dry_run, batch_size=args.batch_size)
+        task = job.start()
+        while not task.done():
+            await asyncio.sleep(1)
+            print(f"{job.scanned}/{job.total} scanned, {job.resolved} resolved")
+        print(job.progress())
+
+    asyncio.run(main())
@@ -0,0 +1,246 @@
+import asyncio
+import json
+import math
+from datetime import datetime
+from fastapi import WebSocket, WebSocketDisconnect
+from config import HAZARD_FEED_SETTINGS
+from hazard_cleanup import distance_m, METERS_PER_DEGREE
+
+class SpatialGrid:
+    """
+    Points bucketed into square lat/lng cells of cell_m metres (of latitude)
+
+    Radius queries only visit the cells that can intersect the circle, so
+    lookups cost the same however many points are indexed elsewhere.
+    """
+
+    def __init__(self, cell_m):
+        self.cell_deg = cell_m / METERS_PER_DEGREE
+        self.cells = {}
+        self.points = {}  # key -> (lng, lat, cell)
+
+    def _cell(self, lng, lat):
+        return math.floor(lng / self.cell_deg), math.floor(lat / self.cell_deg)
+
+    def add(self, key, lng, lat):
+        self.remove(key)
+        cell = self._cell(lng, lat)
+        self.points[key] = (lng, lat, cell)
+        self.cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key):
+        point = self.points.pop(key, None)
+        if point is None:
+            return False
+        members = self.cells[point[2]]
+        members.discard(key)
+        if not members:
+            del self.cells[point[2]]
+        return True
+
+    def within(self, lng, lat, radius_m):
+        """Mapping of key to distance in metres for every point within radius_m"""
+        x, y = self._cell(lng, lat)
+        rows = math.ceil(radius_m / METERS_PER_DEGREE / self.cell_deg)
+        # Longitude degrees shrink towards the poles, so more columns fall within the radius
+        columns = math.ceil(rows / max(math.cos(math.radians(lat)), 1e-6))
+        found = {}
+        for dx in range(-columns, columns + 1):
+            for dy in range(-rows, rows + 1):
+                for key in self.cells.get((x + dx, y + dy), ()):
+                    point_lng, point_lat, _ = self.points[key]
+                    distance = distance_m(lng, lat, point_lng, point_lat)
+                    if distance <= radius_m:
+                        found[key] = distance
+        return found
+
+    def __len__(self):
+        return len(self.points)
+
+class HazardSubscriber:
+    """A connected client: its position, alert radius and the hazards it has been sent"""
+
+    def __init__(self, queue_size=None):
+        self.queue = asyncio.Queue(maxsize=queue_size or HAZARD_FEED_SETTINGS["client_queue_size"])
+        self.position = None   # (lng, lat)
+        self.radius_m = HAZARD_FEED_SETTINGS["default_radius_m"]
+        self.known = set()     # Report IDs the client currently holds
+        self.overflowed = False
+
+    def push(self, message):
+        """
+        Queue an update without blocking the writer
+
+        Updates are deltas, so dropping one would leave the client out of sync.
+        A client that lets its queue fill up is disconnected instead (the None
+        sentinel); it reconnects and gets a fresh snapshot for its position.
+        """
+        if self.overflowed:
+            return
+        if self.queue.full():
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(message)
+
+class HazardFeed:
+    """
+    In-memory index of active hazard reports with per-client nearby pushes
+
+    Reports and subscriber positions live in spatial grids. A new report is
+    pushed to the subscribers within their radius of it, a removed one to the
+    subscribers that were sent it, and a position update pushes the difference
+    between the old and new neighbourhoods. notification_service keeps the
+    index in sync with its writes; each server process holds its own copy.
+    """
+
+    def __init__(self, cell_m=None):
+        cell_m = cell_m or HAZARD_FEED_SETTINGS["cell_m"]
+        self.reports = {}                 # report ID -> public report dict
+        self.report_grid = SpatialGrid(cell_m)
+        self.subscriber_grid = SpatialGrid(cell_m)
+        self.subscribers = set()
+        self.loaded = False
+
+    @staticmethod
+    def public_report(report):
+        timestamp = report.get("timestamp")
+        return {
+            "id": str(report["_id"]),
+            "location": {"lat": report["location"]["lat"], "lng": report["location"]["lng"]},
+            "timestamp": timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp,
+            "type": report.get("type"),
+            "status": report.get("status")
+        }
+
+    async def load(self, collection):
+        """Index every stored report that has a valid location"""
+        try:
+            count = 0
+            async for report in collection.find({}, {"location": 1, "timestamp": 1, "type": 1, "status": 1}):
+                location = report.get("location")
+                if isinstance(location, dict) and "lat" in location and "lng" in location:
+                    self._index(report)
+                    count += 1
+            self.loaded = True
+            print(f"Hazard feed indexed {count} reports")
+        except Exception as e:
+            print(f"Error loading hazard feed index: {str(e)}")
+
+    def _index(self, report):
+        public = self.public_report(report)
+        self.reports[public["id"]] = public
+        self.report_grid.add(public["id"], float(public["location"]["lng"]), float(public["location"]["lat"]))
+        return public
+
+    def add(self, report):
+        """Index a newly stored report and push it to subscribers within their radius"""
+        public = self._index(report)
+        lng, lat = float(public["location"]["lng"]), float(public["location"]["lat"])
+        nearby = self.subscriber_grid.within(lng, lat, HAZARD_FEED_SETTINGS["max_radius_m"])
+        for subscriber, distance in nearby.items():
+            if distance <= subscriber.radius_m and public["id"] not in subscriber.known:
+                subscriber.known.add(public["id"])
+                subscriber.push({"type": "added", "hazards": [dict(public, distance=round(distance, 1))]})
+
+    def remove(self, report_ids):
+        """Drop reports from the index and tell the subscribers that were sent them"""
+        removed = {str(report_id) for report_id in report_ids}
+        for report_id in removed:
+            self.reports.pop(report_id, None)
+            self.report_grid.remove(report_id)
+        for subscriber in self.subscribers:
+            gone = subscriber.known & removed
+            if gone:
+                subscriber.known -= gone
+                subscriber.push({"type": "removed", "ids": sorted(gone)})
+
+    def subscribe(self):
+        subscriber = HazardSubscriber()
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+        self.subscriber_grid.remove(subscriber)
+
+    def update_position(self, subscriber, lat, lng, radius_m=None):
+        """Move a subscriber and push the hazards that entered or left its radius"""
+        if radius_m is not None:
+            subscriber.radius_m = min(max(float(radius_m), 1.0), HAZARD_FEED_SETTINGS["max_radius_m"])
+        subscriber.position = (lng, lat)
+        self.subscriber_grid.add(subscriber, lng, lat)
+
+        nearby = self.report_grid.within(lng, lat, subscriber.radius_m)
+        entered = [
+            dict(self.reports[report_id], distance=round(distance, 1))
+            for report_id, distance in sorted(nearby.items(), key=lambda item: item[1])
+            if report_id not in subscriber.known
+        ]
+        left = subscriber.known - nearby.keys()
+        subscriber.known = set(nearby)
+        if left:
+            subscriber.push({"type": "removed", "ids": sorted(left)})
+        if entered:
+            subscriber.push({"type": "added", "hazards": entered})
+
+    def status(self):
+        return {
+            "loaded": self.loaded,
+            "reports": len(self.reports),
+            "subscribers": len(self.subscribers),
+            "overflowed": sum(1 for subscriber in self.subscribers if subscriber.overflowed)
+        }
+
+hazard_feed = HazardFeed()
+
+async def hazard_feed_endpoint(websocket: WebSocket):
+    """
+    Nearby-hazard push channel
+
+    The client sends {"type": "position", "lat", "lng", "radius"?} whenever it
+    moves; the server sends {"type": "added", "hazards": [...]} and
+    {"type": "removed", "ids": [...]} for hazards entering or leaving the
+    radius (default HAZARD_FEED_SETTINGS["default_radius_m"]).
+    """
+    await websocket.accept()
+    subscriber = hazard_feed.subscribe()
+
+    async def send_updates():
+        while (message := await subscriber.queue.get()) is not None:
+            await websocket.send_text(json.dumps(message, separators=(',', ':')))
+        # Fell too far behind: 1013 asks the client to reconnect and resync
+        print("Hazard feed client fell behind; disconnecting")
+        await websocket.close(code=1013)
+
+    async def receive_positions():
+        while True:
+            message = await websocket.receive_json()
+            if not isinstance(message, dict) or message.get("type") != "position":
+                continue
+            try:
+                lat, lng = float(message["lat"]), float(message["lng"])
+                radius = message.get("radius")
+                if radius is not None:
+                    radius = float(radius)
+                    if not math.isfinite(radius):
+                        continue
+            except (KeyError, TypeError, ValueError):
+                continue
+            if -90 <= lat <= 90 and -180 <= lng <= 180:
+                hazard_feed.update_position(subscriber, lat, lng, radius)
+
+    # Whichever side ends first (client gone, send failed, overflow close) ends the session
+    tasks = {asyncio.create_task(send_updates()), asyncio.create_task(receive_positions())}
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                print(f"Hazard feed error: {str(error)}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        hazard_feed.unsubscribe(subscriber)
@@ -0,0 +1,159 @@
+"""
+Server-side hazard reporting from the detection loop
+
+The inference loop calls hazard_aggregator.observe() for every tracked road
+hazard seen while the camera's position is known. Sightings of the same
+hazard (same track, or within merge_radius_m) are merged into one candidate;
+a candidate seen on enough frames is reported once it has dropped out of
+view for settle_s, and ready candidates are flushed as one batch on a timer.
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from config import HAZARD_INGEST_SETTINGS
+from hazard_feed import SpatialGrid
+
+class HazardCandidate:
+    """Merged sightings of one physical hazard"""
+
+    def __init__(self, candidate_id, hazard_type, source, timestamp):
+        self.id = candidate_id
+        self.type = hazard_type
+        self.source = source
+        self.lat_sum = 0.0
+        self.lng_sum = 0.0
+        self.sightings = 0
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.tracks = set()      # (source, track ID) keys merged into this candidate
+
+    def add(self, lat, lng, timestamp):
+        self.lat_sum += lat
+        self.lng_sum += lng
+        self.sightings += 1
+        self.last_seen = max(self.last_seen, timestamp)
+
+    @property
+    def location(self):
+        """Mean position over all sightings, which averages out GPS jitter"""
+        return {"lat": self.lat_sum / self.sightings, "lng": self.lng_sum / self.sightings}
+
+    def report(self):
+        return {
+            "location": self.location,
+            "timestamp": datetime.fromtimestamp(self.first_seen, timezone.utc),
+            "type": self.type
+        }
+
+class HazardAggregator:
+    """
+    Debounces hazard sightings from the detection loop into batched reports
+
+    store is an async callable taking a list of {"location", "timestamp",
+    "type"} reports (notification_service.store_reports), which deduplicates
+    them against stored reports and writes them with one insert_many.
+    """
+
+    def __init__(self, settings=None):
+        self.settings = settings or HAZARD_INGEST_SETTINGS
+        self.candidates = {}       # candidate ID -> HazardCandidate
+        self.grid = SpatialGrid(self.settings["merge_radius_m"] * 2)
+        self.tracks = {}           # (source, track ID) -> candidate ID
+        self.next_id = 0
+        self.store = None
+        self.unsaved = []          # Reports from a failed flush, retried with the next one
+        self.task = None
+        self.sightings = 0
+        self.reported = 0
+        self.discarded = 0         # Candidates never seen on enough frames
+
+    def observe(self, source, track_id, hazard_type, lat, lng, timestamp):
+        """Record one frame's sighting of a tracked hazard at the camera's position"""
+        if len(self.candidates) >= self.settings["max_pending"] and (source, track_id) not in self.tracks:
+            return
+        self.sightings += 1
+        candidate = self.candidates.get(self.tracks.get((source, track_id)))
+        if candidate is None:
+            candidate = self._nearest(hazard_type, lat, lng)
+        if candidate is None:
+            candidate = HazardCandidate(self.next_id, hazard_type, source, timestamp)
+            self.candidates[candidate.id] = candidate
+            self.next_id += 1
+        if track_id:
+            self.tracks[(source, track_id)] = candidate.id
+            candidate.tracks.add((source, track_id))
+        candidate.add(lat, lng, timestamp)
+        location = candidate.location
+        self.grid.add(candidate.id, location["lng"], location["lat"])
+
+    def _nearest(self, hazard_type, lat, lng):
+        nearby = self.grid.within(lng, lat, self.settings["merge_radius_m"])
+        matches = [(distance, key) for key, distance in nearby.items() if self.candidates[key].type == hazard_type]
+        return self.candidates[min(matches)[1]] if matches else None
+
+    def take_ready(self, now=None, force=False):
+        """Remove and return the reports of candidates that have settled (all of them with force)"""
+        now = now or time.time()
+        ready = []
+        for candidate in list(self.candidates.values()):
+            if not force and now - candidate.last_seen < self.settings["settle_s"]:
+                continue
+            self._forget(candidate)
+            if candidate.sightings >= self.settings["min_sightings"]:
+                ready.append(candidate.report())
+            else:
+                self.discarded += 1
+        return ready
+
+    def _forget(self, candidate):
+        del self.candidates[candidate.id]
+        self.grid.remove(candidate.id)
+        for key in candidate.tracks:
+            self.tracks.pop(key, None)
+
+    async def flush(self, force=False):
+        reports = self.unsaved + self.take_ready(force=force)
+        self.unsaved = []
+        if not reports or self.store is None:
+            return 0
+        try:
+            await self.store(reports)
+            self.reported += len(reports)
+        except Exception as e:
+            self.unsaved = reports[-self.settings["max_pending"]:]
+            print(f"Error storing {len(reports)} hazard reports: {str(e)}")
+            return 0
+        return len(reports)
+
+    def start(self, store):
+        self.store = store
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        return self.task
+
+    async def stop(self):
+        """Stop the flush timer and write out everything still pending"""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.flush(force=True)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.settings["flush_interval_s"])
+            await self.flush()
+
+    def status(self):
+        return {
+            "pending": len(self.candidates),
+            "unsaved": len(self.unsaved),
+            "sightings": self.sightings,
+            "reported": self.reported,
+            "discarded": self.discarded
+        }
+
+hazard_aggregator = HazardAggregator()
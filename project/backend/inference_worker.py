@@ -0,0 +1,132 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from config import INFERENCE_SETTINGS
+from model_loader import warm_up_models, model_status
+
+def _init_worker_process(threads_per_worker, warm_up=False):
+    """
+    Limit intra-op threads so several worker processes don't oversubscribe the
+    CPU, and load the models before the worker takes its first job
+    """
+    if threads_per_worker:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    if warm_up:
+        # An exception here would break the whole pool; the first job retries the load
+        try:
+            warm_up_models()
+        except Exception as e:
+            print(f"Model warm-up failed in worker process: {str(e)}")
+
+def _run_in_worker(func, *args):
+    """Job wrapper in worker processes: the result plus the worker's model status and PID"""
+    result = func(*args)
+    return result, dict(model_status(), pid=os.getpid())
+
+class InferenceWorkerPool:
+    """Run blocking model inference in a thread or process pool off the asyncio event loop"""
+
+    def __init__(self, mode=None, max_workers=None, max_pending=None, threads_per_worker=None):
+        self.mode = mode or INFERENCE_SETTINGS["mode"]
+        self.max_workers = max_workers or INFERENCE_SETTINGS["max_workers"]
+        self.max_pending = max_pending or INFERENCE_SETTINGS["max_pending"]
+        self.threads_per_worker = threads_per_worker or INFERENCE_SETTINGS["threads_per_worker"]
+        self.executor = None
+        self.slots = None
+        self.pending_jobs = 0
+        self.worker_status = {}   # Worker process PID -> model status after its last job
+
+    def _get_executor(self):
+        if self.executor is None:
+            if self.mode == "thread":
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="inference"
+                )
+            elif self.mode == "process":
+                # Spawn instead of fork: the parent already runs capture and torch threads
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker_process,
+                    initargs=(self.threads_per_worker, INFERENCE_SETTINGS["warm_up_on_startup"])
+                )
+            else:
+                raise ValueError(f"Unknown inference pool mode: {self.mode}")
+            print(f"Inference pool started ({self.mode}, {self.max_workers} workers)")
+        return self.executor
+
+    async def run(self, func, *args):
+        """
+        Run func(*args) in the pool and await its result.
+
+        At most max_pending jobs are queued or running at once; further callers
+        wait for a free slot, which keeps memory bounded when inference is saturated.
+        """
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.max_pending)
+        
+        async with self.slots:
+            self.pending_jobs += 1
+            try:
+                return await self._submit(func, *args)
+            finally:
+                self.pending_jobs -= 1
+
+    async def _submit(self, func, *args):
+        loop = asyncio.get_running_loop()
+        if self.mode != "process":
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        # Every job reports back which worker ran it and whether its models are loaded
+        result, status = await loop.run_in_executor(self._get_executor(), _run_in_worker, func, *args)
+        self.worker_status[status["pid"]] = status
+        return result
+
+    async def warm_up(self):
+        """
+        Load and warm up the models inside the pool, where inference will actually run
+
+        Threads share one set of models, so one warm-up covers them. Each
+        worker process has its own: they warm up in the pool initializer, and
+        warm-up jobs are submitted until every worker has reported back, so
+        all of them are started now rather than on their first real frame.
+        A fast worker may take several jobs, hence the rounds.
+        """
+        try:
+            if self.mode != "process":
+                await self.run(warm_up_models)
+                return
+            for _ in range(self.max_workers * 4):
+                missing = self.max_workers - len(self.worker_status)
+                if missing <= 0:
+                    break
+                await asyncio.gather(*[self._submit(warm_up_models) for _ in range(missing)])
+            if len(self.worker_status) < self.max_workers:
+                print(f"Only {len(self.worker_status)} of {self.max_workers} inference workers reported after warm-up")
+        except Exception as e:
+            print(f"Model warm-up failed: {str(e)}")
+
+    def model_status(self):
+        """Model load state as seen by the workers"""
+        if self.mode == "process":
+            # Worker processes hold their own models; report what their last jobs returned
+            statuses = list(self.worker_status.values())
+            if not statuses:
+                return {"ready": False, "backend": None, "models": {}, "workers": {}}
+            return {
+                "ready": all(status["ready"] for status in statuses),
+                "backend": statuses[0]["backend"],
+                "models": statuses[0]["models"],
+                "workers": {pid: status["ready"] for pid, status in self.worker_status.items()}
+            }
+        return model_status()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+# Create a global instance
+inference_pool = InferenceWorkerPool()
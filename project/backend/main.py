@@ -1,21 +1,117 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from pathlib import Path
+import asyncio
 import uvicorn
 
 from camera_manager import camera_manager
-from websocket_server import websocket_endpoint
-from model_loader import road_model, standard_model  # Updated import
-from notification_service import router as notification_router
+from websocket_server import websocket_endpoint, start_inference_loop
+from inference_worker import inference_pool
+from frame_encoder import frame_encoder
+from metrics import metrics
+from notification_service import router as notification_router, mongo_client, ensure_indexes, hazard_reports, email_outbox, store_reports
+from hazard_feed import hazard_feed, hazard_feed_endpoint
+from hazard_ingest import hazard_aggregator
+from config import INFERENCE_SETTINGS
 
 app = FastAPI()
 
 # API Routes
 app.include_router(notification_router, prefix="/api")
 
-# WebSocket Route
+# WebSocket Routes: nearby-hazard pushes, default camera and named camera sources
+app.websocket("/ws/hazards")(hazard_feed_endpoint)
 app.websocket("/ws")(websocket_endpoint)
+app.websocket("/ws/{source}")(websocket_endpoint)
+
+def start_startup_task(name, coroutine):
+    """Run a one-off startup job in the background, keeping it on app.state so it can be cancelled at shutdown"""
+    task = asyncio.create_task(coroutine, name=name)
+    task.add_done_callback(startup_task_done)
+    app.state.startup_tasks.append(task)
+    return task
+
+def startup_task_done(task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Startup task {task.get_name()} failed: {str(task.exception())}")
+
+# Single background inference task shared by all WebSocket clients
+@app.on_event("startup")
+async def start_background_tasks():
+    # Camera streams (config.CAMERA_SOURCES) start here rather than at import, so
+    # spawned inference worker processes, which re-import this module, don't open them
+    camera_manager.start_stream()
+    start_inference_loop()
+    app.state.startup_tasks = []
+    start_startup_task("ensure_indexes", ensure_indexes())
+    start_startup_task("hazard_feed_load", hazard_feed.load(hazard_reports))
+    email_outbox.start()
+    # Reports from the server's own detections are written in batches
+    hazard_aggregator.start(store_reports)
+    if INFERENCE_SETTINGS["warm_up_on_startup"]:
+        # Runs in the background so the API is served while the models load
+        start_startup_task("inference_warm_up", inference_pool.warm_up())
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    startup_tasks = getattr(app.state, "startup_tasks", [])
+    for task in startup_tasks:
+        task.cancel()
+    await asyncio.gather(*startup_tasks, return_exceptions=True)
+    inference_pool.shutdown()
+    frame_encoder.shutdown()
+    # Stops capture and frees any shared-memory frame rings
+    camera_manager.close()
+    # Writes out pending detections before the database and outbox close
+    await hazard_aggregator.stop()
+    await email_outbox.stop()
+    mongo_client.close()
+
+# Configured camera sources and whether their capture threads are running
+@app.get("/api/cameras")
+async def list_cameras():
+    return {"default": camera_manager.default_source, "sources": camera_manager.status()}
+
+# Record a camera's frames with their capture timestamps, for replay as a camera source.
+# Starting and stopping a camera's recording are serialized by its lock, so two
+# concurrent requests can't both pass the check and start two recorders.
+recording_locks = {}
+
+@app.post("/api/cameras/{name}/recording")
+async def start_recording(name: str):
+    source = camera_manager.sources.get(name)
+    if source is None:
+        raise HTTPException(status_code=404, detail=f"Unknown camera source: {name}")
+    async with recording_locks.setdefault(name, asyncio.Lock()):
+        if source.recorder is not None:
+            raise HTTPException(status_code=409, detail="Already recording")
+        return await asyncio.to_thread(source.start_recording)
+
+@app.delete("/api/cameras/{name}/recording")
+async def stop_recording(name: str):
+    source = camera_manager.sources.get(name)
+    if source is None:
+        raise HTTPException(status_code=404, detail=f"Unknown camera source: {name}")
+    async with recording_locks.setdefault(name, asyncio.Lock()):
+        # Waits for the writer to drain its queue
+        status = await asyncio.to_thread(source.stop_recording)
+    if status is None:
+        raise HTTPException(status_code=409, detail="Not recording")
+    return status
+
+# Readiness: model load state and timings
+@app.get("/api/ready")
+async def readiness():
+    status = inference_pool.model_status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+# Prometheus scrape endpoint: per-stage latency histograms and capture/stream counters
+@app.get("/metrics")
+async def prometheus_metrics():
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 # Static Files and SPA Fallback
 frontend_dist = Path(__file__).parent.parent / "frontend" / "dist"
@@ -33,8 +129,5 @@ if frontend_dist.exists():
     async def serve_spa():
         return FileResponse(str(frontend_dist / "index.html"))
 
-# Start Camera Stream (Fixed to Camera 2)
-camera_manager.start_stream()
-
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8000)
@@ -0,0 +1,187 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from config import METRICS_SETTINGS
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+class Metric:
+    """Base for labelled metrics; values are kept per tuple of label values"""
+
+    kind = None
+
+    def __init__(self, registry, name, help_text, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _label_text(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{self._label_text(key)} {value}")
+        return lines
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        if not self.registry.enabled:
+            return
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram in the Prometheus exposition format"""
+
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, labelnames=(), buckets=None):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = sorted(buckets or METRICS_SETTINGS["latency_buckets"])
+
+    def observe(self, value, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        # Only the first bucket that fits is counted; render() accumulates
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            series["counts"][index] += 1
+            series["sum"] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for key, series in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + [float("inf")], series["counts"]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f"{self.name}_bucket{self._label_text(key, ('le', le))} {cumulative}")
+                lines.append(f"{self.name}_sum{self._label_text(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{self._label_text(key)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """
+    Process-wide metrics with Prometheus text rendering
+
+    When disabled, observe/inc return immediately and timed() hands out a
+    shared no-op context manager, so instrumentation costs next to nothing.
+    """
+
+    def __init__(self, enabled=None):
+        self.enabled = METRICS_SETTINGS["enabled"] if enabled is None else enabled
+        self.metrics = []
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(self, name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge(self, name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=None):
+        return self._register(Histogram(self, name, help_text, labelnames, buckets))
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def timed(self, histogram, **labels):
+        """Context manager recording the duration of its block in histogram"""
+        if not self.enabled:
+            return _NO_TIMER
+        return _timer(histogram, labels)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+_NO_TIMER = nullcontext()
+
+@contextmanager
+def _timer(histogram, labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+# Global registry and the pipeline's metrics
+metrics = MetricsRegistry()
+timed = metrics.timed
+
+# Per-stage latency. Stages: capture_read, road_predict, standard_predict,
+# inference, filter, tracking, draw, encode, send, loop
+stage_seconds = metrics.histogram(
+    "hazard_eye_stage_seconds", "Duration of each pipeline stage in seconds", ("stage", "source")
+)
+frames_captured = metrics.counter(
+    "hazard_eye_frames_captured_total", "Frames read from each camera", ("source",)
+)
+capture_frames_dropped = metrics.counter(
+    "hazard_eye_capture_frames_dropped_total", "Captured frames discarded because every ring slot was in use", ("source",)
+)
+camera_reconnects = metrics.counter(
+    "hazard_eye_camera_reconnects_total", "Times a camera source was reopened after a failed read", ("source",)
+)
+frames_processed = metrics.counter(
+    "hazard_eye_frames_processed_total", "Frames run through detection and published", ("source",)
+)
+client_frames_dropped = metrics.counter(
+    "hazard_eye_client_frames_dropped_total", "Frames skipped for WebSocket clients that fell behind", ("source", "mode")
+)
+websocket_clients = metrics.gauge(
+    "hazard_eye_websocket_clients", "Connected WebSocket clients", ("source", "mode")
+)
+bytes_sent = metrics.counter(
+    "hazard_eye_websocket_bytes_sent_total", "Bytes sent to WebSocket clients", ("source", "mode")
+)
+scheduler_interval = metrics.gauge(
+    "hazard_eye_scheduler_interval_frames", "Frames between runs of each model chosen by the scheduler", ("source", "model")
+)
+scheduler_latency = metrics.gauge(
+    "hazard_eye_scheduler_latency_seconds", "Rolling mean latency the scheduler plans with", ("source", "stage")
+)
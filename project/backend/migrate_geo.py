@@ -0,0 +1,72 @@
+"""
+Migrate hazard reports to GeoJSON locations
+
+Adds a GeoJSON "geo" point to every report that only has {"lat", "lng"}
+(converting ISO-string timestamps to dates on the way), then creates the
+2dsphere and timestamp indexes. Safe to re-run: migrated reports are skipped.
+
+Usage (from the backend directory):
+    python migrate_geo.py [--batch-size 1000] [--dry-run]
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from pymongo import UpdateOne
+from notification_service import hazard_reports, geo_point, ensure_indexes
+
+def _valid_location(location):
+    try:
+        return -90 <= float(location["lat"]) <= 90 and -180 <= float(location["lng"]) <= 180
+    except (KeyError, TypeError, ValueError):
+        return False
+
+async def migrate(batch_size=1000, dry_run=False):
+    """
+    Add geo points in batches of bulk updates
+
+    Returns:
+        (migrated, skipped) counts; reports with missing or out-of-range
+        coordinates are skipped, since they would break the 2dsphere index
+    """
+    cursor = hazard_reports.find(
+        {"geo": {"$exists": False}},
+        {"location": 1, "timestamp": 1}
+    ).batch_size(batch_size)
+    
+    operations = []
+    migrated = skipped = 0
+    async for report in cursor:
+        location = report.get("location")
+        if not isinstance(location, dict) or not _valid_location(location):
+            skipped += 1
+            continue
+        
+        update = {"geo": geo_point(location)}
+        if isinstance(report.get("timestamp"), str):
+            update["timestamp"] = datetime.fromisoformat(report["timestamp"].replace('Z', '+00:00'))
+        operations.append(UpdateOne({"_id": report["_id"]}, {"$set": update}))
+        
+        if len(operations) == batch_size:
+            if not dry_run:
+                await hazard_reports.bulk_write(operations, ordered=False)
+            migrated += len(operations)
+            operations = []
+            print(f"Migrated {migrated} reports...")
+    
+    if operations and not dry_run:
+        await hazard_reports.bulk_write(operations, ordered=False)
+    migrated += len(operations)
+    
+    if not dry_run:
+        await ensure_indexes()
+    return migrated, skipped
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add GeoJSON points and geo indexes to hazard reports")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="Count reports to migrate without writing")
+    args = parser.parse_args()
+    
+    migrated, skipped = asyncio.run(migrate(args.batch_size, args.dry_run))
+    action = "Would migrate" if args.dry_run else "Migrated"
+    print(f"{action} {migrated} reports, skipped {skipped} without valid coordinates")
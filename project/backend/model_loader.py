@@ -1,20 +1,264 @@
-from ultralytics import YOLO
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+import numpy as np
+from config import MODEL_WEIGHTS, MODEL_BACKEND
+
+# torch and ultralytics are imported inside the functions that need them so that
+# importing this module stays cheap for processes that never run inference
+
+def _weights_hash(weights_path):
+    """Short SHA-256 of a weights file, used to key exported artifacts"""
+    sha = hashlib.sha256()
+    with open(weights_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()[:16]
+
+def _quantize_onnx(source, target):
+    """Dynamic INT8 quantization for ONNX Runtime, keeping the Ultralytics metadata"""
+    import onnx
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    
+    quantize_dynamic(str(source), str(target), weight_type=QuantType.QUInt8)
+    
+    # Class names, stride and task live in metadata_props; make sure they survive
+    original = onnx.load(str(source))
+    quantized = onnx.load(str(target))
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(original.metadata_props)
+    onnx.save(quantized, str(target))
+
+def export_model(weights_path, backend=None, int8=None, imgsz=None, batch=None, cache_dir=None):
+    """
+    Export a .pt checkpoint to an optimized runtime format once and cache it
+    
+    Args:
+        weights_path: Path to the PyTorch weights (e.g. 'yolov12.pt')
+        backend: 'onnx' or 'openvino'
+        int8: Quantize the exported model to INT8
+        imgsz: Input size baked into the exported graph
+        batch: Largest batch the exported graph accepts; the batch axis is
+            dynamic, so run_models_batch and batch_process can predict lists
+        cache_dir: Directory holding exported artifacts
+        
+    Returns:
+        Path to the cached ONNX file or OpenVINO model directory
+    """
+    backend = backend or MODEL_BACKEND["backend"]
+    int8 = MODEL_BACKEND["int8"] if int8 is None else int8
+    imgsz = imgsz or MODEL_BACKEND["imgsz"]
+    batch = batch or MODEL_BACKEND["batch"]
+    cache_dir = Path(cache_dir or MODEL_BACKEND["cache_dir"])
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    
+    weights_path = Path(weights_path)
+    key = f"{weights_path.stem}-{_weights_hash(weights_path)}-{imgsz}-b{batch}{'-int8' if int8 else ''}"
+    
+    if backend == "onnx":
+        target = cache_dir / f"{key}.onnx"
+    elif backend == "openvino":
+        # Ultralytics recognises OpenVINO models by the '_openvino_model' suffix
+        target = cache_dir / f"{key}_openvino_model"
+    else:
+        raise ValueError(f"Unsupported export backend: {backend}")
+    
+    if target.exists():
+        return target
+    
+    from ultralytics import YOLO
+    
+    print(f"Exporting {weights_path} to {backend}{' (INT8)' if int8 else ''}...")
+    # Several worker processes may export the same model at once. Each one exports
+    # from its own copy of the weights in a staging directory (Ultralytics writes
+    # next to the weights) and os.replace()s the result into place, so the target
+    # only ever appears complete.
+    staging = Path(tempfile.mkdtemp(prefix=f".{key}-", dir=cache_dir))
+    try:
+        model = YOLO(str(shutil.copy2(weights_path, staging)))
+        if backend == "onnx":
+            exported = Path(model.export(format="onnx", imgsz=imgsz, dynamic=True, batch=batch, simplify=True))
+            if int8:
+                quantized = staging / target.name
+                _quantize_onnx(exported, quantized)
+                exported = quantized
+        else:
+            exported = Path(model.export(format="openvino", imgsz=imgsz, dynamic=True, batch=batch, int8=int8))
+        try:
+            os.replace(exported, target)
+        except OSError:
+            # A directory can't replace another worker's finished, non-empty one; keep theirs
+            if not target.exists():
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    
+    print(f"Exported model cached at {target}")
+    return target
+
+def load_model(weights_path, backend=None):
+    """Load a YOLO model from .pt weights, or from its exported artifact for optimized backends"""
+    from ultralytics import YOLO
+    
+    backend = backend or MODEL_BACKEND["backend"]
+    if backend == "pytorch":
+        return YOLO(weights_path)
+    
+    # Exported models go through the same YOLO interface, so predict() results keep their shape
+    return YOLO(str(export_model(weights_path, backend)), task="detect")
+
+def predict_options(backend=None):
+    """Device arguments for model.predict that match the configured backend"""
+    import torch
+    
+    backend = backend or MODEL_BACKEND["backend"]
+    use_cuda = backend == "pytorch" and torch.cuda.is_available()
+    return {
+        "device": "cuda" if use_cuda else "cpu",
+        "half": use_cuda
+    }
+
+class LazyModel:
+    """Thread-safe handle that loads a YOLO model on first use and then behaves like it"""
+
+    def __init__(self, name, weights_path):
+        self.name = name
+        self.weights_path = weights_path
+        self.model = None
+        self.lock = threading.Lock()
+        self.load_seconds = None
+        self.warm_up_seconds = None
+        self.loaded_at = None
+        self.error = None
+
+    def get(self):
+        """Return the loaded model, loading it exactly once across threads"""
+        if self.model is None:
+            with self.lock:
+                if self.model is None:
+                    start = time.perf_counter()
+                    try:
+                        self.model = load_model(self.weights_path)
+                    except Exception as e:
+                        self.error = str(e)
+                        print(f"Error loading {self.name} model ({self.weights_path}): {self.error}")
+                        raise
+                    self.load_seconds = time.perf_counter() - start
+                    self.loaded_at = time.time()
+                    self.error = None
+                    print(f"{self.name.capitalize()} model ({self.weights_path}) loaded in {self.load_seconds:.2f}s")
+        return self.model
+
+    def warm_up(self, imgsz=None):
+        """Load the model and run one dummy inference so the first real frame isn't slow"""
+        model = self.get()
+        if self.warm_up_seconds is None:
+            imgsz = imgsz or MODEL_BACKEND["imgsz"]
+            start = time.perf_counter()
+            model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False, **predict_options())
+            self.warm_up_seconds = time.perf_counter() - start
+        return model
+
+    def status(self):
+        return {
+            "weights": self.weights_path,
+            "loaded": self.model is not None,
+            "warmed_up": self.warm_up_seconds is not None,
+            "load_seconds": self.load_seconds,
+            "warm_up_seconds": self.warm_up_seconds,
+            "loaded_at": self.loaded_at,
+            "error": self.error
+        }
+
+    def __getattr__(self, attr):
+        # Only reached for attributes the handle doesn't define (predict, names, ...)
+        return getattr(self.get(), attr)
+
+# Model handles; nothing is loaded until they are first used
+road_model = LazyModel("road", MODEL_WEIGHTS["road"])
+standard_model = LazyModel("standard", MODEL_WEIGHTS["standard"])
 
 # Load both YOLO models
 def load_models():
-    try:
-        # Load custom model for road hazards (potholes and speedbumps)
-        road_hazard_model = YOLO("yolov12.pt")
-        print("Custom road hazard model (yolov12.pt) loaded successfully")
-        
-        # Load standard YOLOv8n model for general objects
-        standard_model = YOLO("yolov8n.pt")
-        print("YOLOv8n model loaded successfully")
+    return road_model.get(), standard_model.get()
+
+def warm_up_models():
+    """Load both models and run a dummy inference on each, returning the resulting status"""
+    road_model.warm_up()
+    standard_model.warm_up()
+    return model_status()
+
+def model_status():
+    models = {handle.name: handle.status() for handle in (road_model, standard_model)}
+    return {
+        "ready": all(status["loaded"] for status in models.values()),
+        "backend": MODEL_BACKEND["backend"],
+        "models": models
+    }
+
+def check_parity(weights_path, image, backend=None, iou_threshold=0.9, conf_tolerance=0.05):
+    """
+    Compare detections of an exported backend against the PyTorch model
+    
+    Args:
+        weights_path: Path to the PyTorch weights
+        image: Path or BGR array to run both models on
+        backend: Optimized backend to compare ('onnx' or 'openvino')
+        iou_threshold: Minimum IoU for two boxes of the same class to count as a match
+        conf_tolerance: Maximum allowed confidence difference for matched boxes
         
-        return road_hazard_model, standard_model
-    except Exception as e:
-        print(f"Error loading YOLO models: {str(e)}")
-        raise
+    Returns:
+        (passed, report) where report lists matched, missing and extra boxes
+    """
+    from ultralytics import YOLO
+    import torch
+    
+    imgsz = MODEL_BACKEND["imgsz"]
+    reference = YOLO(weights_path).predict(image, imgsz=imgsz, device="cpu", verbose=False)[0].boxes.data.cpu()
+    candidate = load_model(weights_path, backend).predict(image, imgsz=imgsz, device="cpu", verbose=False)[0].boxes.data.cpu()
+    
+    matched, conf_errors = 0, []
+    unmatched = list(range(len(candidate)))
+    for ref in reference:
+        for i in unmatched:
+            box = candidate[i]
+            if int(box[5]) != int(ref[5]):
+                continue
+            # IoU of the two boxes
+            ix1, iy1 = torch.max(ref[0], box[0]), torch.max(ref[1], box[1])
+            ix2, iy2 = torch.min(ref[2], box[2]), torch.min(ref[3], box[3])
+            inter = (ix2 - ix1).clamp(min=0) * (iy2 - iy1).clamp(min=0)
+            union = (ref[2] - ref[0]) * (ref[3] - ref[1]) + (box[2] - box[0]) * (box[3] - box[1]) - inter
+            if union > 0 and inter / union >= iou_threshold:
+                matched += 1
+                conf_errors.append(abs(float(ref[4] - box[4])))
+                unmatched.remove(i)
+                break
+    
+    report = {
+        "reference_boxes": len(reference),
+        "candidate_boxes": len(candidate),
+        "matched": matched,
+        "max_conf_error": max(conf_errors, default=0.0)
+    }
+    passed = matched == len(reference) == len(candidate) and report["max_conf_error"] <= conf_tolerance
+    return passed, report
 
-# Load both models
-road_model, standard_model = load_models()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export YOLO models to an optimized backend and check parity")
+    parser.add_argument("--backend", choices=["onnx", "openvino"], default="onnx")
+    parser.add_argument("--int8", action="store_true", help="Quantize exported models to INT8")
+    parser.add_argument("--parity-image", help="Compare exported detections with PyTorch on this image")
+    args = parser.parse_args()
+    
+    MODEL_BACKEND["int8"] = args.int8
+    for weights in MODEL_WEIGHTS.values():
+        export_model(weights, args.backend)
+        if args.parity_image:
+            passed, report = check_parity(weights, args.parity_image, args.backend)
+            print(f"{weights}: {'PASS' if passed else 'FAIL'} {report}")
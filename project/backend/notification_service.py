@@ -1,28 +1,75 @@
 import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import json
+import base64
 from datetime import datetime, timedelta, timezone
-from pymongo import MongoClient
-from fastapi import APIRouter, HTTPException, Body
+from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import APIRouter, HTTPException, Body, Query, Request, Response
 from pydantic import BaseModel
-from typing import Dict
+from typing import Dict, List, Optional
+from bson.objectid import ObjectId
 from dotenv import load_dotenv
 import asyncio
+from config import MONGODB_SETTINGS, HAZARD_REPORT_SETTINGS, HAZARD_INGEST_SETTINGS
+from hazard_cleanup import CleanupJob, EARTH_RADIUS_M
+from response_cache import ResponseCache, make_etag, etag_matches
+from hazard_feed import hazard_feed, SpatialGrid
+from email_outbox import EmailOutbox
 
 # Load environment variables
 load_dotenv()
 
-# MongoDB connection
-mongo_client = MongoClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
-db = mongo_client["road_hazards"]
+# MongoDB connection (async driver, so queries never block the event loop streaming video)
+mongo_client = AsyncIOMotorClient(
+    os.getenv("MONGODB_URI", "mongodb://localhost:27017"),
+    maxPoolSize=MONGODB_SETTINGS["max_pool_size"],
+    minPoolSize=MONGODB_SETTINGS["min_pool_size"],
+    maxIdleTimeMS=MONGODB_SETTINGS["max_idle_time_ms"],
+    waitQueueTimeoutMS=MONGODB_SETTINGS["wait_queue_timeout_ms"],
+    serverSelectionTimeoutMS=MONGODB_SETTINGS["server_selection_timeout_ms"]
+)
+db = mongo_client[os.getenv("MONGODB_DB", "road_hazards")]
 hazard_reports = db["hazard_reports"]
 
-# Email configuration
-EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
-EMAIL_PORT = int(os.getenv("EMAIL_PORT", "587"))
-EMAIL_USER = os.getenv("EMAIL_USER", "")
-EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD", "")
+# Rendered /hazard-reports pages; cleared whenever reports are inserted or deleted
+report_cache = ResponseCache(HAZARD_REPORT_SETTINGS["cache_entries"], HAZARD_REPORT_SETTINGS["cache_ttl_seconds"])
+
+def reports_removed(report_ids):
+    """Keep the response cache and the nearby-hazard feed in sync with deletions"""
+    report_cache.invalidate()
+    hazard_feed.remove(report_ids)
+
+def geo_point(location):
+    """GeoJSON point for a {"lat", "lng"} location (GeoJSON order is longitude, latitude)"""
+    return {"type": "Point", "coordinates": [float(location["lng"]), float(location["lat"])]}
+
+async def ensure_indexes():
+    """
+    Create the hazard report indexes if they don't exist yet
+    
+    geo_timestamp serves radius queries with a recency filter ($nearSphere,
+    $geoWithin); timestamp serves newest-first listing and age-based cleanup.
+    """
+    try:
+        await hazard_reports.create_index([("geo", "2dsphere"), ("timestamp", -1)], name="geo_timestamp")
+        await hazard_reports.create_index([("timestamp", -1)], name="timestamp")
+    except Exception as e:
+        print(f"Error creating hazard report indexes: {str(e)}")
+
+async def find_recent_report_nearby(location, radius_m=None, days=None):
+    """
+    Nearest report within radius_m metres of location that is less than days old, or None
+    
+    A single indexed $nearSphere query with a true metre radius.
+    """
+    radius_m = radius_m or HAZARD_REPORT_SETTINGS["dedup_radius_m"]
+    days = days or HAZARD_REPORT_SETTINGS["dedup_days"]
+    return await hazard_reports.find_one({
+        "geo": {"$nearSphere": {"$geometry": geo_point(location), "$maxDistance": radius_m}},
+        "timestamp": {"$gte": datetime.now(timezone.utc) - timedelta(days=days)}
+    })
+
+# Authority emails are queued in the database and sent in digests by a background worker
+email_outbox = EmailOutbox(db["email_outbox"])
 AUTHORITY_EMAIL = os.getenv("AUTHORITY_EMAIL", "local.authority@example.com")
 
 # Create router
@@ -34,172 +81,252 @@ class HazardNotification(BaseModel):
     timestamp: datetime
     type: str
 
-@router.post("/hazard-notification")
-async def send_hazard_notification(notification: HazardNotification = Body(...)):
-    try:
-        # Only process pothole notifications
-        if notification.type.lower() != "pothole":
-            return {"success": False, "message": "Only pothole hazards are reported to authorities"}
-            
-        # Check for an existing report (approx. 100m radius)
-        existing_report = hazard_reports.find_one({
-            "location.lat": {"$gte": notification.location["lat"] - 0.001, "$lte": notification.location["lat"] + 0.001},
-            "location.lng": {"$gte": notification.location["lng"] - 0.001, "$lte": notification.location["lng"] + 0.001},
-        })
-        
-        if existing_report:
-            report_time = existing_report.get("timestamp", datetime.min)
-            if isinstance(report_time, str):
-                report_time = datetime.fromisoformat(report_time.replace('Z', '+00:00'))
-            days_difference = (datetime.now() - report_time).days
-            if days_difference < 7:
-                return {"success": False, "message": "Recent report exists for this location"}
-        
-        # Generate Google Maps link using received coordinates
-        map_link = f"https://www.google.com/maps/search/?api=1&query={notification.location['lat']},{notification.location['lng']}"
+def as_report(notification):
+    return {"location": notification.location, "timestamp": notification.timestamp, "type": notification.type}
+
+def map_link_for(location):
+    """Google Maps link for a {"lat", "lng"} location"""
+    return f"https://www.google.com/maps/search/?api=1&query={location['lat']},{location['lng']}"
+
+async def store_reports(reports):
+    """
+    Deduplicate and store hazard reports, writing all new ones with one insert_many
+    
+    Used by both notification endpoints and by the detection loop's
+    hazard_aggregator.
+    
+    Args:
+        reports: List of {"location": {"lat", "lng"}, "timestamp", "type"} dicts
         
-        # Store in MongoDB without image_url field
-        report_id = hazard_reports.insert_one({
-            "location": notification.location,
-            "timestamp": notification.timestamp,
-            "type": notification.type,
-            "map_link": map_link,
+    Returns:
+        One result per report: {"success": True, "report_id"} or {"success": False, "message"}
+    """
+    results = [None] * len(reports)
+    candidates = []
+    for i, report in enumerate(reports):
+        # Only pothole reports go to authorities
+        if report["type"].lower() != "pothole":
+            results[i] = {"success": False, "message": "Only pothole hazards are reported to authorities"}
+        else:
+            candidates.append(i)
+    
+    # Check for recent reports nearby (100 m, last 7 days), concurrently over the connection pool
+    existing = await asyncio.gather(*[find_recent_report_nearby(reports[i]["location"]) for i in candidates])
+    
+    # Reports in the same batch also deduplicate each other
+    accepted = []
+    batch_grid = SpatialGrid(HAZARD_REPORT_SETTINGS["dedup_radius_m"])
+    for i, recent in zip(candidates, existing):
+        location = reports[i]["location"]
+        if recent or batch_grid.within(float(location["lng"]), float(location["lat"]), HAZARD_REPORT_SETTINGS["dedup_radius_m"]):
+            results[i] = {"success": False, "message": "Recent report exists for this location"}
+            continue
+        batch_grid.add(i, float(location["lng"]), float(location["lat"]))
+        accepted.append((i, {
+            "location": location,
+            "geo": geo_point(location),
+            "timestamp": reports[i]["timestamp"],
+            "type": reports[i]["type"],
+            "map_link": map_link_for(location),
             "status": "reported"
-        }).inserted_id
-        
-        # Send email notification with the map link
-        await send_email_to_authority(notification, str(report_id), map_link)
-        
-        return {"success": True, "report_id": str(report_id)}
+        }))
+    if not accepted:
+        return results
     
+    documents = [document for _, document in accepted]
+    result = await hazard_reports.insert_many(documents, ordered=False)
+    report_cache.invalidate()
+    for (i, document), report_id in zip(accepted, result.inserted_ids):
+        document["_id"] = report_id
+        # Push to clients near the new hazard
+        hazard_feed.add(document)
+        results[i] = {"success": True, "report_id": str(report_id)}
+    
+    # Queue the email notifications with the map links
+    await send_email_to_authority(documents)
+    return results
+
+@router.post("/hazard-notification")
+async def send_hazard_notification(notification: HazardNotification = Body(...)):
+    try:
+        return (await store_reports([as_report(notification)]))[0]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process notification: {str(e)}")
 
-# Updated email sending functions
-async def send_email_to_authority(notification, report_id, map_link):
+@router.post("/hazard-notifications")
+async def send_hazard_notifications(notifications: List[HazardNotification] = Body(...)):
+    """Bulk variant of /hazard-notification: one result per notification, in order"""
+    if len(notifications) > HAZARD_INGEST_SETTINGS["max_batch"]:
+        raise HTTPException(status_code=413, detail=f"At most {HAZARD_INGEST_SETTINGS['max_batch']} notifications per request")
     try:
-        asyncio.create_task(_send_email_async(notification, report_id, map_link))
-        return True
+        results = await store_reports([as_report(notification) for notification in notifications])
     except Exception as e:
-        print(f"Error scheduling email: {str(e)}")
-        return False
+        raise HTTPException(status_code=500, detail=f"Failed to process notifications: {str(e)}")
+    return {"success": True, "reported": sum(1 for result in results if result["success"]), "results": results}
 
-async def _send_email_async(notification, report_id, map_link):
+async def send_email_to_authority(reports):
+    """Queue the authority emails for stored reports; delivery happens in the outbox worker"""
     try:
-        email_host = os.getenv("EMAIL_HOST")
-        email_port = int(os.getenv("EMAIL_PORT", "587"))
-        email_user = os.getenv("EMAIL_USER")
-        email_password = os.getenv("EMAIL_PASSWORD")
-        authority_email = os.getenv("AUTHORITY_EMAIL")
-        sender_email = os.getenv("SENDER_EMAIL")
-        
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = authority_email
-        msg['Subject'] = f"Road Hazard Alert: {notification.type.capitalize()} Detected"
-        
-        # Directly convert the timestamp to IST (UTC+5:30)
-        ist_tz = timezone(timedelta(hours=5, minutes=30))
-        ts_ist = notification.timestamp.astimezone(ist_tz)
-        indian_time_str = ts_ist.strftime("%Y-%m-%d %I:%M:%S %p IST")
-        
-        body = f"""
-        <html>
-        <body>
-            <h2>Road Hazard Alert</h2>
-            <p><strong>Type:</strong> {notification.type.capitalize()}</p>
-            <p><strong>Location:</strong> Lat: {notification.location['lat']}, Lng: {notification.location['lng']}</p>
-            <p><strong>Date & Time:</strong> {indian_time_str}</p>
-            <p><strong>Map:</strong> <a href="{map_link}">View Location</a></p>
-            <p>There is a possible road hazard at the specified location. Please take appropriate action.</p>
-        </body>
-        </html>
-        """
-        msg.attach(MIMEText(body, 'html'))
-        
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, lambda: _send_smtp_email(
-            email_host, email_port, email_user, email_password,
-            sender_email, authority_email, msg.as_string()
-        ))
-        
-        print(f"Email sent for report {report_id}")
+        await email_outbox.enqueue_many(reports, os.getenv("AUTHORITY_EMAIL", AUTHORITY_EMAIL))
         return True
     except Exception as e:
-        print(f"Email send error: {e}")
+        print(f"Error queueing email: {str(e)}")
         return False
 
-def _send_smtp_email(host, port, user, password, sender, recipient, message):
-    with smtplib.SMTP(host, port) as server:
-        server.starttls()
-        server.login(user, password)
-        server.sendmail(sender, recipient, message)
+def encode_cursor(report):
+    """Opaque pagination cursor pointing just past report in (timestamp, _id) descending order"""
+    timestamp = report.get("timestamp")
+    if isinstance(timestamp, datetime):
+        position = {"t": timestamp.isoformat(), "id": str(report["_id"])}
+    else:
+        # Reports not yet converted by migrate_geo.py keep their timestamp as a string
+        position = {"s": str(timestamp), "id": str(report["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        timestamp = datetime.fromisoformat(position["t"]) if "t" in position else position["s"]
+        return timestamp, ObjectId(position["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def build_report_query(bbox, lat, lng, radius, updated_since):
+    """Mongo filter for a viewport (bbox) or centre+radius area and an updated_since time"""
+    query = {}
+    if bbox and (lat is not None or lng is not None):
+        raise HTTPException(status_code=400, detail="Use either bbox or lat/lng/radius, not both")
+    
+    if bbox:
+        try:
+            min_lng, min_lat, max_lng, max_lat = (float(value) for value in bbox.split(","))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="bbox must be min_lng,min_lat,max_lng,max_lat")
+        if not (-180 <= min_lng < max_lng <= 180 and -90 <= min_lat < max_lat <= 90):
+            raise HTTPException(status_code=400, detail="bbox is out of range or empty")
+        if max_lng - min_lng < 180 and max_lat - min_lat < 90:
+            ring = [[min_lng, min_lat], [max_lng, min_lat], [max_lng, max_lat], [min_lng, max_lat], [min_lng, min_lat]]
+            query["geo"] = {"$geoWithin": {"$geometry": {"type": "Polygon", "coordinates": [ring]}}}
+        else:
+            # Polygons this large are ambiguous on a sphere; zoomed-out views use plain ranges
+            query["location.lat"] = {"$gte": min_lat, "$lte": max_lat}
+            query["location.lng"] = {"$gte": min_lng, "$lte": max_lng}
+    elif lat is not None or lng is not None:
+        if lat is None or lng is None or radius is None:
+            raise HTTPException(status_code=400, detail="lat, lng and radius are required together")
+        query["geo"] = {"$geoWithin": {"$centerSphere": [[lng, lat], radius / EARTH_RADIUS_M]}}
+    
+    if updated_since:
+        # ObjectIds embed their creation time (to the second), so this selects reports stored since then
+        query["_id"] = {"$gt": ObjectId.from_datetime(updated_since)}
+    return query
 
 @router.get("/hazard-reports")
-async def get_hazard_reports():
-    """Get all hazard reports from the database"""
+async def get_hazard_reports(
+    request: Request,
+    bbox: Optional[str] = Query(None, description="Viewport as min_lng,min_lat,max_lng,max_lat"),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lng: Optional[float] = Query(None, ge=-180, le=180),
+    radius: Optional[float] = Query(None, gt=0, description="Radius in metres around lat/lng"),
+    updated_since: Optional[datetime] = Query(None, description="Only reports stored after this time"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    limit: int = Query(HAZARD_REPORT_SETTINGS["page_size"], ge=1, le=HAZARD_REPORT_SETTINGS["max_page_size"])
+):
+    """
+    Get hazard reports, newest first
+    
+    Filters by viewport or centre+radius and by storage time. Pages hold up to
+    limit reports; when more exist the X-Next-Cursor header holds the cursor
+    for the next page. Responses carry an ETag, and a matching If-None-Match
+    gets an empty 304.
+    """
     try:
-        # Fetch all reports, sort by timestamp descending (newest first)
-        reports = list(hazard_reports.find({}, {'_id': 0}).sort('timestamp', -1))
-        
-        # Convert ObjectId to string for JSON serialization
-        for report in reports:
-            if '_id' in report:
-                report['_id'] = str(report['_id'])
+        key = (bbox, lat, lng, radius, updated_since.isoformat() if updated_since else None, cursor, limit)
+        cached = report_cache.get(key)
+        if cached is None:
+            generation = report_cache.generation
+            query = build_report_query(bbox, lat, lng, radius, updated_since)
+            if cursor:
+                timestamp, report_id = decode_cursor(cursor)
+                query["$or"] = [
+                    {"timestamp": {"$lt": timestamp}},
+                    {"timestamp": timestamp, "_id": {"$lt": report_id}}
+                ]
+                if isinstance(timestamp, datetime):
+                    # Mongo compares dates only with dates; string timestamps sort after all of them
+                    query["$or"].append({"timestamp": {"$type": "string"}})
             
-            # Ensure timestamp is serializable
-            if 'timestamp' in report and isinstance(report['timestamp'], datetime):
-                report['timestamp'] = report['timestamp'].isoformat()
+            # One extra report tells whether another page follows
+            reports = await hazard_reports.find(query, {'geo': 0}).sort(
+                [('timestamp', -1), ('_id', -1)]
+            ).limit(limit + 1).to_list(length=limit + 1)
+            next_cursor = encode_cursor(reports[limit - 1]) if len(reports) > limit else None
+            reports = reports[:limit]
+            
+            for report in reports:
+                del report['_id']
+                # Ensure timestamp is serializable
+                if 'timestamp' in report and isinstance(report['timestamp'], datetime):
+                    report['timestamp'] = report['timestamp'].isoformat()
+            
+            body = json.dumps(reports, separators=(',', ':')).encode('utf-8')
+            cached = (body, make_etag(body), next_cursor)
+            report_cache.put(key, cached, generation)
         
-        return reports
+        body, etag, next_cursor = cached
+        # no-cache: browsers revalidate with If-None-Match instead of reusing stale lists
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch hazard reports: {str(e)}")
 
-@router.delete("/cleanup-resolved-hazards")
-async def cleanup_resolved_hazards():
-    """Remove hazard reports that are older than 7 days and have no recent reports in the same location"""
-    try:
-        # Get the cutoff date (7 days ago)
-        cutoff_date = datetime.now() - timedelta(days=7)
-        
-        # Find all reports older than 7 days
-        old_reports = list(hazard_reports.find({
-            "timestamp": {"$lt": cutoff_date}
-        }))
-        
-        removed_count = 0
-        
-        for report in old_reports:
-            # For each old report, check if there's a newer report within 100m
-            has_newer_report = hazard_reports.find_one({
-                "location.lat": {"$gte": report["location"]["lat"] - 0.001, "$lte": report["location"]["lat"] + 0.001},
-                "location.lng": {"$gte": report["location"]["lng"] - 0.001, "$lte": report["location"]["lng"] + 0.001},
-                "timestamp": {"$gte": cutoff_date}
-            })
-            
-            # If no newer report exists, remove this old report
-            if not has_newer_report:
-                hazard_reports.delete_one({"_id": report["_id"]})
-                removed_count += 1
-        
-        return {
-            "success": True, 
-            "message": f"Removed {removed_count} resolved hazards",
-            "removed_count": removed_count
-        }
+# Cleanup jobs by ID, most recent last
+cleanup_jobs = {}
+MAX_FINISHED_CLEANUP_JOBS = 20
+
+@router.delete("/cleanup-resolved-hazards", status_code=202)
+async def cleanup_resolved_hazards(dry_run: bool = False):
+    """
+    Start a background job removing hazard reports that are older than 7 days
+    and have no recent reports within 100 m; poll its progress at
+    /cleanup-resolved-hazards/{job_id}. With dry_run=true nothing is deleted.
+    """
+    running = [job for job in cleanup_jobs.values() if job.status in ("pending", "running")]
+    if running:
+        raise HTTPException(status_code=409, detail=f"Cleanup job {running[0].id} is already running")
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to cleanup resolved hazards: {str(e)}")
+    # Keep the progress of a few finished jobs around
+    for job_id in list(cleanup_jobs)[:max(len(cleanup_jobs) - MAX_FINISHED_CLEANUP_JOBS + 1, 0)]:
+        del cleanup_jobs[job_id]
+    
+    job = CleanupJob(hazard_reports, dry_run=dry_run, on_removed=reports_removed)
+    cleanup_jobs[job.id] = job
+    job.start()
+    return {"success": True, "job_id": job.id, "status_url": f"/api/cleanup-resolved-hazards/{job.id}"}
+
+@router.get("/cleanup-resolved-hazards/{job_id}")
+async def cleanup_job_progress(job_id: str):
+    """Progress of a cleanup job"""
+    job = cleanup_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Cleanup job {job_id} not found")
+    return job.progress()
 
 # Also add a specific endpoint to delete a single hazard by ID
 @router.delete("/hazard-reports/{report_id}")
 async def delete_hazard_report(report_id: str):
     """Delete a specific hazard report by ID"""
     try:
-        from bson.objectid import ObjectId
-        
         # Convert string ID to MongoDB ObjectId
-        result = hazard_reports.delete_one({"_id": ObjectId(report_id)})
+        result = await hazard_reports.delete_one({"_id": ObjectId(report_id)})
+        if result.deleted_count:
+            reports_removed([report_id])
         
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail=f"Hazard report with ID {report_id} not found")
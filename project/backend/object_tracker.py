@@ -0,0 +1,181 @@
+import math
+import numpy as np
+from config import TRACKER_SETTINGS
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU between (N, 4) and (M, 4) arrays of x1, y1, x2, y2 boxes"""
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+def greedy_match(scores, threshold):
+    """Match rows to columns by descending score; returns a list of (row, col) pairs"""
+    if scores.size == 0:
+        return []
+    rows, cols = np.nonzero(scores >= threshold)
+    order = np.argsort(-scores[rows, cols], kind="stable")
+    matches, used_rows, used_cols = [], set(), set()
+    for row, col in zip(rows[order].tolist(), cols[order].tolist()):
+        if row in used_rows or col in used_cols:
+            continue
+        matches.append((row, col))
+        used_rows.add(row)
+        used_cols.add(col)
+    return matches
+
+class Track:
+    """A single tracked object with a smoothed distance and approach speed"""
+
+    def __init__(self, track_id, box, label, conf, distance, timestamp):
+        self.track_id = track_id
+        self.box = box
+        self.label = label
+        self.conf = conf
+        self.velocity = np.zeros(4)  # Box corner velocity in pixels per second
+        self.distance = distance
+        self.approach_speed = 0.0    # Meters per second, positive when getting closer
+        self.hits = 1
+        self.missed_frames = 0
+        self.last_seen = timestamp
+
+    def predict(self, timestamp):
+        """Constant-velocity box prediction at the given time"""
+        return self.box + self.velocity * (timestamp - self.last_seen)
+
+    def update(self, box, conf, distance, timestamp, smoothing):
+        dt = max(timestamp - self.last_seen, 1e-3)
+        self.velocity = (1 - smoothing) * self.velocity + smoothing * (box - self.box) / dt
+        self.box = box
+        self.conf = conf
+        
+        if distance is not None and math.isfinite(distance):
+            if self.distance is None:
+                self.distance = distance
+            else:
+                smoothed = (1 - smoothing) * self.distance + smoothing * distance
+                speed = (self.distance - smoothed) / dt
+                self.approach_speed = (1 - smoothing) * self.approach_speed + smoothing * speed
+                self.distance = smoothed
+        
+        self.hits += 1
+        self.missed_frames = 0
+        self.last_seen = timestamp
+
+    def time_to_collision(self, min_speed):
+        """Seconds until the object is reached at the current approach speed, or None"""
+        if self.distance is None or self.approach_speed < min_speed:
+            return None
+        return self.distance / self.approach_speed
+
+class ObjectTracker:
+    """
+    IoU tracker with ByteTrack-style two-stage association.
+
+    Confident detections are matched first against all tracks; the remaining
+    weak detections (close to their class threshold) can only extend tracks, so
+    a brief confidence dip doesn't break an identity but also can't spawn one.
+    Matching is class-aware and uses constant-velocity predicted boxes.
+    """
+
+    def __init__(self, settings=None):
+        settings = settings or TRACKER_SETTINGS
+        self.iou_threshold = settings["iou_threshold"]
+        self.min_hits = settings["min_hits"]
+        self.max_missed_frames = settings["max_missed_frames"]
+        self.smoothing = settings["distance_smoothing"]
+        self.min_approach_speed = settings["min_approach_speed"]
+        self.tracks = []
+        self.next_id = 1
+
+    def is_confirmed(self, track):
+        return track.hits >= self.min_hits
+
+    def _associate(self, tracks, boxes, labels, det_indices, timestamp):
+        """Match a subset of detections to tracks; returns pairs of (track index, detection index)"""
+        if not tracks or len(det_indices) == 0:
+            return []
+        # Constant-velocity prediction for all tracks at once
+        predicted = (
+            np.array([track.box for track in tracks])
+            + np.array([track.velocity for track in tracks])
+            * (timestamp - np.array([track.last_seen for track in tracks]))[:, None]
+        )
+        scores = iou_matrix(predicted, boxes[det_indices])
+        
+        # Never associate across classes
+        track_labels = np.array([track.label for track in tracks], dtype=object)
+        scores[track_labels[:, None] != labels[det_indices][None, :]] = 0.0
+        
+        return [(row, det_indices[col]) for row, col in greedy_match(scores, self.iou_threshold)]
+
+    def update(self, boxes, confs, labels, distances, timestamp, confident=None):
+        """
+        Update tracks with one frame of detections
+        
+        Args:
+            boxes: (N, 4) array of x1, y1, x2, y2
+            confs: (N,) confidences
+            labels: (N,) class labels (matching only happens within a label)
+            distances: (N,) distance estimates in meters, NaN where unavailable
+            timestamp: Frame time in seconds
+            confident: (N,) bool mask of detections allowed to start tracks (default all)
+            
+        Returns:
+            List with the Track assigned to each detection (None if it was not tracked)
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        confs = np.asarray(confs, dtype=np.float64)
+        labels = np.asarray(labels, dtype=object)
+        distances = np.asarray(distances, dtype=np.float64)
+        assigned = [None] * len(boxes)
+        
+        confident = np.ones(len(boxes), dtype=bool) if confident is None else np.asarray(confident, dtype=bool)
+        high = np.nonzero(confident)[0]
+        low = np.nonzero(~confident)[0]
+        
+        # Stage 1: confident detections against every track
+        unmatched_tracks = list(self.tracks)
+        for track_index, det in self._associate(unmatched_tracks, boxes, labels, high, timestamp):
+            assigned[det] = unmatched_tracks[track_index]
+        
+        # Stage 2: weak detections may only extend tracks left over from stage 1
+        matched = {id(track) for track in assigned if track is not None}
+        unmatched_tracks = [track for track in self.tracks if id(track) not in matched]
+        for track_index, det in self._associate(unmatched_tracks, boxes, labels, low, timestamp):
+            assigned[det] = unmatched_tracks[track_index]
+        
+        conf_values, distance_values = confs.tolist(), distances.tolist()
+        for det, track in enumerate(assigned):
+            if track is not None:
+                track.update(boxes[det], conf_values[det], distance_values[det], timestamp, self.smoothing)
+        
+        # Age unmatched tracks and drop the stale ones
+        matched = {id(track) for track in assigned if track is not None}
+        for track in self.tracks:
+            if id(track) not in matched:
+                track.missed_frames += 1
+        self.tracks = [track for track in self.tracks if track.missed_frames <= self.max_missed_frames]
+        
+        # Unmatched confident detections start new tracks
+        for det in high.tolist():
+            if assigned[det] is None:
+                distance = distance_values[det] if math.isfinite(distance_values[det]) else None
+                track = Track(self.next_id, boxes[det], labels[det], conf_values[det], distance, timestamp)
+                self.next_id += 1
+                self.tracks.append(track)
+                assigned[det] = track
+        
+        return assigned
+
+    def coasting_tracks(self):
+        """Confirmed tracks that were missed this frame but are still kept alive"""
+        return [track for track in self.tracks if track.missed_frames > 0 and self.is_confirmed(track)]
+
+    def reset(self):
+        self.tracks = []
@@ -0,0 +1,186 @@
+"""
+Road region of interest for the road hazard model
+
+Potholes and speed bumps only appear on the road surface, so the road model
+is run on a crop around it instead of the whole frame: its fixed input size
+is then spent on the road, which is faster and resolves small potholes
+better. The region is a static polygon or follows lane lines found with a
+Hough transform; boxes are shifted back to frame coordinates afterwards.
+"""
+import cv2
+import numpy as np
+from config import ROI_SETTINGS
+
+def polygon_pixels(polygon, frame_width, frame_height):
+    """Normalized (x, y) polygon as an int32 pixel array"""
+    points = np.asarray(polygon, dtype=np.float64) * [frame_width, frame_height]
+    return np.round(points).astype(np.int32)
+
+def bounding_region(points, frame_width, frame_height):
+    """(x1, y1, x2, y2) pixel rectangle around a polygon, clipped to the frame"""
+    x1, y1 = np.maximum(points.min(axis=0), 0)
+    x2, y2 = points.max(axis=0)
+    return int(x1), int(y1), int(min(x2, frame_width)), int(min(y2, frame_height))
+
+def tile_region(region, tiles, overlap):
+    """Split a region into side-by-side tiles that overlap by a fraction of a tile's width"""
+    x1, y1, x2, y2 = region
+    if tiles <= 1:
+        return [region]
+    width = (x2 - x1) / (tiles - (tiles - 1) * overlap)
+    step = width * (1 - overlap)
+    return [
+        (int(round(x1 + i * step)), y1, int(round(min(x1 + i * step + width, x2))), y2)
+        for i in range(tiles)
+    ]
+
+def crop_tiles(frame, region, points=None):
+    """
+    The tiles of a frame's road region, ready for the model
+
+    Args:
+        frame: BGR frame
+        region: (x1, y1, x2, y2) crop rectangle
+        points: ROI polygon in pixels; with ROI_SETTINGS["mask_outside"] pixels
+            outside it are blacked out
+
+    Returns:
+        List of (image, (x offset, y offset)) pairs
+    """
+    tiles = []
+    for x1, y1, x2, y2 in tile_region(region, ROI_SETTINGS["tiles"], ROI_SETTINGS["tile_overlap"]):
+        if points is not None and ROI_SETTINGS["mask_outside"]:
+            image = np.zeros((y2 - y1, x2 - x1, 3), dtype=frame.dtype)
+            mask = np.zeros(image.shape[:2], dtype=np.uint8)
+            cv2.fillPoly(mask, [(points - (x1, y1)).astype(np.int32)], 255)
+            cv2.copyTo(frame[y1:y2, x1:x2], mask, image)
+        else:
+            # Model preprocessing needs contiguous pixels
+            image = np.ascontiguousarray(frame[y1:y2, x1:x2])
+        tiles.append((image, (x1, y1)))
+    return tiles
+
+def merge_tile_boxes(tile_boxes, offsets, iou_threshold=None):
+    """
+    Shift per-tile (N, 6) boxes into frame coordinates and drop seam duplicates
+
+    Boxes found twice where tiles overlap are merged by per-class
+    non-maximum suppression.
+    """
+    shifted = []
+    for boxes, (x_offset, y_offset) in zip(tile_boxes, offsets):
+        boxes = boxes.copy()
+        boxes[:, [0, 2]] += x_offset
+        boxes[:, [1, 3]] += y_offset
+        shifted.append(boxes)
+    boxes = np.concatenate(shifted) if shifted else np.zeros((0, 6), dtype=np.float32)
+    if len(shifted) <= 1 or len(boxes) == 0:
+        return boxes
+
+    # Offsetting each class far apart makes a single NMS pass per-class
+    class_offset = boxes[:, 5:6] * 100000.0
+    rects = np.concatenate([boxes[:, :2] + class_offset, boxes[:, 2:4] - boxes[:, :2]], axis=1)
+    keep = cv2.dnn.NMSBoxes(
+        rects.tolist(), boxes[:, 4].tolist(), 0.0,
+        iou_threshold or ROI_SETTINGS["tile_nms_iou"]
+    )
+    return boxes[np.asarray(keep, dtype=np.intp).reshape(-1)]
+
+class RoadROI:
+    """
+    Road region of one camera
+
+    In "polygon" mode the region is ROI_SETTINGS["polygon"]. In "lanes" mode
+    the lane lines are detected every lane_update_interval frames on a
+    downscaled copy of the lower frame and the region is the trapezoid between
+    them, widened by lane_margin and smoothed over time; while no lanes are
+    found the static polygon is used.
+    """
+
+    def __init__(self, settings=None):
+        self.settings = settings or ROI_SETTINGS
+        self.frames = 0
+        self.lanes = None   # Smoothed (left bottom, left top, right top, right bottom) x, normalized
+
+    def polygon(self, frame):
+        """ROI polygon in frame pixels, or None when cropping is off"""
+        if self.settings["mode"] == "off":
+            return None
+        height, width = frame.shape[:2]
+        if self.settings["mode"] == "lanes":
+            if self.frames % self.settings["lane_update_interval"] == 0:
+                self.update_lanes(frame)
+            self.frames += 1
+            if self.lanes is not None:
+                top = self.settings["lane_search_top"]
+                left_bottom, left_top, right_top, right_bottom = self.lanes
+                margin = self.settings["lane_margin"]
+                return polygon_pixels([
+                    [left_top - margin, top], [right_top + margin, top],
+                    [right_bottom + margin, 1.0], [left_bottom - margin, 1.0]
+                ], width, height)
+        return polygon_pixels(self.settings["polygon"], width, height)
+
+    def region(self, frame):
+        """
+        (x1, y1, x2, y2) crop rectangle and ROI polygon in frame pixels
+
+        Returns:
+            (region, points), or (None, None) when cropping is off
+        """
+        points = self.polygon(frame)
+        if points is None:
+            return None, None
+        height, width = frame.shape[:2]
+        return bounding_region(points, width, height), points
+
+    def update_lanes(self, frame):
+        lanes = detect_lanes(frame, self.settings)
+        if lanes is None:
+            return
+        if self.lanes is None:
+            self.lanes = lanes
+        else:
+            smoothing = self.settings["lane_smoothing"]
+            self.lanes = (1 - smoothing) * self.lanes + smoothing * lanes
+
+def detect_lanes(frame, settings=None):
+    """
+    Left and right lane lines below lane_search_top, or None if either is missing
+
+    Returns:
+        Array of the normalized x of the left line at the bottom and top of the
+        search band and of the right line at its top and bottom
+    """
+    settings = settings or ROI_SETTINGS
+    height, width = frame.shape[:2]
+    top = int(height * settings["lane_search_top"])
+    scale = settings["lane_detect_width"] / width
+    band = cv2.resize(frame[top:], (settings["lane_detect_width"], max(int((height - top) * scale), 1)), interpolation=cv2.INTER_AREA)
+    edges = cv2.Canny(cv2.cvtColor(band, cv2.COLOR_BGR2GRAY), 50, 150)
+    band_height, band_width = edges.shape
+    lines = cv2.HoughLinesP(
+        edges, 1, np.pi / 180, threshold=20, minLineLength=band_height * 0.2, maxLineGap=band_height * 0.1
+    )
+    if lines is None:
+        return None
+
+    x1, y1, x2, y2 = lines.reshape(-1, 4).astype(np.float64).T
+    steep = np.abs(y2 - y1) >= settings["lane_min_slope"] * np.abs(x2 - x1)
+    lengths = np.hypot(x2 - x1, y2 - y1)
+    # y grows downwards, so the left lane line rises to the right and the right one to the left
+    rising = (y2 - y1) * (x2 - x1) < 0
+    centers = (x1 + x2) / 2
+    sides = (steep & rising & (centers < band_width / 2), steep & ~rising & (centers >= band_width / 2))
+
+    fitted = []
+    for side in sides:
+        if not side.any():
+            return None
+        # x as a length-weighted linear function of y, through both ends of every segment
+        ys = np.concatenate([y1[side], y2[side]])
+        xs = np.concatenate([x1[side], x2[side]])
+        slope, intercept = np.polyfit(ys, xs, 1, w=np.concatenate([lengths[side], lengths[side]]))
+        fitted.append((slope * band_height + intercept, intercept))  # x at the bottom and top of the band
+    (left_bottom, left_top), (right_bottom, right_top) = fitted
+    return np.array([left_bottom, left_top, right_top, right_bottom]) / band_width
@@ -0,0 +1,54 @@
+import numpy as np
+import camera_manager
+from camera_manager import CameraSource
+
+class StaticReader:
+    def read(self, image=None):
+        return True, np.zeros((4, 4, 3), dtype=np.uint8)
+
+    def release(self):
+        pass
+
+    def describe(self):
+        return "static"
+
+def fast_retries(monkeypatch):
+    monkeypatch.setitem(camera_manager.CAPTURE_SETTINGS, "shared_memory", False)
+    monkeypatch.setitem(camera_manager.CAPTURE_SETTINGS, "retry_backoff_s", 0.01)
+    monkeypatch.setitem(camera_manager.CAPTURE_SETTINGS, "retry_backoff_max_s", 0.02)
+
+def test_capture_retries_source_that_fails_to_open(monkeypatch):
+    fast_retries(monkeypatch)
+    attempts = []
+    def open_reader(source):
+        attempts.append(source)
+        if len(attempts) < 3:
+            raise OSError("camera busy")
+        return StaticReader()
+    monkeypatch.setattr(camera_manager, "open_reader", open_reader)
+
+    source = CameraSource("test", "rtsp://camera")
+    source.start()
+    try:
+        frame = source.ring.wait_for_newer(0, timeout=2.0)
+        assert frame is not None
+        frame.release()
+        assert len(attempts) == 3
+        assert source.status()["running"]
+    finally:
+        source.close()
+
+def test_looping_replay_of_undecodable_file_gives_up(monkeypatch, tmp_path):
+    fast_retries(monkeypatch)
+    monkeypatch.setitem(camera_manager.CAPTURE_SETTINGS, "replay_max_empty_loops", 3)
+    video = tmp_path / "broken.mp4"
+    video.write_bytes(b"not a video")
+
+    source = CameraSource("test", {"type": "replay", "path": str(video), "loop": True})
+    source.start()
+    source.thread.join(5.0)
+    try:
+        assert not source.thread.is_alive()
+        assert source.finished
+    finally:
+        source.close()
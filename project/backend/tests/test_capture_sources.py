@@ -0,0 +1,22 @@
+import types
+import cv2
+import numpy as np
+import capture_sources
+from capture_sources import ReplayReader, TIMESTAMPS_FILE
+
+def test_replay_paces_frames_past_the_last_timestamp_at_fps(monkeypatch, tmp_path):
+    for i in range(5):
+        cv2.imwrite(str(tmp_path / f"{i:06d}.jpg"), np.zeros((8, 8, 3), dtype=np.uint8))
+    # Recording cut short: only the first three frames have timestamps
+    (tmp_path / TIMESTAMPS_FILE).write_text("frame,timestamp\n0,100.0\n1,101.0\n2,102.0\n")
+    clock = [0.0]
+    def sleep(seconds):
+        clock[0] += seconds
+    monkeypatch.setattr(capture_sources, "time", types.SimpleNamespace(perf_counter=lambda: clock[0], sleep=sleep))
+
+    reader = ReplayReader(tmp_path, speed=1.0, loop=False, fps=10)
+    released = []
+    while reader.read()[0]:
+        released.append(round(clock[0], 6))
+
+    assert released == [0.0, 1.0, 2.0, 2.1, 2.2]
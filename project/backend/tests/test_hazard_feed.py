@@ -0,0 +1,22 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import hazard_feed
+from hazard_feed import HazardFeed, hazard_feed_endpoint
+
+def test_feed_ignores_malformed_messages(monkeypatch):
+    feed = HazardFeed()
+    feed._index({"_id": "r1", "location": {"lat": 10.0, "lng": 20.0}, "type": "pothole", "status": "open"})
+    monkeypatch.setattr(hazard_feed, "hazard_feed", feed)
+    app = FastAPI()
+    app.add_api_websocket_route("/ws/hazards", hazard_feed_endpoint)
+
+    with TestClient(app).websocket_connect("/ws/hazards") as websocket:
+        websocket.send_json(["position", 10.0, 20.0])
+        websocket.send_json({"type": "position", "lat": 10.0, "lng": 20.0, "radius": "inf"})
+        websocket.send_json({"type": "position", "lat": 10.0, "lng": 20.0, "radius": "far"})
+        websocket.send_json({"type": "position", "lat": 10.0, "lng": 20.0, "radius": 50})
+        message = websocket.receive_json()
+
+    assert message["type"] == "added"
+    assert [hazard["id"] for hazard in message["hazards"]] == ["r1"]
+    assert not feed.subscribers
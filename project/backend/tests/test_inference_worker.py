@@ -0,0 +1,37 @@
+import asyncio
+import os
+import inference_worker
+from inference_worker import InferenceWorkerPool
+
+def test_inference_pool_workers_start(monkeypatch):
+    monkeypatch.setitem(inference_worker.INFERENCE_SETTINGS, "warm_up_on_startup", False)
+    pool = InferenceWorkerPool(mode="process", max_workers=2)
+    try:
+        assert pool._get_executor().submit(os.getpid).result(timeout=60) != os.getpid()
+    finally:
+        pool.shutdown()
+
+def test_batch_process_workers_start():
+    from batch_process import worker_pool
+
+    with worker_pool(2, None) as executor:
+        assert executor.submit(os.getpid).result(timeout=60) != os.getpid()
+
+def test_initializer_accepts_legacy_arguments():
+    inference_worker._init_worker_process(None)
+    inference_worker._init_worker_process(None, False)
+
+def test_process_pool_status_from_jobs(monkeypatch):
+    monkeypatch.setitem(inference_worker.INFERENCE_SETTINGS, "warm_up_on_startup", False)
+    pool = InferenceWorkerPool(mode="process", max_workers=2)
+
+    async def run_jobs():
+        return await pool.run(os.getpid)
+
+    try:
+        assert pool.model_status()["ready"] is False
+        pid = asyncio.run(run_jobs())
+        # Models load lazily, so the worker is known but not ready yet
+        assert pool.model_status()["workers"] == {pid: False}
+    finally:
+        pool.shutdown()
@@ -0,0 +1,63 @@
+import sys
+import threading
+import types
+from pathlib import Path
+import pytest
+import model_loader
+from config import MODEL_WEIGHTS
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+class FakeYOLO:
+    """Writes a placeholder artifact next to the weights, as Ultralytics export does"""
+
+    def __init__(self, weights):
+        self.weights = Path(weights)
+
+    def export(self, format, **kwargs):
+        if format == "onnx":
+            exported = self.weights.with_suffix(".onnx")
+            exported.write_bytes(self.weights.read_bytes())
+        else:
+            exported = self.weights.parent / f"{self.weights.stem}_openvino_model"
+            exported.mkdir()
+            (exported / "model.xml").write_bytes(self.weights.read_bytes())
+        return str(exported)
+
+@pytest.mark.parametrize("backend", ["onnx", "openvino"])
+def test_concurrent_exports_leave_one_complete_artifact(backend, tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "ultralytics", types.SimpleNamespace(YOLO=FakeYOLO))
+    weights = tmp_path / "model.pt"
+    weights.write_bytes(b"weights")
+    cache_dir = tmp_path / "cache"
+
+    targets = []
+    threads = [
+        threading.Thread(target=lambda: targets.append(model_loader.export_model(weights, backend, int8=False, cache_dir=cache_dir)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(targets) == 4 and len(set(targets)) == 1
+    assert [path.name for path in cache_dir.iterdir()] == [targets[0].name]
+    artifact = targets[0] / "model.xml" if backend == "openvino" else targets[0]
+    assert artifact.read_bytes() == b"weights"
+
+@pytest.mark.parametrize("backend,runtime", [("onnx", "onnxruntime"), ("openvino", "openvino")])
+@pytest.mark.parametrize("weights", sorted(set(MODEL_WEIGHTS.values())))
+def test_exported_model_matches_pytorch(weights, backend, runtime, tmp_path, monkeypatch):
+    pytest.importorskip("ultralytics")
+    pytest.importorskip(runtime)
+    weights_path = BACKEND_DIR / weights
+    if not weights_path.exists():
+        pytest.skip(f"{weights} not available")
+    monkeypatch.setitem(model_loader.MODEL_BACKEND, "cache_dir", str(tmp_path))
+    monkeypatch.setitem(model_loader.MODEL_BACKEND, "int8", False)
+
+    from ultralytics.utils import ASSETS
+    passed, report = model_loader.check_parity(str(weights_path), str(ASSETS / "bus.jpg"), backend)
+
+    assert passed, report
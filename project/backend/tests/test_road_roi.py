@@ -0,0 +1,28 @@
+import numpy as np
+import road_roi
+from road_roi import RoadROI, crop_tiles
+
+def test_crop_tiles_masks_outside_polygon(monkeypatch):
+    monkeypatch.setitem(road_roi.ROI_SETTINGS, "mask_outside", True)
+    monkeypatch.setitem(road_roi.ROI_SETTINGS, "tiles", 2)
+    frame = np.full((360, 640, 3), 200, dtype=np.uint8)
+    roi = RoadROI(dict(road_roi.ROI_SETTINGS, mode="polygon", polygon=[[0.4, 0.5], [0.6, 0.5], [1.0, 1.0], [0.0, 1.0]]))
+    region, points = roi.region(frame)
+    # fillPoly only takes int32 points; NumPy 1 upcasts int32 - [int, int] to int64
+    fill_poly = road_roi.cv2.fillPoly
+    dtypes = []
+    def checked_fill_poly(image, polygons, color):
+        dtypes.extend(polygon.dtype for polygon in polygons)
+        return fill_poly(image, polygons, color)
+    monkeypatch.setattr(road_roi.cv2, "fillPoly", checked_fill_poly)
+
+    tiles = crop_tiles(frame, region, points)
+
+    assert dtypes and all(dtype == np.int32 for dtype in dtypes)
+
+    assert len(tiles) == 2
+    image, (x_offset, y_offset) = tiles[0]
+    assert (x_offset, y_offset) == (region[0], region[1])
+    # Top-left corner of the crop is outside the trapezoid, the bottom row inside it
+    assert image[0, 0].tolist() == [0, 0, 0]
+    assert image[-1, 5].tolist() == [200, 200, 200]
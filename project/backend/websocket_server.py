@@ -1,167 +1,582 @@
 import asyncio
+import json
+import math
+import time
 import cv2
-import torch
 import numpy as np
 from fastapi import WebSocket, WebSocketDisconnect
 from camera_manager import camera_manager
-from model_loader import road_model, standard_model
-from config import DETECTION_THRESHOLDS  # Import the thresholds from config
+from frame_buffer import resolve_frame
+from broadcast_hub import get_hub
+from inference_worker import inference_pool
+from frame_scheduler import AdaptiveScheduler
+from frame_encoder import frame_encoder, EncodedFrame, StreamQuality, pack_message
+from object_tracker import ObjectTracker
+from model_loader import road_model, standard_model, predict_options
+from hazard_ingest import hazard_aggregator
+from road_roi import RoadROI, crop_tiles, merge_tile_boxes
+from config import DETECTION_THRESHOLDS, MODEL_BACKEND, TRACKER_SETTINGS, STREAM_SETTINGS, INFERENCE_SETTINGS, HAZARD_INGEST_SETTINGS  # Import the thresholds from config
 from distance_estimator import DistanceEstimator
+from metrics import (
+    timed, stage_seconds, frames_processed, client_frames_dropped, websocket_clients, bytes_sent,
+    scheduler_interval, scheduler_latency
+)
 
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    try:
-        while True:
-            # Process backend camera frame if available
-            if not camera_manager.frame_queue.empty():
-                frame = camera_manager.frame_queue.get()
+class SourcePipeline:
+    """Per-camera state of the inference loop"""
+
+    def __init__(self, name):
+        self.name = name
+        self.hub = get_hub(name)
+        self.scheduler = AdaptiveScheduler()
+        self.tracker = ObjectTracker()
+        self.sequence = 0
+        self.last_frame_sequence = 0  # Capture sequence of the last frame processed
+        self.position = None          # (lat, lng, time received) last reported by a client
+        self.roi = RoadROI()          # Road region the road model is run on
+
+pipelines = {}
+
+def get_pipeline(source_name):
+    if source_name not in pipelines:
+        pipelines[source_name] = SourcePipeline(source_name)
+    return pipelines[source_name]
+
+def observe_scheduler(pipeline):
+    """Expose a source's scheduler decisions and the latencies behind them as metrics"""
+    stats = pipeline.scheduler.stats()
+    for model_name in ("road", "standard"):
+        scheduler_interval.set(stats[f"{model_name}_interval"], source=pipeline.name, model=model_name)
+    for stage in ("road", "standard", "overhead"):
+        scheduler_latency.set(stats[f"{stage}_latency"], source=pipeline.name, stage=stage)
+
+async def publish_frame(pipeline, frame, detections, timestamp):
+    """Track, optionally draw, and publish one source's processed frame"""
+    frame_width = frame.shape[1]
+    
+    # Persistent IDs, smoothed distances and track-based lane counts
+    with timed(stage_seconds, stage="tracking", source=pipeline.name):
+        driver_lane_hazard_count, hazard_distances, pothole_detected = apply_tracking(
+            pipeline.tracker, detections, frame_width, timestamp
+        )
+    observe_hazards(pipeline, detections, timestamp)
+    
+    # Server-side overlays are only drawn if some client asked for them
+    vis_frame = None
+    if pipeline.hub.has_mode("rendered"):
+        results = detections_to_results(detections)
+        with timed(stage_seconds, stage="draw", source=pipeline.name):
+            vis_frame = await frame_encoder.run(draw_detections, frame, results, hazard_distances)
+    
+    # The frame is a ring slot that gets reused once released, so raw clients get their own copy
+    raw_frame = frame.copy() if pipeline.hub.has_mode("raw") else None
+    
+    # Each client's quality level is encoded at most once and shared
+    pipeline.sequence += 1
+    pipeline.hub.publish(EncodedFrame(raw_frame, vis_frame, {
+        "source": pipeline.name,
+        "hazard_count": len(detections),
+        "driver_lane_hazard_count": driver_lane_hazard_count,
+        "hazard_distances": hazard_distances,
+        "hazard_type": "pothole" if pothole_detected else "",
+        "frame_size": [frame_width, frame.shape[0]],
+        "boxes": detections_to_compact(detections)
+    }, frame_encoder, pipeline.sequence))
+    frames_processed.inc(source=pipeline.name)
+
+def observe_hazards(pipeline, detections, timestamp):
+    """Feed tracked road hazards, geotagged with the source's last position, to the hazard aggregator"""
+    if not HAZARD_INGEST_SETTINGS["enabled"] or pipeline.position is None:
+        return
+    lat, lng, received_at = pipeline.position
+    if timestamp - received_at > HAZARD_INGEST_SETTINGS["position_max_age_s"]:
+        return
+    # Model labels may be capitalized; reports use lowercase types like the rest of the pipeline
+    class_names = np.char.lower(detections['class_name'])
+    reported = (
+        (detections['model'] == ROAD_MODEL) & (detections['track_id'] > 0)
+        & np.isin(class_names, [report_type.lower() for report_type in HAZARD_INGEST_SETTINGS["report_types"]])
+    )
+    for track_id, class_name in zip(detections['track_id'][reported].tolist(), class_names[reported].tolist()):
+        hazard_aggregator.observe(pipeline.name, track_id, class_name, lat, lng, timestamp)
+
+async def inference_loop():
+    """
+    Single producer for all cameras: each iteration takes the latest frame of
+    every watched source, runs the models once over the whole batch, and
+    publishes each source's result to its own clients
+    
+    Frames stay pinned in their camera's ring until published, so they are
+    read in place rather than copied; worker processes get shared-memory
+    handles instead of pickled pixels.
+    """
+    while True:
+        started = time.perf_counter()
+        frames = {}
+        try:
+            # Skip sources (and inference entirely) while nobody is watching
+            watched = {
+                name: get_pipeline(name).last_frame_sequence
+                for name in camera_manager.sources if get_hub(name).has_subscribers()
+            }
+            # Wakes as soon as a watched camera publishes a newer frame
+            frames = await camera_manager.wait_for_frames(watched)
+            
+            if frames:
+                names = list(frames)
+                batch = [frames[name].frame for name in names]
+                for name in names:
+                    get_pipeline(name).last_frame_sequence = frames[name].sequence
                 
-                # Process the frame with both YOLO models
-                results, driver_lane_hazard_count, vis_frame, hazard_distances = process_frame_with_models(frame)
+                # Worker processes resolve frames from the ring's shared memory when it has one
+                inputs = batch
+                if INFERENCE_SETTINGS["mode"] == "process":
+                    inputs = [frames[name].shared_handle() or frames[name].frame for name in names]
                 
-                # Send processed frame and results
-                _, jpeg = cv2.imencode('.jpg', vis_frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-                await websocket.send_bytes(jpeg.tobytes())
+                # Each source's scheduler decides which models are due on its frame
+                plans = [get_pipeline(name).scheduler.plan() for name in names]
+                # The road model only sees each camera's road region
+                with timed(stage_seconds, stage="roi"):
+                    road_regions = [get_pipeline(name).roi.region(frame) for name, frame in zip(names, batch)]
+                with timed(stage_seconds, stage="inference"):
+                    road_batch, standard_batch, model_timings = await inference_pool.run(
+                        run_models_batch, inputs, [plan[0] for plan in plans], [plan[1] for plan in plans], road_regions
+                    )
+                # Measured where the models ran, which may be a worker process
+                for model_name, seconds in model_timings.items():
+                    stage_seconds.observe(seconds, stage=f"{model_name}_predict")
+                for i, name in enumerate(names):
+                    road_batch[i], standard_batch[i] = get_pipeline(name).scheduler.fill_skipped(
+                        batch[i], road_batch[i], standard_batch[i]
+                    )
                 
-                # Send both total and driver lane hazard counts
-                total_hazard_count = len(results)
+                # Filtering needs the model class names, which live with the workers
+                with timed(stage_seconds, stage="filter"):
+                    detections_batch = await inference_pool.run(
+                        filter_detections_batch, road_batch, standard_batch,
+                        [frame.shape[1] for frame in batch], [frame.shape[0] for frame in batch], names
+                    )
                 
-                # Check if any detection is a pothole
-                pothole_detected = any(detection.get('type', '').lower() == 'pothole' for detection in results)
+                await asyncio.gather(*[
+                    publish_frame(get_pipeline(name), batch[i], detections_batch[i], frames[name].timestamp)
+                    for i, name in enumerate(names)
+                ])
                 
-                await websocket.send_json({
-                    "hazard_count": total_hazard_count,
-                    "driver_lane_hazard_count": driver_lane_hazard_count,
-                    "hazard_distances": hazard_distances,
-                    "hazard_type": "pothole" if pothole_detected else ""
-                })
+                # The batch cost is shared, so every source's scheduler sees all of it
+                elapsed = time.perf_counter() - started
+                stage_seconds.observe(elapsed, stage="loop")
+                for name in names:
+                    get_pipeline(name).scheduler.record_latency(model_timings, elapsed)
+                    observe_scheduler(get_pipeline(name))
+        except Exception as e:
+            print(f"Inference loop error: {str(e)}")
+        finally:
+            for frame_ref in frames.values():
+                frame_ref.release()
+        
+        # Sleep only for what is left of the frame budget (the default source's while nobody watches)
+        paced = [get_pipeline(name) for name in frames] or [get_pipeline(camera_manager.default_source)]
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(min(pipeline.scheduler.next_delay(elapsed) for pipeline in paced))
+
+inference_task = None
+
+def start_inference_loop():
+    """Start the background inference task once per process"""
+    global inference_task
+    if inference_task is None or inference_task.done():
+        inference_task = asyncio.create_task(inference_loop())
+    return inference_task
+
+# Stream modes a client can pick with /ws?mode=...
+#   rendered:   frames with server-drawn overlays plus metadata (default)
+#   raw:        undecorated frames every raw_frame_interval frames, metadata every frame
+#   detections: metadata and boxes only, no image
+STREAM_MODES = ("rendered", "raw", "detections")
+
+async def receive_positions(websocket, pipeline):
+    """Record the vehicle position clients send as {"type": "position", "lat", "lng"}"""
+    while True:
+        try:
+            message = json.loads(await websocket.receive_text())
+            lat, lng = float(message["lat"]), float(message["lng"])
+        except WebSocketDisconnect:
+            return
+        except (ValueError, KeyError, TypeError):
+            continue
+        if message.get("type") == "position" and -90 <= lat <= 90 and -180 <= lng <= 180:
+            pipeline.position = (lat, lng, time.time())
+
+async def websocket_endpoint(websocket: WebSocket, source: str = None):
+    """Stream one camera source: /ws for the default camera, /ws/{source} for a named one"""
+    await websocket.accept()
+    source = source or camera_manager.default_source
+    mode = websocket.query_params.get("mode", "rendered")
+    if source not in camera_manager.sources:
+        await websocket.close(code=1008, reason=f"Unknown camera source: {source}")
+        return
+    if mode not in STREAM_MODES:
+        await websocket.close(code=1008, reason=f"Unknown stream mode: {mode}")
+        return
+    
+    hub = get_hub(source)
+    queue = hub.subscribe(mode)
+    websocket_clients.inc(source=source, mode=mode)
+    quality = StreamQuality(get_pipeline(source).scheduler.frame_budget)
+    # Clients report their position so the server can geotag and report hazards itself
+    receiver = asyncio.create_task(receive_positions(websocket, get_pipeline(source)))
+    try:
+        while True:
+            packet = await queue.get()
+            header = dict(packet.metadata)
+            jpeg_bytes = b""
+            
+            send_image = mode == "rendered" or (
+                mode == "raw" and packet.sequence % STREAM_SETTINGS["raw_frame_interval"] == 0
+            )
+            if send_image:
+                scale, jpeg_quality = quality.level()
+                jpeg_bytes = await packet.jpeg(scale, jpeg_quality, rendered=mode == "rendered")
+                header["scale"], header["quality"] = scale, jpeg_quality
             
-            await asyncio.sleep(0.033)
+            # Send frame (if any) and results as one framed message
+            message = pack_message(header, jpeg_bytes)
+            send_started = time.perf_counter()
+            await websocket.send_bytes(message)
+            send_seconds = time.perf_counter() - send_started
+            stage_seconds.observe(send_seconds, stage="send", source=source)
+            bytes_sent.inc(len(message), source=source, mode=mode)
+            
+            # Adapt to this client's link: slow sends or dropped frames lower the quality
+            drops = hub.take_drops(queue)
+            if drops:
+                client_frames_dropped.inc(drops, source=source, mode=mode)
+            quality.record_send(len(message), send_seconds, drops, image=bool(jpeg_bytes))
             
     except WebSocketDisconnect:
         print("Client disconnected")
     except Exception as e:
         print(f"Error: {str(e)}")
+    finally:
+        receiver.cancel()
+        hub.unsubscribe(queue)
+        websocket_clients.dec(source=source, mode=mode)
 
 # Initialize the distance estimator
 distance_estimator = DistanceEstimator()
 
-def process_frame_with_models(frame):
-    """Process a frame with both YOLO models and apply filtering"""
-    # Get frame dimensions
-    frame_height, frame_width = frame.shape[:2]
+def apply_tracking(tracker, detections, frame_width, timestamp):
+    """
+    Run a source's tracker on a frame's filtered detections
     
-    # Calculate lane boundaries (middle 50%)
-    left_boundary = int(frame_width * 0.25)
-    right_boundary = int(frame_width * 0.75)
-    
-    # Process with road hazard model (potholes and speedbumps)
-    road_results = road_model.predict(
-        frame,
-        imgsz=640,
-        device="cuda" if torch.cuda.is_available() else "cpu",
-        half=torch.cuda.is_available(),
-        verbose=False
+    Writes persistent IDs into detections['track_id'] and reports smoothed
+    per-track distances, approach speed and time-to-collision. Every detection
+    above its class threshold is reported; weak ones that matched no track
+    (see TRACKER_SETTINGS['confident_margin']) get track ID 0 and their raw
+    distance. Confirmed tracks that were briefly missed keep being reported
+    at their predicted position until they expire.
+    
+    Returns:
+        (driver_lane_hazard_count, hazard_distances, pothole_detected) over this
+        frame's detections and the coasting confirmed tracks, so they don't
+        flicker when a detection drops out for a frame or two
+    """
+    left_boundary, right_boundary = lane_boundaries(frame_width)
+    
+    labels = [f"{MODEL_NAMES[model]}:{name}" for model, name in zip(detections['model'].tolist(), detections['class_name'].tolist())]
+    tracks = tracker.update(
+        detections['box'], detections['conf'], labels, detections['distance'], timestamp, detections['confident']
     )
+    detections['track_id'] = [track.track_id if track is not None else 0 for track in tracks]
+    
+    def describe(track, box, raw_distance=None):
+        x1, y1, x2, y2 = [float(v) for v in box]
+        distance = track.distance if track.distance is not None else raw_distance
+        ttc = track.time_to_collision(tracker.min_approach_speed)
+        return {
+            'class': track.label.split(':', 1)[1],
+            'distance': float(distance) if distance is not None and math.isfinite(distance) else None,
+            'bbox': [x1, y1, x2, y2],
+            'inDriverLane': left_boundary <= (x1 + x2) / 2 <= right_boundary,
+            'trackId': track.track_id,
+            'approachSpeed': float(track.approach_speed),
+            'timeToCollision': float(ttc) if ttc is not None else None
+        }
     
-    # Process with standard model (people, animals, vehicles)
-    standard_results = standard_model.predict(
-        frame,
-        imgsz=640,
-        device="cuda" if torch.cuda.is_available() else "cpu",
-        half=torch.cuda.is_available(),
-        verbose=False
+    def describe_untracked(label, box, raw_distance):
+        x1, y1, x2, y2 = [float(v) for v in box]
+        return {
+            'class': label.split(':', 1)[1],
+            'distance': float(raw_distance) if math.isfinite(raw_distance) else None,
+            'bbox': [x1, y1, x2, y2],
+            'inDriverLane': left_boundary <= (x1 + x2) / 2 <= right_boundary,
+            'trackId': None,
+            'approachSpeed': 0.0,
+            'timeToCollision': None
+        }
+    
+    tracked_distances = []
+    visible = []  # (label, box) of everything on the road this frame
+    for track, label, box, model, raw_distance in zip(
+        tracks, labels, detections['box'], detections['model'].tolist(), detections['distance'].tolist()
+    ):
+        visible.append((label, box))
+        entry = describe(track, box, raw_distance) if track is not None else describe_untracked(label, box, raw_distance)
+        # Road hazards are included once they have a ground-plane distance
+        if model == STANDARD_MODEL or entry['distance'] is not None:
+            tracked_distances.append(entry)
+    
+    # Keep briefly occluded objects in the output at their predicted position
+    for track in tracker.coasting_tracks():
+        predicted_box = track.predict(timestamp)
+        visible.append((track.label, predicted_box))
+        if track.label.startswith('standard:') or track.distance is not None:
+            entry = describe(track, predicted_box)
+            entry['coasting'] = True
+            tracked_distances.append(entry)
+    
+    driver_lane_hazard_count = sum(
+        1 for _, box in visible
+        if left_boundary <= (box[0] + box[2]) / 2 <= right_boundary
     )
+    pothole_detected = any(label.lower() == 'road:pothole' for label, _ in visible)
+    
+    return driver_lane_hazard_count, tracked_distances, pothole_detected
 
-    # Apply threshold filtering using values from config
-    filtered_road_results = []
-    filtered_standard_results = []
-    driver_lane_hazards = []  # Hazards in the middle 50% (driver's lane)
-    hazard_distances = []  # Store distances of detected hazards
-    all_filtered_results = []
-    
-    # Process road hazards (potholes, speedbumps)
-    if len(road_results[0].boxes.data) > 0:
-        for r in road_results[0].boxes.data:
-            x1, y1, x2, y2, conf, cls = r.tolist()
-            cls_int = int(cls)
-            threshold_key = f"class_{cls_int}"
-            
-            # Get class name from road hazard model
-            class_name = road_model.names[cls_int] if cls_int in road_model.names else f"class_{cls_int}"
-            
-            if threshold_key in DETECTION_THRESHOLDS and conf >= DETECTION_THRESHOLDS[threshold_key]:
-                filtered_road_results.append(r.unsqueeze(0))
-                all_filtered_results.append({
-                    'box': [x1, y1, x2, y2],
-                    'conf': conf,
-                    'cls': cls_int,
-                    'class_name': class_name,
-                    'model': 'road',
-                    'type': class_name  # Add the type explicitly
-                })
-                
-                # Check if hazard is in driver's lane (middle 50%)
-                box_center_x = (x1 + x2) / 2
-                if left_boundary <= box_center_x <= right_boundary:
-                    driver_lane_hazards.append(r.unsqueeze(0))
-    
-    # Process standard objects (people, animals, vehicles)
-    if len(standard_results[0].boxes.data) > 0:
-        for r in standard_results[0].boxes.data:
-            x1, y1, x2, y2, conf, cls = r.tolist()
-            cls_int = int(cls)
-            
-            # Get class name from standard model
-            class_name = standard_model.names[cls_int] if cls_int in standard_model.names else f"class_{cls_int}"
-            
-            # Only process people, dogs, and cows with confidence > 0.5
-            if class_name in ['person', 'dog', 'cow'] and conf >= 0.5:
-                filtered_standard_results.append(r.unsqueeze(0))
-                all_filtered_results.append({
-                    'box': [x1, y1, x2, y2],
-                    'conf': conf,
-                    'cls': cls_int,
-                    'class_name': class_name,
-                    'model': 'standard'
-                })
-                
-                # Inside process_frame_with_models function, modify the hazard_distances creation:
-                # Calculate distance for people, dogs, and cows
-                bbox_width = x2 - x1
-                distance = distance_estimator.estimate_distance(class_name, bbox_width, frame_width)
-                
-                # Check if hazard is in driver's lane (middle 50%)
-                box_center_x = (x1 + x2) / 2
-                is_in_driver_lane = left_boundary <= box_center_x <= right_boundary
-                
-                hazard_distances.append({
-                    'class': class_name,
-                    'distance': distance,
-                    'bbox': [x1, y1, x2, y2],
-                    'inDriverLane': is_in_driver_lane
-                })
-                
-                # Check if hazard is in driver's lane (middle 50%)
-                box_center_x = (x1 + x2) / 2
-                if left_boundary <= box_center_x <= right_boundary:
-                    driver_lane_hazards.append(r.unsqueeze(0))
-    
-    # Update road model results
-    if filtered_road_results:
-        road_results[0].boxes.data = torch.cat(filtered_road_results, dim=0)
-    else:
-        road_results[0].boxes.data = torch.empty((0, 6))
-    
-    # Update standard model results
-    if filtered_standard_results:
-        standard_results[0].boxes.data = torch.cat(filtered_standard_results, dim=0)
-    else:
-        standard_results[0].boxes.data = torch.empty((0, 6))
+# Road region for callers without per-camera state (single frames, batch processing)
+static_roi = RoadROI()
+
+def run_models_batch(frames, run_road, run_standard, road_regions=None):
+    """
+    Run the YOLO models over a batch of frames (e.g. one per camera)
     
-    # Count hazards in driver's lane
-    driver_lane_hazard_count = len(driver_lane_hazards)
+    The road model runs on each frame's road region (cropped, and tiled if
+    configured), with its boxes shifted back to frame coordinates.
+    
+    Args:
+        frames: List of BGR frames (or shared-memory frame handles)
+        run_road: Per-frame flags for the road hazard model
+        run_standard: Per-frame flags for the standard object model
+        road_regions: Per-frame (region, polygon) pairs from RoadROI.region;
+            None uses the static ROI_SETTINGS region
+        
+    Returns:
+        (road_boxes, standard_boxes, timings) where road_boxes and standard_boxes
+        hold one (N, 6) float32 array of x1, y1, x2, y2, conf, cls per frame (None
+        where the model was skipped) and timings maps model name to batch seconds
+    """
+    # Device settings depend on the configured backend (PyTorch, ONNX Runtime, OpenVINO)
+    device_options = predict_options()
+    frames = [resolve_frame(frame) for frame in frames]
+    if road_regions is None:
+        road_regions = [static_roi.region(frame) if enabled else (None, None) for frame, enabled in zip(frames, run_road)]
     
+    boxes = {"road": [None] * len(frames), "standard": [None] * len(frames)}
+    timings = {}
+    for name, model, flags in (("road", road_model, run_road), ("standard", standard_model, run_standard)):
+        indices = [i for i, enabled in enumerate(flags) if enabled]
+        if not indices:
+            continue
+        start = time.perf_counter()
+        # Model inputs as (frame index, image, offset of the image in the frame)
+        inputs = []
+        for i in indices:
+            region, polygon = road_regions[i] if name == "road" else (None, None)
+            if region is not None and region[2] > region[0] and region[3] > region[1]:
+                inputs.extend((i, image, offset) for image, offset in crop_tiles(frames[i], region, polygon))
+            else:
+                inputs.append((i, frames[i], (0, 0)))
+        
+        # One predict call for every frame (or tile) that needs this model; exported
+        # models take at most MODEL_BACKEND["batch"] images per call
+        images = [image for _, image, _ in inputs]
+        chunk = len(images) if MODEL_BACKEND["backend"] == "pytorch" else MODEL_BACKEND["batch"]
+        results = []
+        for first in range(0, len(images), chunk):
+            results.extend(model.predict(
+                images[first:first + chunk],
+                imgsz=MODEL_BACKEND["imgsz"],
+                verbose=False,
+                **device_options
+            ))
+        parts = {i: ([], []) for i in indices}
+        for (i, _, offset), result in zip(inputs, results):
+            parts[i][0].append(result.boxes.data.cpu().numpy().astype(np.float32))
+            parts[i][1].append(offset)
+        for i, (tile_boxes, offsets) in parts.items():
+            boxes[name][i] = merge_tile_boxes(tile_boxes, offsets)
+        timings[name] = time.perf_counter() - start
+    
+    return boxes["road"], boxes["standard"], timings
+
+def run_models(frame, run_road=True, run_standard=True):
+    """
+    Run the YOLO models on a single frame
+    
+    Returns:
+        (road_boxes, standard_boxes, timings) as for run_models_batch, for one frame
+    """
+    road_boxes, standard_boxes, timings = run_models_batch([frame], [run_road], [run_standard])
+    return road_boxes[0], standard_boxes[0], timings
+
+# Model index stored in the 'model' field of a detection
+ROAD_MODEL, STANDARD_MODEL = 0, 1
+MODEL_NAMES = ('road', 'standard')
+
+# Standard model classes that count as road hazards
+STANDARD_HAZARD_CLASSES = ('person', 'dog', 'cow')
+
+# One row per filtered detection
+DETECTION_DTYPE = np.dtype([
+    ('box', np.float32, (4,)),    # x1, y1, x2, y2 in frame pixels
+    ('conf', np.float32),
+    ('cls', np.int16),
+    ('model', np.uint8),          # ROAD_MODEL or STANDARD_MODEL
+    ('class_name', 'U16'),
+    ('in_lane', np.bool_),        # Box centre inside the driver's lane
+    ('distance', np.float32),     # Meters, NaN where no distance is estimated
+    ('confident', np.bool_),      # Clear of the class threshold by TRACKER_SETTINGS['confident_margin']
+    ('track_id', np.int32)        # 0 until the tracker assigns an ID
+])
+
+_class_tables = {}
+
+def class_tables(model_index):
+    """Per-class name and confidence threshold arrays for a model, built once per process"""
+    if model_index not in _class_tables:
+        names = (road_model if model_index == ROAD_MODEL else standard_model).names
+        size = max(names) + 1 if names else 0
+        if model_index == ROAD_MODEL:
+            # Road thresholds are keyed by class index, which may exceed the model's names
+            size = max([size] + [int(key.split('_')[1]) + 1 for key in DETECTION_THRESHOLDS if key.startswith('class_')])
+        
+        labels = np.array([names.get(i, f"class_{i}") for i in range(size)], dtype='U16')
+        thresholds = np.full(size, np.inf, dtype=np.float32)  # inf rejects the class
+        for i, label in enumerate(labels.tolist()):
+            if model_index == ROAD_MODEL:
+                key = f"class_{i}"
+            else:
+                key = label if label in STANDARD_HAZARD_CLASSES else None
+            if key in DETECTION_THRESHOLDS:
+                thresholds[i] = DETECTION_THRESHOLDS[key]
+        
+        _class_tables[model_index] = (labels, thresholds)
+    return _class_tables[model_index]
+
+def lane_boundaries(frame_width):
+    """Driver's lane is the middle 50% of the frame"""
+    return int(frame_width * 0.25), int(frame_width * 0.75)
+
+def _select_detections(boxes, model_index):
+    """Keep the boxes that pass their class threshold, as a structured array"""
+    labels, thresholds = class_tables(model_index)
+    cls = boxes[:, 5].astype(np.int64)
+    known = (cls >= 0) & (cls < len(thresholds))
+    keep = np.zeros(len(boxes), dtype=bool)
+    keep[known] = boxes[known, 4] >= thresholds[cls[known]]
+    
+    kept = boxes[keep]
+    selected = np.zeros(len(kept), dtype=DETECTION_DTYPE)
+    selected['box'] = kept[:, :4]
+    selected['conf'] = kept[:, 4]
+    selected['cls'] = cls[keep]
+    selected['model'] = model_index
+    selected['class_name'] = labels[cls[keep]]
+    selected['confident'] = kept[:, 4] >= thresholds[cls[keep]] + TRACKER_SETTINGS["confident_margin"]
+    return selected
+
+def filter_detections(road_boxes, standard_boxes, frame_width, frame_height=None, source=None):
+    """
+    Apply thresholds, lane membership and distance estimation to raw model boxes
+    
+    Args:
+        road_boxes: (N, 6) array from the road hazard model
+        standard_boxes: (M, 6) array from the standard model
+        frame_width: Width of the frame in pixels
+        frame_height: Height of the frame in pixels (None assumes the camera's aspect ratio)
+        source: Camera name, for its calibration
+        
+    Returns:
+        Structured array of DETECTION_DTYPE, road detections first
+    """
+    detections = np.concatenate([
+        _select_detections(np.asarray(road_boxes, dtype=np.float32).reshape(-1, 6), ROAD_MODEL),
+        _select_detections(np.asarray(standard_boxes, dtype=np.float32).reshape(-1, 6), STANDARD_MODEL)
+    ])
+    
+    # Check if hazards are in driver's lane (middle 50%)
+    left_boundary, right_boundary = lane_boundaries(frame_width)
+    boxes = detections['box']
+    centers = (boxes[:, 0] + boxes[:, 2]) / 2
+    detections['in_lane'] = (centers >= left_boundary) & (centers <= right_boundary)
+    
+    # Road hazards are ranged on the ground plane, people, dogs and cows by their size
+    detections['distance'] = distance_estimator.estimate(
+        detections['class_name'], boxes, frame_width, frame_height, source
+    )
+    
+    return detections
+
+def filter_detections_batch(road_batch, standard_batch, frame_widths, frame_heights=None, sources=None):
+    """filter_detections for each frame of a batch"""
+    frame_heights = frame_heights or [None] * len(frame_widths)
+    sources = sources or [None] * len(frame_widths)
+    return [
+        filter_detections(road_boxes, standard_boxes, frame_width, frame_height, source)
+        for road_boxes, standard_boxes, frame_width, frame_height, source
+        in zip(road_batch, standard_batch, frame_widths, frame_heights, sources)
+    ]
+
+def detections_to_results(detections):
+    """List-of-dicts view of the detections, as used for drawing and the hazard count"""
+    results = []
+    for box, conf, cls, model, class_name, _, _, _, track_id in detections.tolist():
+        result = {
+            'box': box.tolist(),
+            'conf': conf,
+            'cls': cls,
+            'class_name': class_name,
+            'model': MODEL_NAMES[model],
+            'track_id': track_id or None
+        }
+        if model == ROAD_MODEL:
+            result['type'] = class_name  # Add the type explicitly
+        results.append(result)
+    return results
+
+def detections_to_compact(detections):
+    """
+    Compact per-box rows for client-side rendering
+    
+    Each row is [x1, y1, x2, y2, conf, track_id, class_name, model], with
+    coordinates in frame pixels and track_id 0 for untracked boxes.
+    """
+    return [
+        [round(x1, 1), round(y1, 1), round(x2, 1), round(y2, 1), round(conf, 3), track_id, class_name, MODEL_NAMES[model]]
+        for (x1, y1, x2, y2), conf, track_id, class_name, model in zip(
+            detections['box'].tolist(), detections['conf'].tolist(), detections['track_id'].tolist(),
+            detections['class_name'].tolist(), detections['model'].tolist()
+        )
+    ]
+
+def detections_to_hazard_distances(detections):
+    """Per-frame distances of standard objects and ranged road hazards, without tracking"""
+    ranged = detections[(detections['model'] == STANDARD_MODEL) | np.isfinite(detections['distance'])]
+    return [
+        {
+            'class': class_name,
+            'distance': distance if math.isfinite(distance) else None,
+            'bbox': list(box),
+            'inDriverLane': in_lane
+        }
+        for box, class_name, in_lane, distance in zip(
+            ranged['box'].tolist(), ranged['class_name'].tolist(),
+            ranged['in_lane'].tolist(), ranged['distance'].tolist()
+        )
+    ]
+
+def draw_detections(frame, all_filtered_results, hazard_distances):
+    """Draw boxes, labels and distances on a copy of the frame"""
     # Create a copy of the original frame for visualization
     vis_frame = frame.copy()
     
@@ -181,13 +596,15 @@ def process_frame_with_models(frame):
         # Draw bounding box
         cv2.rectangle(vis_frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
         
-        # Draw label without confidence
-        label = f"{class_name}"
+        # Draw label without confidence, with the track ID once the object is tracked
+        label = f"{class_name} #{result['track_id']}" if result.get('track_id') else f"{class_name}"
         cv2.putText(vis_frame, label, (int(x1), int(y1) - 10), 
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
     
     # Add distance information to the visualization for standard objects
     for hazard in hazard_distances:
+        if hazard['distance'] is None:
+            continue
         x1, y1, x2, y2 = hazard['bbox']
         cv2.putText(
             vis_frame, 
@@ -199,4 +616,30 @@ def process_frame_with_models(frame):
             2
         )
     
+    return vis_frame
+
+def process_frame_with_models(frame, road_boxes=None, standard_boxes=None):
+    """
+    Process a frame with both YOLO models and apply filtering
+    
+    Precomputed (N, 6) box arrays can be passed in to skip the corresponding model.
+    """
+    # Get frame dimensions
+    frame_height, frame_width = frame.shape[:2]
+    
+    fresh_road, fresh_standard, _ = run_models(frame, road_boxes is None, standard_boxes is None)
+    road_boxes = fresh_road if road_boxes is None else road_boxes
+    standard_boxes = fresh_standard if standard_boxes is None else standard_boxes
+    
+    with timed(stage_seconds, stage="filter"):
+        detections = filter_detections(road_boxes, standard_boxes, frame_width, frame_height)
+    all_filtered_results = detections_to_results(detections)
+    hazard_distances = detections_to_hazard_distances(detections)
+    
+    # Count hazards in driver's lane
+    driver_lane_hazard_count = int(detections['in_lane'].sum())
+    
+    with timed(stage_seconds, stage="draw"):
+        vis_frame = draw_detections(frame, all_filtered_results, hazard_distances)
+    
     return all_filtered_results, driver_lane_hazard_count, vis_frame, hazard_distances
\ No newline at end of file
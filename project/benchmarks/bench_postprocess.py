@@ -0,0 +1,62 @@
+"""
+Micro-benchmark for detection post-processing (filter_detections).
+
+Runs the vectorized filtering on synthetic model outputs with 10, 100 and 300
+raw boxes per model and reports the per-frame cost. Model names come from a
+stub, so no weights are loaded.
+
+Usage (from the project directory):
+    python benchmarks/bench_postprocess.py [--frames 2000]
+"""
+import argparse
+import sys
+import time
+import types
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import model_loader  # noqa: E402
+
+# Stub model handles: only .names is needed for post-processing
+model_loader.road_model.model = types.SimpleNamespace(names={0: "pothole", 1: "speedbump"})
+model_loader.standard_model.model = types.SimpleNamespace(names={i: f"class_{i}" for i in range(80)} | {0: "person", 16: "dog", 19: "cow"})
+
+from websocket_server import filter_detections  # noqa: E402
+
+FRAME_WIDTH, FRAME_HEIGHT = 1280, 720
+
+def synthetic_boxes(count, num_classes, rng):
+    """Random (count, 6) model output: x1, y1, x2, y2, conf, cls"""
+    xy = rng.uniform(0, [FRAME_WIDTH - 100, FRAME_HEIGHT - 100], size=(count, 2))
+    wh = rng.uniform(10, 100, size=(count, 2))
+    conf = rng.uniform(0.25, 1.0, size=(count, 1))
+    cls = rng.integers(0, num_classes, size=(count, 1))
+    return np.hstack([xy, xy + wh, conf, cls]).astype(np.float32)
+
+def bench(count, frames, rng):
+    road = synthetic_boxes(count, 2, rng)
+    # Bias standard classes towards the ones that are kept
+    standard = synthetic_boxes(count, 80, rng)
+    standard[: count // 2, 5] = rng.choice([0, 16, 19], size=count // 2)
+    
+    filter_detections(road, standard, FRAME_WIDTH)  # Build the class tables outside the timing
+    samples = np.empty(frames)
+    for i in range(frames):
+        start = time.perf_counter()
+        filter_detections(road, standard, FRAME_WIDTH)
+        samples[i] = time.perf_counter() - start
+    return samples
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=2000)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    print(f"{'boxes/model':>12} {'mean us':>10} {'p50 us':>10} {'p99 us':>10}")
+    for count in (10, 100, 300):
+        samples = bench(count, args.frames, rng) * 1e6
+        print(f"{count:>12} {samples.mean():>10.1f} {np.percentile(samples, 50):>10.1f} {np.percentile(samples, 99):>10.1f}")
@@ -0,0 +1,103 @@
+"""
+Email outbox against a local SMTP stand-in.
+
+Starts an aiosmtpd server in-process, queues a burst of hazard reports for a
+few authorities in an in-memory (mongomock) outbox and runs the outbox worker
+until everything is sent. Reports how many emails and SMTP connections the
+burst cost, so digesting and connection reuse are visible: a burst should
+produce about one email per authority per digest window over one connection.
+
+With --outage the SMTP server starts only after the first send attempt has
+failed, exercising the retry path.
+
+Needs aiosmtpd and mongomock.
+
+Usage (from the project directory):
+    python benchmarks/email_outbox_check.py --reports 200 --authorities 3
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import mongomock
+from aiosmtpd.controller import Controller
+
+from harness import AsyncMockCollection
+import email_outbox
+from email_outbox import EmailOutbox
+
+class CountingHandler:
+    """aiosmtpd handler that counts sessions and keeps received messages"""
+
+    def __init__(self):
+        self.connections = 0
+        self.messages = []
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, envelope.content))
+        return "250 Message accepted for delivery"
+
+async def run(args):
+    handler = CountingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=args.port)
+    smtp_running = not args.outage
+    if smtp_running:
+        controller.start()
+
+    email_outbox.EMAIL_OUTBOX_SETTINGS.update(
+        digest_window_s=args.window, poll_interval_s=0.2, backoff_base_s=0.5, backoff_max_s=2
+    )
+    collection = AsyncMockCollection(mongomock.MongoClient()["road_hazards"]["email_outbox"])
+    outbox = EmailOutbox(collection, {
+        "host": "127.0.0.1", "port": args.port, "user": "", "password": "",
+        "use_tls": False, "sender": "alerts@example.com"
+    })
+
+    started = time.perf_counter()
+    for i in range(args.reports):
+        await outbox.enqueue(
+            f"report-{i}", "pothole", {"lat": 12.9 + i * 1e-4, "lng": 77.6}, datetime.now(timezone.utc),
+            f"https://www.google.com/maps/search/?api=1&query={12.9 + i * 1e-4},77.6",
+            f"authority{i % args.authorities}@example.com"
+        )
+    print(f"Queued {args.reports} reports in {time.perf_counter() - started:.3f}s")
+
+    outbox.start()
+    deadline = time.perf_counter() + args.timeout
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(0.2)
+        if not smtp_running and await collection.count_documents({"attempts": {"$gt": 0}}):
+            print("First send failed as expected; starting SMTP server")
+            controller.start()
+            smtp_running = True
+        if await collection.count_documents({"status": "sent"}) == args.reports:
+            break
+    elapsed = time.perf_counter() - started
+    status = await outbox.status()
+    await outbox.stop()
+    if smtp_running:
+        controller.stop()
+
+    print(f"Outbox status: {status['queued']}")
+    print(f"Emails received: {len(handler.messages)}  SMTP connections: {handler.connections}  elapsed: {elapsed:.2f}s")
+    if status["queued"].get("sent", 0) != args.reports:
+        raise SystemExit("Not every report was sent")
+
+def main():
+    parser = argparse.ArgumentParser(description="Email outbox check against a local aiosmtpd server")
+    parser.add_argument("--reports", type=int, default=200)
+    parser.add_argument("--authorities", type=int, default=3)
+    parser.add_argument("--window", type=float, default=1.0, help="Digest window in seconds")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--outage", action="store_true", help="Start the SMTP server only after a failed send")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
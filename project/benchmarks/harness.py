@@ -0,0 +1,297 @@
+"""
+Shared pieces of the benchmark suite: stub models, a mongomock-backed
+stand-in for the async hazard report store, timing helpers and JSON baselines.
+
+Importing this module puts the backend on sys.path.
+"""
+import json
+import platform
+import sys
+import time
+import types
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from hazard_cleanup import distance_m, EARTH_RADIUS_M  # noqa: E402
+
+ROAD_NAMES = {0: "pothole", 1: "speedbump"}
+STANDARD_NAMES = {i: f"class_{i}" for i in range(80)} | {0: "person", 16: "dog", 19: "cow"}
+
+class _StubTensor:
+    """Just enough of a torch tensor for result.boxes.data.cpu().numpy()"""
+
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+class StubModel:
+    """
+    Stand-in for a YOLO model that returns a configurable number of random boxes per frame
+
+    Boxes are drawn once per frame size so predict() costs next to nothing and
+    the benchmarks measure the pipeline around the model, not the model.
+    """
+
+    def __init__(self, names, box_count, kept_classes=None, seed=0):
+        self.names = names
+        self.box_count = box_count
+        self.kept_classes = kept_classes
+        self.rng = np.random.default_rng(seed)
+        self.outputs = {}
+
+    def boxes_for(self, width, height):
+        if (width, height) not in self.outputs:
+            count = self.box_count
+            xy = self.rng.uniform(0, [width * 0.9, height * 0.9], size=(count, 2))
+            wh = self.rng.uniform(10, [width * 0.1, height * 0.1], size=(count, 2))
+            conf = self.rng.uniform(0.25, 1.0, size=(count, 1))
+            cls = self.rng.integers(0, len(self.names), size=(count, 1))
+            if self.kept_classes:
+                # Half the boxes use classes the pipeline keeps, so filtering has work to do
+                cls[: count // 2, 0] = self.rng.choice(self.kept_classes, size=count // 2)
+            self.outputs[(width, height)] = np.hstack([xy, xy + wh, conf, cls]).astype(np.float32)
+        return self.outputs[(width, height)]
+
+    def predict(self, frames, **kwargs):
+        if isinstance(frames, np.ndarray):
+            frames = [frames]
+        return [
+            types.SimpleNamespace(boxes=types.SimpleNamespace(data=_StubTensor(self.boxes_for(f.shape[1], f.shape[0]))))
+            for f in frames
+        ]
+
+def install_stub_models(road_boxes, standard_boxes):
+    """Swap the lazily loaded YOLO models for stubs; no weights or torch needed"""
+    import model_loader
+    import websocket_server
+
+    model_loader.road_model.model = StubModel(ROAD_NAMES, road_boxes, kept_classes=[0, 1], seed=1)
+    model_loader.standard_model.model = StubModel(STANDARD_NAMES, standard_boxes, kept_classes=[0, 16, 19], seed=2)
+    # Device options only matter to real models
+    websocket_server.predict_options = lambda backend=None: {}
+    websocket_server._class_tables.clear()
+
+class AsyncMockCursor:
+    """Awaitable facade over a mongomock cursor, mirroring the Motor cursor methods used"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __getattr__(self, name):
+        method = getattr(self.cursor, name)
+
+        def chained(*args, **kwargs):
+            method(*args, **kwargs)
+            return self
+        return chained
+
+    async def to_list(self, length=None):
+        documents = list(self.cursor)
+        return documents[:length] if length else documents
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.cursor:
+            yield document
+
+class AsyncMockCollection:
+    """
+    Motor-style async collection backed by a synchronous mongomock collection
+
+    mongomock has no geospatial operators, so $nearSphere and
+    $geoWithin/$centerSphere clauses are evaluated here in Python and replaced
+    by an _id filter before the rest of the query goes to mongomock.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def _resolve_geo(self, query):
+        """Split out a geo clause; returns (query for mongomock, matching _ids nearest first or None)"""
+        query = dict(query or {})
+        for field, condition in list(query.items()):
+            if not isinstance(condition, dict):
+                continue
+            if "$nearSphere" in condition:
+                spec = condition["$nearSphere"]
+                center = spec["$geometry"]["coordinates"]
+                max_distance = spec.get("$maxDistance", float("inf"))
+            elif "$geoWithin" in condition and "$centerSphere" in condition["$geoWithin"]:
+                center, radians = condition["$geoWithin"]["$centerSphere"]
+                max_distance = radians * EARTH_RADIUS_M
+            elif "$geoWithin" in condition and "$geometry" in condition["$geoWithin"]:
+                # Only the rectangles built from viewports are needed, so test the ring's bounds
+                ring = condition["$geoWithin"]["$geometry"]["coordinates"][0]
+                lngs, lats = [corner[0] for corner in ring], [corner[1] for corner in ring]
+                center, max_distance = None, (min(lngs), min(lats), max(lngs), max(lats))
+            else:
+                continue
+            del query[field]
+            matches = []
+            for document in self.collection.find(query, {field: 1}):
+                point = document.get(field)
+                if not point:
+                    continue
+                lng, lat = point["coordinates"]
+                if center is None:
+                    min_lng, min_lat, max_lng, max_lat = max_distance
+                    if min_lng <= lng <= max_lng and min_lat <= lat <= max_lat:
+                        matches.append((0, document["_id"]))
+                else:
+                    distance = distance_m(*center, lng, lat)
+                    if distance <= max_distance:
+                        matches.append((distance, document["_id"]))
+            ids = [document_id for _, document_id in sorted(matches, key=lambda match: match[0])]
+            query["_id"] = {"$in": ids}
+            return query, ids
+        return query, None
+
+    def find(self, query=None, *args, **kwargs):
+        query, _ = self._resolve_geo(query)
+        return AsyncMockCursor(self.collection.find(query, *args, **kwargs))
+
+    async def find_one(self, query=None, *args, **kwargs):
+        query, ids = self._resolve_geo(query)
+        if ids is None:
+            return self.collection.find_one(query, *args, **kwargs)
+        # Nearest first, like $nearSphere
+        documents = {document["_id"]: document for document in self.collection.find(query, *args, **kwargs)}
+        return next((documents[document_id] for document_id in ids if document_id in documents), None)
+
+    def aggregate(self, pipeline, **kwargs):
+        return AsyncMockCursor(self.collection.aggregate(pipeline))
+
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+def install_mongomock():
+    """
+    Point notification_service at in-memory mongomock collections
+
+    Returns the synchronous hazard report collection, for seeding data outside
+    the timings.
+    """
+    import mongomock
+    import notification_service
+
+    database = mongomock.MongoClient()["road_hazards"]
+    collection = database["hazard_reports"]
+    notification_service.hazard_reports = AsyncMockCollection(collection)
+    notification_service.email_outbox.collection = AsyncMockCollection(database["email_outbox"])
+    return collection
+
+def synthetic_frame(width, height, seed=0):
+    """Noisy BGR frame, so JPEG encoding costs about what camera frames cost"""
+    rng = np.random.default_rng(seed)
+    base = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    noise = rng.normal(0, 20, size=(height, width, 3))
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+def measure(func, iterations, warmup=3, setup=None):
+    """
+    Time func() over a number of iterations
+
+    Args:
+        func: Callable to time
+        iterations: Number of timed calls
+        warmup: Untimed calls made first
+        setup: Optional callable run untimed before every call
+
+    Returns:
+        Array of per-call durations in seconds
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+    samples = np.empty(iterations)
+    for i in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples[i] = time.perf_counter() - start
+    return samples
+
+def summarize(samples, wall_seconds=None):
+    """
+    Latency percentiles (ms) and throughput (ops/sec) of a stage
+
+    Throughput is taken over wall_seconds when given (for stages whose
+    operations overlap), else derived from the summed durations.
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    total = wall_seconds if wall_seconds is not None else samples.sum()
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000
+    return {
+        "samples": int(samples.size),
+        "mean_ms": round(float(samples.mean() * 1000), 4),
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "throughput_per_s": round(float(samples.size / total), 2) if total > 0 else None
+    }
+
+def print_results(results):
+    print(f"{'stage':<32} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'ops/s':>10}")
+    for stage, stats in results.items():
+        print(f"{stage:<32} {stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f} {stats['p99_ms']:>10.3f} {stats['throughput_per_s'] or 0:>10.1f}")
+
+def save_baseline(path, results, settings):
+    """Write results with the settings and machine they were measured on"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    baseline = {
+        "settings": settings,
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine()
+        },
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "stages": results
+    }
+    path.write_text(json.dumps(baseline, indent=2) + "\n")
+    print(f"Baseline saved to {path}")
+
+def compare_baseline(path, results, tolerance):
+    """
+    Compare p95 latencies with a saved baseline
+
+    Args:
+        path: Baseline JSON written by save_baseline
+        results: Current results
+        tolerance: Allowed relative slowdown, e.g. 0.2 for 20%
+
+    Returns:
+        List of stages whose p95 regressed beyond the tolerance
+    """
+    baseline = json.loads(Path(path).read_text())
+    regressions = []
+    print(f"\nCompared with {path} ({baseline.get('created', 'unknown date')}), p95 tolerance {tolerance:.0%}")
+    for stage, stats in results.items():
+        base = baseline["stages"].get(stage)
+        if base is None or not base["p95_ms"]:
+            print(f"{stage:<32} (not in baseline)")
+            continue
+        ratio = stats["p95_ms"] / base["p95_ms"]
+        regressed = ratio > 1 + tolerance
+        if regressed:
+            regressions.append(stage)
+        print(f"{stage:<32} {base['p95_ms']:>10.3f} -> {stats['p95_ms']:>10.3f} ms ({ratio - 1:+.0%}){'  REGRESSION' if regressed else ''}")
+    return regressions
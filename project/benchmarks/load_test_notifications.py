@@ -0,0 +1,121 @@
+"""
+Load test for /api/hazard-notification while the live stream is running.
+
+Runs against a live server in two phases:
+  1. stream only: WebSocket clients receive frames, to measure the normal frame cadence
+  2. stream + load: the same clients keep streaming while concurrent workers
+     POST hazard notifications as fast as the server accepts them
+
+Reports notification throughput and latency percentiles, and the stream's
+frame rate and inter-frame gaps in both phases, so event-loop blocking by
+database calls shows up as a drop in frames/sec or a jump in p95 gap.
+
+Every notification is a pothole at a random location and is stored, so point
+the server at a scratch database first (MONGODB_DB=road_hazards_loadtest)
+and leave the EMAIL_* variables unset. Needs httpx and websockets.
+
+Usage (from the project directory, server running):
+    python benchmarks/load_test_notifications.py --url http://127.0.0.1:8000 --concurrency 20 --duration 20
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime
+
+import httpx
+import numpy as np
+import websockets
+
+from harness import summarize
+
+async def stream_client(ws_url, arrivals, stop):
+    """Receive frames until stopped, recording arrival times"""
+    async with websockets.connect(ws_url, max_size=None) as websocket:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(websocket.recv(), timeout=1.0)
+            except asyncio.TimeoutError:
+                continue
+            arrivals.append(time.perf_counter())
+
+async def notification_worker(client, deadline, latencies, errors):
+    """POST notifications back to back until the deadline"""
+    while time.perf_counter() < deadline:
+        payload = {
+            "location": {"lat": random.uniform(-60, 60), "lng": random.uniform(-180, 180)},
+            "timestamp": datetime.now().isoformat(),
+            "type": "pothole"
+        }
+        start = time.perf_counter()
+        try:
+            response = await client.post("/api/hazard-notification", json=payload)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            errors.append(time.perf_counter() - start)
+
+def stream_stats(arrivals, start, end):
+    """Frames/sec and inter-frame gaps of the arrivals within [start, end)"""
+    times = np.array([t for t in arrivals if start <= t < end])
+    if times.size < 2:
+        return None
+    gaps = np.diff(times)
+    return {"fps": round(times.size / (end - start), 1), **summarize(gaps)}
+
+def print_stream(label, stats):
+    if stats is None:
+        print(f"{label:<22} no frames received")
+        return
+    print(f"{label:<22} {stats['fps']:>6.1f} fps   gap p50 {stats['p50_ms']:.1f} ms  p95 {stats['p95_ms']:.1f} ms  p99 {stats['p99_ms']:.1f} ms")
+
+async def run(args):
+    ws_url = args.url.replace("http", "ws", 1).rstrip("/") + f"/ws?mode={args.stream_mode}"
+    arrivals = [[] for _ in range(args.stream_clients)]
+    stop = asyncio.Event()
+    streams = [asyncio.create_task(stream_client(ws_url, arrivals[i], stop)) for i in range(args.stream_clients)]
+
+    # Phase 1: stream only
+    await asyncio.sleep(args.warmup)
+    stream_only_start = time.perf_counter()
+    await asyncio.sleep(args.stream_only)
+    stream_only_end = time.perf_counter()
+
+    # Phase 2: stream plus notification load
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30.0) as client:
+        load_start = time.perf_counter()
+        deadline = load_start + args.duration
+        await asyncio.gather(*[
+            notification_worker(client, deadline, latencies, errors) for _ in range(args.concurrency)
+        ])
+        load_end = time.perf_counter()
+
+    stop.set()
+    await asyncio.gather(*streams, return_exceptions=True)
+
+    print(f"\nNotifications: {len(latencies)} ok, {len(errors)} failed in {load_end - load_start:.1f}s "
+          f"({len(latencies) / (load_end - load_start):.1f} req/s, concurrency {args.concurrency})")
+    if latencies:
+        stats = summarize(latencies)
+        print(f"Latency: p50 {stats['p50_ms']:.1f} ms  p95 {stats['p95_ms']:.1f} ms  p99 {stats['p99_ms']:.1f} ms")
+    for i, client_arrivals in enumerate(arrivals):
+        print(f"\nStream client {i + 1} ({args.stream_mode})")
+        print_stream("stream only", stream_stats(client_arrivals, stream_only_start, stream_only_end))
+        print_stream("stream + load", stream_stats(client_arrivals, load_start, load_end))
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test hazard notifications with the live stream running")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent notification workers")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of notification load")
+    parser.add_argument("--stream-only", type=float, default=10, help="Seconds of streaming before the load starts")
+    parser.add_argument("--warmup", type=float, default=3, help="Seconds before measuring, while the stream settles")
+    parser.add_argument("--stream-clients", type=int, default=1)
+    parser.add_argument("--stream-mode", choices=["rendered", "raw", "detections"], default="rendered")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Sustainable frame rate of the full pipeline, replaying a recorded drive.
+
+Replays a video file, image directory or recording (see
+backend/capture_sources.py) as a camera source at each requested speed and
+streams it to WebSocket clients through the real capture ring, inference
+loop, encoder and websocket_endpoint, in-process. For each speed it reports
+the capture rate, the rate frames reach the clients, frames dropped at
+capture, and p95 inter-frame gap; at "max" the delivered rate is the
+sustainable throughput. The inference loop is capped at
+SCHEDULER_SETTINGS["target_fps"], which --target-fps raises.
+
+No camera is needed. --stub-models swaps in the benchmark stub models so
+no weights or torch are needed either.
+
+Usage (from the project directory):
+    python benchmarks/replay_load_test.py recordings/front-20260101-120000 --speeds 1 2 max --duration 20
+"""
+import argparse
+import time
+
+import numpy as np
+
+from harness import install_stub_models, summarize
+
+import websocket_server
+from config import SCHEDULER_SETTINGS
+
+def run_phase(client, speed, args):
+    label = "max" if speed == 0 else f"{speed:g}x"
+    name = f"replay-{label}"
+    manager = websocket_server.camera_manager
+    source = manager.add_source(name, {"type": "replay", "path": args.path, "speed": speed, "loop": True})
+
+    arrivals = []
+    try:
+        with client.websocket_connect(f"/ws/{name}?mode={args.mode}") as websocket:
+            # Let the first frames warm up the models and scheduler
+            deadline = time.perf_counter() + args.warmup
+            while time.perf_counter() < deadline:
+                websocket.receive_bytes()
+            frames_before, dropped_before = source.ring.sequence, source.ring.dropped_frames
+            started = time.perf_counter()
+            while time.perf_counter() - started < args.duration:
+                websocket.receive_bytes()
+                arrivals.append(time.perf_counter())
+            wall = time.perf_counter() - started
+            captured = source.ring.sequence - frames_before
+            dropped = source.ring.dropped_frames - dropped_before
+    finally:
+        manager.remove_source(name)
+
+    gaps = summarize(np.diff(arrivals).tolist(), wall) if len(arrivals) > 1 else None
+    return {
+        "speed": label,
+        "capture_fps": captured / wall,
+        "delivered_fps": len(arrivals) / wall,
+        "capture_dropped": dropped,
+        "gap_p95_ms": gaps["p95_ms"] if gaps else float("nan")
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a drive through the WebSocket pipeline at several speeds")
+    parser.add_argument("path", help="Video file, image directory or recording directory")
+    parser.add_argument("--speeds", nargs="+", default=["1", "2", "max"], help="Replay speeds; max is as fast as possible")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds per speed")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds per speed")
+    parser.add_argument("--mode", default="rendered", choices=websocket_server.STREAM_MODES)
+    parser.add_argument("--target-fps", type=float, help="Raise the inference loop's frame rate cap")
+    parser.add_argument("--stub-models", action="store_true", help="Use stub models instead of the YOLO weights")
+    args = parser.parse_args()
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    if args.stub_models:
+        install_stub_models(20, 50)
+    if args.target_fps:
+        SCHEDULER_SETTINGS["target_fps"] = args.target_fps
+
+    app = FastAPI()
+    app.websocket("/ws/{source}")(websocket_server.websocket_endpoint)
+
+    @app.on_event("startup")
+    async def start_loop():
+        websocket_server.start_inference_loop()
+
+    results = []
+    with TestClient(app) as client:
+        for speed in args.speeds:
+            results.append(run_phase(client, 0.0 if speed == "max" else float(speed), args))
+
+    print(f"{'speed':<8}{'capture fps':>14}{'delivered fps':>16}{'capture drops':>16}{'p95 gap ms':>13}")
+    for result in results:
+        print(
+            f"{result['speed']:<8}{result['capture_fps']:>14.1f}{result['delivered_fps']:>16.1f}"
+            f"{result['capture_dropped']:>16}{result['gap_p95_ms']:>13.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Benchmark suite for the detection pipeline and hazard report API.
+
+Every stage runs against synthetic frames, stub models returning a
+configurable number of boxes and an in-memory mongomock database, so results
+are reproducible without a camera, weights, GPU or MongoDB server:
+
+    capture.*       frame ring hand-off between a capture thread and the inference loop
+    postprocess.*   filter_detections and the full process_frame_with_models path
+    draw            draw_detections
+    encode.*        cv2.imencode through encode_jpeg at full and reduced size
+    websocket.*     hub -> websocket_endpoint -> client, over the ASGI test transport
+    api.*           notification_service endpoints
+    cleanup.job     resolved-hazard cleanup job (dry run over the seeded reports)
+
+Usage (from the project directory):
+    python benchmarks/run_benchmarks.py [--iterations 200] [--stages postprocess encode]
+    python benchmarks/run_benchmarks.py --save benchmarks/baselines/my-machine.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baselines/my-machine.json
+
+With --baseline the exit status is 1 if any stage's p95 latency regressed by
+more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import struct
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from harness import (
+    install_stub_models, install_mongomock, synthetic_frame, measure, summarize,
+    print_results, save_baseline, compare_baseline
+)
+
+from camera_manager import CameraManager  # noqa: E402
+from frame_encoder import encode_jpeg, frame_encoder, EncodedFrame  # noqa: E402
+import websocket_server  # noqa: E402
+import notification_service  # noqa: E402
+from hazard_cleanup import CleanupJob  # noqa: E402
+
+def bench_capture(args, frame):
+    """Writer cost of publishing a frame, and latency until a waiting reader has it pinned"""
+    manager = CameraManager({"bench": 0})
+    ring = manager.sources["bench"].ring
+    publish_samples = []
+    handoff_samples = []
+    stop = threading.Event()
+
+    def reader():
+        sequence = 0
+        while not stop.is_set():
+            frame_ref = ring.wait_for_newer(sequence, timeout=0.1)
+            if frame_ref is None:
+                continue
+            handoff_samples.append(time.perf_counter() - frame_ref.timestamp)
+            sequence = frame_ref.sequence
+            frame_ref.release()
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        index = ring.acquire_write_slot(frame.shape)
+        if index is not None:
+            ring.buffers[index][...] = frame
+            # perf_counter timestamps so the reader can measure the hand-off
+            ring.publish(index, time.perf_counter())
+        publish_samples.append(time.perf_counter() - start)
+        time.sleep(0.001)
+    stop.set()
+    thread.join()
+
+    # Polling path used by the inference loop
+    latest = measure(lambda: [ref.release() for ref in manager.latest_frames({"bench": 0}).values()], args.iterations)
+    manager.close()
+    return {
+        "capture.publish": summarize(publish_samples),
+        "capture.handoff": summarize(handoff_samples),
+        "capture.latest_frames": summarize(latest)
+    }
+
+def bench_postprocess(args, frame):
+    road, standard, _ = websocket_server.run_models(frame)
+    width = frame.shape[1]
+    return {
+        "postprocess.filter": summarize(measure(
+            lambda: websocket_server.filter_detections(road, standard, width), args.iterations
+        )),
+        "postprocess.process_frame": summarize(measure(
+            lambda: websocket_server.process_frame_with_models(frame), args.iterations
+        ))
+    }
+
+def bench_draw(args, frame):
+    road, standard, _ = websocket_server.run_models(frame)
+    detections = websocket_server.filter_detections(road, standard, frame.shape[1])
+    results = websocket_server.detections_to_results(detections)
+    hazard_distances = websocket_server.detections_to_hazard_distances(detections)
+    return {
+        "draw": summarize(measure(
+            lambda: websocket_server.draw_detections(frame, results, hazard_distances), args.iterations
+        ))
+    }
+
+def bench_encode(args, frame):
+    return {
+        "encode.full_q80": summarize(measure(lambda: encode_jpeg(frame, 1.0, 80), args.iterations)),
+        "encode.half_q55": summarize(measure(lambda: encode_jpeg(frame, 0.5, 55), args.iterations))
+    }
+
+def bench_websocket(args, frame):
+    """Frames published to a hub, encoded and sent by websocket_endpoint, received by a test client"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    source = websocket_server.camera_manager.default_source
+    hub = websocket_server.get_hub(source)
+    app = FastAPI()
+    app.websocket("/ws/{source}")(websocket_server.websocket_endpoint)
+
+    async def publisher():
+        while not hub.has_subscribers():
+            await asyncio.sleep(0.001)
+        for sequence in range(1, args.iterations + 1):
+            # One frame in flight at a time, so latency isn't inflated by dropped frames
+            while any(queue.qsize() for queue in hub.subscribers):
+                await asyncio.sleep(0.0005)
+            hub.publish(EncodedFrame(frame, frame, {"published": time.perf_counter()}, frame_encoder, sequence))
+
+    @app.on_event("startup")
+    async def start_publisher():
+        asyncio.create_task(publisher())
+
+    samples = []
+    sizes = []
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/ws/{source}") as websocket:
+            started = time.perf_counter()
+            for _ in range(args.iterations):
+                message = websocket.receive_bytes()
+                received = time.perf_counter()
+                header_length = struct.unpack(">I", message[:4])[0]
+                header = json.loads(message[4:4 + header_length])
+                samples.append(received - header["published"])
+                sizes.append(len(message))
+            wall = time.perf_counter() - started
+    stats = summarize(samples, wall)
+    stats["mean_message_kb"] = round(float(np.mean(sizes)) / 1024, 1)
+    return {"websocket.frame_latency": stats}
+
+def seed_reports(collection, count, rng):
+    """Replace the collection's contents with count reports, half of them older than a week"""
+    collection.delete_many({})
+    now = datetime.now()
+    collection.insert_many([
+        {
+            "location": {"lat": float(lat), "lng": float(lng)},
+            "geo": {"type": "Point", "coordinates": [float(lng), float(lat)]},
+            "timestamp": now - timedelta(days=float(age)),
+            "type": "pothole",
+            "map_link": "",
+            "status": "reported"
+        }
+        for lat, lng, age in zip(
+            rng.uniform(12.8, 13.1, count), rng.uniform(77.4, 77.8, count), rng.uniform(0, 14, count)
+        )
+    ])
+
+def bench_api(args, frame):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    collection = install_mongomock()
+
+    async def no_email(reports):
+        return True
+    notification_service.send_email_to_authority = no_email
+
+    app = FastAPI()
+    app.include_router(notification_service.router, prefix="/api")
+    rng = np.random.default_rng(0)
+    results = {}
+    with TestClient(app) as client:
+        seed_reports(collection, args.reports, rng)
+
+        def post_notification():
+            response = client.post("/api/hazard-notification", json={
+                "location": {"lat": float(rng.uniform(12.8, 13.1)), "lng": float(rng.uniform(77.4, 77.8))},
+                "timestamp": datetime.now().isoformat(),
+                "type": "pothole"
+            })
+            response.raise_for_status()
+        results["api.hazard_notification"] = summarize(measure(post_notification, args.iterations))
+
+        seed_reports(collection, args.reports, rng)
+        results["api.hazard_reports"] = summarize(measure(
+            lambda: client.get("/api/hazard-reports").raise_for_status(), args.iterations
+        ))
+
+    # Dry run, so every iteration examines the same reports
+    results["cleanup.job"] = summarize(measure(
+        lambda: asyncio.run(CleanupJob(notification_service.hazard_reports, dry_run=True).run()),
+        max(args.iterations // 10, 5),
+        warmup=1
+    ))
+    return results
+
+STAGES = {
+    "capture": bench_capture,
+    "postprocess": bench_postprocess,
+    "draw": bench_draw,
+    "encode": bench_encode,
+    "websocket": bench_websocket,
+    "api": bench_api
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the detection pipeline with stub models and mongomock")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--road-boxes", type=int, default=20, help="Boxes the stub road model returns per frame")
+    parser.add_argument("--standard-boxes", type=int, default=50, help="Boxes the stub standard model returns per frame")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--reports", type=int, default=500, help="Hazard reports seeded into mongomock")
+    parser.add_argument("--save", help="Write the results as a JSON baseline")
+    parser.add_argument("--baseline", help="Compare with a JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 slowdown against the baseline")
+    args = parser.parse_args()
+
+    install_stub_models(args.road_boxes, args.standard_boxes)
+    frame = synthetic_frame(args.width, args.height)
+
+    results = {}
+    for stage in args.stages:
+        print(f"Running {stage}...")
+        results.update(STAGES[stage](args, frame))
+    frame_encoder.shutdown()
+
+    print()
+    print_results(results)
+    settings = {key: value for key, value in vars(args).items() if key not in ("save", "baseline")}
+    if args.save:
+        save_baseline(args.save, results, settings)
+    if args.baseline:
+        regressions = compare_baseline(args.baseline, results, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) regressed: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -2,21 +2,29 @@ import { useEffect, useRef, useState } from 'react';
 import { toast, ToastContainer } from 'react-toastify';
 import 'react-toastify/dist/ReactToastify.css';
 import './LiveMode.css';
-import HazardNotifier from './HazardNotifier';
 import NearbyHazardNotifier from './NearbyHazardNotifier';
 import EmergencyBrakeNotifier from './EmergencyBrakeNotifier';
 
+// Stream mode from the page URL (/live?stream=raw): "rendered" frames come with
+// overlays drawn by the server; "raw" and "detections" are drawn on a canvas here
+const STREAM_MODES = ['rendered', 'raw', 'detections'];
+
+// Overlay colors matching the server-side drawing
+const MODEL_COLORS = { road: '#00ff00', standard: '#ffff00' };
+
 export default function LiveMode() {
   const videoRef = useRef(null);
+  const overlayRef = useRef(null);
   const wsRef = useRef(null);
   const alertRef = useRef(null);
   const cooldownRef = useRef(null);
   const alertSoundRef = useRef(null);
-  const [isConnected, setIsConnected] = useState(false);
-  const [hazardDetected, setHazardDetected] = useState(false);
   const [currentLocation, setCurrentLocation] = useState(null);
+  const locationRef = useRef(null);
   const [hazardDistances, setHazardDistances] = useState([]);
   const [driverLaneHazardCount, setDriverLaneHazardCount] = useState(0);
+  const requestedMode = new URLSearchParams(window.location.search).get('stream');
+  const streamMode = STREAM_MODES.includes(requestedMode) ? requestedMode : 'rendered';
 
   // Initialize alert sound
   useEffect(() => {
@@ -51,96 +59,159 @@ export default function LiveMode() {
     }
   }, []);
 
+  const textDecoder = new TextDecoder();
+
+  const handleMetadata = (parsedData) => {
+    const driverLaneHazardCount = parsedData.driver_lane_hazard_count;
+    const hazardDistances = parsedData.hazard_distances || [];
+    setDriverLaneHazardCount(driverLaneHazardCount);
+    setHazardDistances(hazardDistances);
+
+    if (driverLaneHazardCount > 0) {
+      if (!alertRef.current) {
+        alertRef.current = toast.warning(`⚠️ Road Hazard Detected in Your Lane! \n
+          Reducing Speed ......
+          `, {
+          autoClose: false,
+          closeOnClick: false,
+          draggable: false,
+          onOpen: () => {
+            if (alertSoundRef.current) {
+              alertSoundRef.current.play().catch(err => console.error("Error playing sound:", err));
+            }
+          },
+          onClose: () => {
+            if (alertSoundRef.current) {
+              alertSoundRef.current.pause();
+              alertSoundRef.current.currentTime = 0;
+            }
+          }
+        });
+      }
+      if (cooldownRef.current) {
+        clearTimeout(cooldownRef.current);
+        cooldownRef.current = null;
+      }
+    } else {
+      if (!cooldownRef.current) {
+        cooldownRef.current = setTimeout(() => {
+          if (alertRef.current) {
+            toast.dismiss(alertRef.current);
+            alertRef.current = null;
+            if (alertSoundRef.current) {
+              alertSoundRef.current.pause();
+              alertSoundRef.current.currentTime = 0;
+            }
+          }
+          cooldownRef.current = null;
+        }, 3000);
+      }
+    }
+  };
+
+  const drawOverlay = (parsedData) => {
+    const canvas = overlayRef.current;
+    if (!canvas || !parsedData.frame_size) return;
+
+    // Canvas uses frame pixel coordinates; CSS scales it like the image
+    const [frameWidth, frameHeight] = parsedData.frame_size;
+    if (canvas.width !== frameWidth || canvas.height !== frameHeight) {
+      canvas.width = frameWidth;
+      canvas.height = frameHeight;
+    }
+
+    const ctx = canvas.getContext('2d');
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    ctx.lineWidth = 2;
+    ctx.font = 'bold 16px Arial';
+
+    (parsedData.boxes || []).forEach(([x1, y1, x2, y2, , trackId, className, model]) => {
+      const color = MODEL_COLORS[model] || MODEL_COLORS.standard;
+      ctx.strokeStyle = color;
+      ctx.fillStyle = color;
+      ctx.strokeRect(x1, y1, x2 - x1, y2 - y1);
+      ctx.fillText(trackId ? `${className} #${trackId}` : className, x1, y1 - 10);
+    });
+
+    (parsedData.hazard_distances || []).forEach((hazard) => {
+      if (hazard.distance == null) return;
+      const [x1, y1] = hazard.bbox;
+      ctx.fillStyle = MODEL_COLORS.road;
+      ctx.fillText(`${hazard.distance.toFixed(1)}m`, x1, y1 - 30);
+    });
+  };
+
+  const handleFrame = (blob) => {
+    const url = URL.createObjectURL(blob);
+    let processedImg = document.getElementById('processed-feed');
+    if (!processedImg) {
+      processedImg = document.createElement('img');
+      processedImg.id = 'processed-feed';
+      processedImg.className = 'processed-feed';
+      videoRef.current.after(processedImg);
+    }
+    
+    if (processedImg.src) {
+      URL.revokeObjectURL(processedImg.src);
+    }
+    processedImg.src = url;
+  };
+
+  // The server geotags the potholes it detects with our position and reports them itself
+  const sendPosition = () => {
+    const ws = wsRef.current;
+    const location = locationRef.current;
+    if (!ws || ws.readyState !== WebSocket.OPEN || !location) return;
+    ws.send(JSON.stringify({ type: 'position', lat: location.lat, lng: location.lng }));
+  };
+
+  useEffect(() => {
+    locationRef.current = currentLocation;
+    sendPosition();
+  }, [currentLocation]);
+
   const connectWebSocket = () => {
     if (wsRef.current) {
       wsRef.current.close();
     }
 
-    const wsURL = window.location.origin.replace(/^http/, 'ws') + '/ws';
+    const wsURL = window.location.origin.replace(/^http/, 'ws') + `/ws?mode=${streamMode}`;
     wsRef.current = new WebSocket(wsURL);
+    wsRef.current.binaryType = 'arraybuffer';
 
     wsRef.current.onopen = () => {
-      setIsConnected(true);
+      sendPosition();
     };
 
     wsRef.current.onmessage = (e) => {
-      if (typeof e.data === 'string') {
-        try {
-          const parsedData = JSON.parse(e.data);
-          const driverLaneHazardCount = parsedData.driver_lane_hazard_count;
-          const hazardDistances = parsedData.hazard_distances || [];
-          setHazardDetected({ type: parsedData.hazard_type });
-          setDriverLaneHazardCount(driverLaneHazardCount);
-          setHazardDistances(hazardDistances);
-    
-          if (driverLaneHazardCount > 0) {
-            if (!alertRef.current) {
-              alertRef.current = toast.warning(`⚠️ Road Hazard Detected in Your Lane! \n
-                Reducing Speed ......
-                `, {
-                autoClose: false,
-                closeOnClick: false,
-                draggable: false,
-                onOpen: () => {
-                  if (alertSoundRef.current) {
-                    alertSoundRef.current.play().catch(err => console.error("Error playing sound:", err));
-                  }
-                },
-                onClose: () => {
-                  if (alertSoundRef.current) {
-                    alertSoundRef.current.pause();
-                    alertSoundRef.current.currentTime = 0;
-                  }
-                }
-              });
-            }
-            if (cooldownRef.current) {
-              clearTimeout(cooldownRef.current);
-              cooldownRef.current = null;
-            }
-          } else {
-            if (!cooldownRef.current) {
-              cooldownRef.current = setTimeout(() => {
-                if (alertRef.current) {
-                  toast.dismiss(alertRef.current);
-                  alertRef.current = null;
-                  if (alertSoundRef.current) {
-                    alertSoundRef.current.pause();
-                    alertSoundRef.current.currentTime = 0;
-                  }
-                }
-                cooldownRef.current = null;
-              }, 3000);
-            }
-          }
-        } catch (err) {
-          console.error("WebSocket JSON Error:", err);
-        }
-      } else if (e.data instanceof Blob) {
-        const url = URL.createObjectURL(e.data);
-        let processedImg = document.getElementById('processed-feed');
-        if (!processedImg) {
-          processedImg = document.createElement('img');
-          processedImg.id = 'processed-feed';
-          processedImg.className = 'processed-feed';
-          videoRef.current.after(processedImg);
-        }
-        
-        if (processedImg.src) {
-          URL.revokeObjectURL(processedImg.src);
-        }
-        processedImg.src = url;
+      // Each message is [4-byte header length][JSON header][JPEG bytes]
+      let parsedData;
+      let jpegBytes;
+      try {
+        const view = new DataView(e.data);
+        const headerLength = view.getUint32(0);
+        parsedData = JSON.parse(textDecoder.decode(new Uint8Array(e.data, 4, headerLength)));
+        jpegBytes = new Uint8Array(e.data, 4 + headerLength);
+      } catch (err) {
+        console.error("WebSocket message Error:", err);
+        return;
+      }
+
+      handleMetadata(parsedData);
+      if (streamMode !== 'rendered') {
+        drawOverlay(parsedData);
+      }
+      if (jpegBytes.length > 0) {
+        handleFrame(new Blob([jpegBytes], { type: 'image/jpeg' }));
       }
     };
 
     wsRef.current.onerror = () => {
       console.error("WebSocket error. Attempting to reconnect...");
-      setIsConnected(false);
     };
 
     wsRef.current.onclose = () => {
       console.warn("WebSocket closed. Reconnecting in 3 seconds...");
-      setIsConnected(false);
       setTimeout(connectWebSocket, 3000);
     };
   };
@@ -163,12 +234,6 @@ export default function LiveMode() {
     };
   }, []);
 
-  const handleNotificationSent = (hazard, response) => {
-    if (response.success) {
-      toast.success(`Hazard reported to authorities (ID: ${response.report_id.substring(0, 8)})`);
-    }
-  };
-
   return (
     <div className="live-container">
       <h1>Live Road Hazard Detection</h1>
@@ -187,6 +252,9 @@ export default function LiveMode() {
               muted 
               className="live-feed"
             />
+            {streamMode !== 'rendered' && (
+              <canvas ref={overlayRef} className="overlay-canvas" />
+            )}
           </div>
         </div>
 
@@ -200,13 +268,6 @@ export default function LiveMode() {
         </div>
       </div>
 
-      <HazardNotifier 
-        isConnected={isConnected}
-        hazardDetected={hazardDetected}
-        currentLocation={currentLocation}
-        onNotificationSent={handleNotificationSent}
-      />
-
       {/* NearbyHazardNotifier now handles pothole notifications */}
       <NearbyHazardNotifier currentLocation={currentLocation} />
 
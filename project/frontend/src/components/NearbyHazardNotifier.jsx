@@ -1,81 +1,105 @@
 import { useEffect, useRef, useState } from 'react';
 import { toast } from 'react-toastify';
 
+const NEARBY_RADIUS_METERS = 100;
+
 export default function NearbyHazardNotifier({ currentLocation }) {
   const [nearbyPotholes, setNearbyPotholes] = useState([]);
   const nearbyPotholeAlertRef = useRef(null);
-  const potholeCheckIntervalRef = useRef(null);
+  const wsRef = useRef(null);
+  const locationRef = useRef(currentLocation);
+  const reconnectTimeoutRef = useRef(null);
 
-  useEffect(() => {
-    if (!currentLocation) return;
-    
-    const checkNearbyPotholes = async () => {
-      try {
-        const response = await fetch('/api/hazard-reports');
-        if (!response.ok) throw new Error('Failed to fetch pothole data');
-        
-        const potholes = await response.json();
-        
-        const nearby = potholes.filter(pothole => {
-          const distance = calculateDistance(
-            currentLocation.lat, 
-            currentLocation.lng,
-            pothole.location.lat,
-            pothole.location.lng
-          );
-          return distance <= 0.1; // 0.1 km = 100 meters
-        });
-        
-        setNearbyPotholes(nearby);
-        
-        if (nearby.length > 0 && !nearbyPotholeAlertRef.current) {
-          nearbyPotholeAlertRef.current = toast.warning(
-            `⚠️ Drive carefully! potholes were detected nearby.`, 
-            {
-              autoClose: 7000,
-              closeOnClick: true,
-              pauseOnHover: true,
-              draggable: true,
-              onClose: () => {
-                setTimeout(() => {
-                  nearbyPotholeAlertRef.current = null;
-                }, 30000);
-              }
-            }
-          );
+  const sendPosition = () => {
+    const ws = wsRef.current;
+    const location = locationRef.current;
+    if (!ws || ws.readyState !== WebSocket.OPEN || !location) return;
+    ws.send(JSON.stringify({
+      type: 'position',
+      lat: location.lat,
+      lng: location.lng,
+      radius: NEARBY_RADIUS_METERS
+    }));
+  };
+
+  const showNearbyAlert = () => {
+    if (nearbyPotholeAlertRef.current) return;
+    nearbyPotholeAlertRef.current = toast.warning(
+      `⚠️ Drive carefully! potholes were detected nearby.`,
+      {
+        autoClose: 7000,
+        closeOnClick: true,
+        pauseOnHover: true,
+        draggable: true,
+        onClose: () => {
+          setTimeout(() => {
+            nearbyPotholeAlertRef.current = null;
+          }, 30000);
         }
-      } catch (error) {
-        console.error("Error checking nearby potholes:", error);
       }
+    );
+  };
+
+  useEffect(() => {
+    // The server pushes hazards entering ("added") or leaving ("removed") our radius
+    let closed = false;
+
+    const connect = () => {
+      const wsURL = window.location.origin.replace(/^http/, 'ws') + '/ws/hazards';
+      wsRef.current = new WebSocket(wsURL);
+
+      wsRef.current.onopen = () => {
+        setNearbyPotholes([]);
+        sendPosition();
+      };
+
+      wsRef.current.onmessage = (e) => {
+        let message;
+        try {
+          message = JSON.parse(e.data);
+        } catch (err) {
+          console.error("Error parsing nearby hazard update:", err);
+          return;
+        }
+
+        if (message.type === 'added' && message.hazards.length > 0) {
+          setNearbyPotholes(prev => [
+            ...prev.filter(pothole => !message.hazards.some(hazard => hazard.id === pothole.id)),
+            ...message.hazards
+          ]);
+          showNearbyAlert();
+        } else if (message.type === 'removed') {
+          setNearbyPotholes(prev => prev.filter(pothole => !message.ids.includes(pothole.id)));
+        }
+      };
+
+      wsRef.current.onerror = () => {
+        console.error("Nearby hazard feed error");
+      };
+
+      wsRef.current.onclose = () => {
+        if (!closed) {
+          reconnectTimeoutRef.current = setTimeout(connect, 3000);
+        }
+      };
     };
-    
-    const calculateDistance = (lat1, lon1, lat2, lon2) => {
-      const R = 6371; // Radius in km
-      const dLat = deg2rad(lat2 - lat1);
-      const dLon = deg2rad(lon2 - lon1);
-      const a = 
-        Math.sin(dLat / 2) ** 2 +
-        Math.cos(deg2rad(lat1)) * Math.cos(deg2rad(lat2)) *
-        Math.sin(dLon / 2) ** 2;
-      const c = 2 * Math.atan2(Math.sqrt(a), Math.sqrt(1 - a));
-      return R * c;
-    };
-    
-    const deg2rad = (deg) => deg * (Math.PI / 180);
-    
-    checkNearbyPotholes();
-    
-    if (!potholeCheckIntervalRef.current) {
-      potholeCheckIntervalRef.current = setInterval(checkNearbyPotholes, 30000);
-    }
-    
+
+    connect();
+
     return () => {
-      if (potholeCheckIntervalRef.current) {
-        clearInterval(potholeCheckIntervalRef.current);
-        potholeCheckIntervalRef.current = null;
+      closed = true;
+      clearTimeout(reconnectTimeoutRef.current);
+      if (wsRef.current) {
+        wsRef.current.close();
       }
     };
+  }, []);
+
+  useEffect(() => {
+    // Register each new position; the server replies with what changed nearby
+    locationRef.current = currentLocation;
+    sendPosition();
   }, [currentLocation]);
 
   return null;
-}
\ No newline at end of file
+}
@@ -2,114 +2,164 @@ import { useEffect, useRef, useState } from 'react';
 import axios from 'axios';
 import './PotholeMap.css';
 
+// Shown until the newest report is known, or when there are none
+const DEFAULT_CENTER = [77.5946, 12.9716];
+// Stop following cursors once this many reports are in view; the heat map still shows density
+const MAX_VIEWPORT_REPORTS = 5000;
+
+const clamp = (value, min, max) => Math.min(Math.max(value, min), max);
+
+// Reports inside the visible bounds, following the cursor through every page
+const fetchViewport = async (bounds, signal) => {
+  const bbox = [
+    clamp(bounds.getWest(), -180, 180),
+    clamp(bounds.getSouth(), -90, 90),
+    clamp(bounds.getEast(), -180, 180),
+    clamp(bounds.getNorth(), -90, 90)
+  ].join(',');
+  let reports = [];
+  let cursor = null;
+  do {
+    const response = await axios.get('/api/hazard-reports', {
+      params: { bbox, limit: 500, ...(cursor ? { cursor } : {}) },
+      signal
+    });
+    reports = reports.concat(response.data);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor && reports.length < MAX_VIEWPORT_REPORTS);
+  return reports;
+};
+
 export default function PotholeMap() {
   const mapRef = useRef(null);
+  const map = useRef(null);
+  const markers = useRef([]);
+  const heatmapLayer = useRef(null);
+  const request = useRef(null);
   const [potholes, setPotholes] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   
   useEffect(() => {
-    // Fetch pothole data from our API
-    const fetchPotholes = async () => {
+    let cancelled = false;
+    
+    // Fetch the reports in view again whenever the map stops moving
+    const loadViewport = async () => {
+      request.current?.abort();
+      const controller = new AbortController();
+      request.current = controller;
       try {
         setLoading(true);
-        const response = await axios.get('/api/hazard-reports');
-        setPotholes(response.data);
+        const reports = await fetchViewport(map.current.getBounds(), controller.signal);
+        if (controller.signal.aborted) return;
+        setPotholes(reports);
+        setError(null);
         setLoading(false);
       } catch (err) {
+        if (axios.isCancel(err)) return;
         console.error('Error fetching pothole data:', err);
         setError('Failed to load pothole data. Please try again later.');
         setLoading(false);
       }
     };
     
-    fetchPotholes();
-  }, []);
-  
-  useEffect(() => {
-    // Initialize TomTom map
-    const initMap = async () => {
-      if (!mapRef.current || potholes.length === 0) return;
+    const createMap = async () => {
+      if (cancelled || !mapRef.current) return;
       
-      // Load TomTom SDK
-      if (!window.tt) {
-        const script = document.createElement('script');
-        script.src = 'https://api.tomtom.com/maps-sdk-for-web/cdn/6.x/6.23.0/maps/maps-web.min.js';
-        script.async = true;
-        script.onload = createMap;
-        document.body.appendChild(script);
-        
-        // Load CSS
-        const link = document.createElement('link');
-        link.rel = 'stylesheet';
-        link.type = 'text/css';
-        link.href = 'https://api.tomtom.com/maps-sdk-for-web/cdn/6.x/6.23.0/maps/maps.css';
-        document.head.appendChild(link);
-      } else {
-        createMap();
+      // Start at the newest report
+      let center = DEFAULT_CENTER;
+      try {
+        const response = await axios.get('/api/hazard-reports', { params: { limit: 1 } });
+        if (response.data.length > 0) {
+          center = [response.data[0].location.lng, response.data[0].location.lat];
+        }
+      } catch (err) {
+        console.error('Error fetching latest report:', err);
       }
-    };
-    
-    const createMap = () => {
-      // Calculate center point from all potholes
-      let centerLat = 0;
-      let centerLng = 0;
-      
-      potholes.forEach(pothole => {
-        centerLat += pothole.location.lat;
-        centerLng += pothole.location.lng;
-      });
-      
-      centerLat /= potholes.length;
-      centerLng /= potholes.length;
+      if (cancelled) return;
       
       // Create map instance
-      const map = window.tt.map({
+      map.current = window.tt.map({
         key: 'HONwvVKmEJdNAPsO358cGA7AhakHmuPV', // Replace with your TomTom API key
         container: mapRef.current,
-        center: [centerLng, centerLat],
+        center,
         zoom: 13
       });
+      map.current.on('load', loadViewport);
+      map.current.on('moveend', loadViewport);
+    };
+    
+    // Load TomTom SDK
+    if (!window.tt) {
+      const script = document.createElement('script');
+      script.src = 'https://api.tomtom.com/maps-sdk-for-web/cdn/6.x/6.23.0/maps/maps-web.min.js';
+      script.async = true;
+      script.onload = createMap;
+      document.body.appendChild(script);
       
-      // Add markers for each pothole
-      potholes.forEach(pothole => {
-        const marker = new window.tt.Marker()
-          .setLngLat([pothole.location.lng, pothole.location.lat])
-          .addTo(map);
-          
-        // Create popup with pothole info
-        const popup = new window.tt.Popup({ offset: 30 })
-          .setHTML(`
-            <div class="pothole-popup">
-              <h3>Road Hazard</h3>
-              <p>Type: ${pothole.type}</p>
-              <p>Severity: ${pothole.severity}</p>
-              <p>Reported: ${new Date(pothole.timestamp).toLocaleString()}</p>
-              <p>Status: ${pothole.status}</p>
-            </div>
-          `);
-          
-        marker.setPopup(popup);
-      });
-      
-      // Add heat map layer if there are many potholes
-      if (potholes.length > 10) {
-        const points = potholes.map(pothole => ({
-          lng: pothole.location.lng,
-          lat: pothole.location.lat,
-          value: 1
-        }));
+      // Load CSS
+      const link = document.createElement('link');
+      link.rel = 'stylesheet';
+      link.type = 'text/css';
+      link.href = 'https://api.tomtom.com/maps-sdk-for-web/cdn/6.x/6.23.0/maps/maps.css';
+      document.head.appendChild(link);
+    } else {
+      createMap();
+    }
+    
+    return () => {
+      cancelled = true;
+      request.current?.abort();
+      map.current?.remove();
+      map.current = null;
+    };
+  }, []);
+  
+  useEffect(() => {
+    if (!map.current) return;
+    
+    // Replace the previous viewport's markers
+    markers.current.forEach(marker => marker.remove());
+    markers.current = potholes.map(pothole => {
+      const marker = new window.tt.Marker()
+        .setLngLat([pothole.location.lng, pothole.location.lat])
+        .addTo(map.current);
         
-        const heatmapLayer = new window.tt.HeatMap({
-          data: points,
-          radius: 40
-        });
+      // Create popup with pothole info
+      const popup = new window.tt.Popup({ offset: 30 })
+        .setHTML(`
+          <div class="pothole-popup">
+            <h3>Road Hazard</h3>
+            <p>Type: ${pothole.type}</p>
+            <p>Severity: ${pothole.severity}</p>
+            <p>Reported: ${new Date(pothole.timestamp).toLocaleString()}</p>
+            <p>Status: ${pothole.status}</p>
+          </div>
+        `);
         
-        map.addLayer(heatmapLayer);
-      }
-    };
+      marker.setPopup(popup);
+      return marker;
+    });
     
-    initMap();
+    if (heatmapLayer.current) {
+      map.current.removeLayer(heatmapLayer.current);
+      heatmapLayer.current = null;
+    }
+    // Add heat map layer if there are many potholes
+    if (potholes.length > 10) {
+      const points = potholes.map(pothole => ({
+        lng: pothole.location.lng,
+        lat: pothole.location.lat,
+        value: 1
+      }));
+      
+      heatmapLayer.current = new window.tt.HeatMap({
+        data: points,
+        radius: 40
+      });
+      
+      map.current.addLayer(heatmapLayer.current);
+    }
   }, [potholes]);
   
   return (
@@ -121,11 +171,11 @@ export default function PotholeMap() {
       
       <div className="map-stats">
         <div className="stat-box">
-          <h3>Total Locations Prone to Potholes</h3>
+          <h3>Locations Prone to Potholes in View</h3>
           <p>{potholes.length}</p>
         </div>
         <div className="stat-box">
-          <h3>Recent Reports</h3>
+          <h3>Recent Reports in View</h3>
           <p>{potholes.filter(p => new Date(p.timestamp) > new Date(Date.now() - 7 * 24 * 60 * 60 * 1000)).length}</p>
         </div>
       </div>
@@ -133,4 +183,4 @@ export default function PotholeMap() {
       <div ref={mapRef} className="map-container"></div>
     </div>
   );
-}
\ No newline at end of file
+}